@@ -6,3 +6,4 @@
 from .pydslice import Slice
 from .pydslice_insn import Insn
 from .pydslice_operand import Operand 
+from .pydslice_offline import OfflineSlice
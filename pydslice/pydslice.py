@@ -11,6 +11,14 @@ try:
     from pydslice_parser_x86_64 import *
     from pydslice_insn import *
     from pydslice_operand import *
+    from pydslice_operand_set import *
+    from pydslice_trace import *
+    from pydslice_trace_columns import *
+    from pydslice_watchpoints import *
+    from pydslice_summary import *
+    from pydslice_sink import *
+    from pydslice_checkpoint import *
+    from pydslice_libc import *
 except ImportError:
     from pydslice.pydslice_debugger_gdb import *
     from pydslice.pydslice_debugger import *
@@ -18,6 +26,14 @@ except ImportError:
     from pydslice.pydslice_parser_x86_64 import *
     from pydslice.pydslice_insn import *
     from pydslice.pydslice_operand import *
+    from pydslice.pydslice_operand_set import *
+    from pydslice.pydslice_trace import *
+    from pydslice.pydslice_trace_columns import *
+    from pydslice.pydslice_watchpoints import *
+    from pydslice.pydslice_summary import *
+    from pydslice.pydslice_sink import *
+    from pydslice.pydslice_checkpoint import *
+    from pydslice.pydslice_libc import *
 
 # callback signature: 
 # void callback(insn, matching_operands, operands_to_add, slice)
@@ -26,6 +42,18 @@ callbacks = []
 # init callback signature: void init_callback(slice)
 init_callbacks = []
 
+# checkpoint callbacks, by plugin name: (save, restore) where
+# state save(slice) returns JSON-serializable plugin state and
+# void restore(slice, state) restores it
+checkpoint_callbacks = {}
+
+# Criterion of operands added without naming one
+DEFAULT_CRITERION = "default"
+
+# Record position of the end of the recording, where GDB reports no
+# instruction number
+RECORD_END = "end"
+
 class Slice():
     keep_going = True
     stepping = True
@@ -37,6 +65,18 @@ class Slice():
     followed_operand = None
     signal = 0
     pc = 0
+    watchpoints = None
+    summaries = None
+    skipped_calls = []
+    summarized_calls = []
+    collapsed_reps = []
+    insns_checked = 0
+    insns_filtered = 0
+    criteria = []
+    unsaved = 0
+    frontier = None
+    goto_index = 0
+    summary_insn = None
 
     # Initializes Slice
     def __init__(self, crashed=False):
@@ -47,7 +87,20 @@ class Slice():
             self.parser = Parser_x86_64(self.debugger)
         else:
             self.parser = Parser_x86(self.debugger)
-        self.operand_list = []
+        self.watchpoints = WatchpointScheduler( \
+                self.parser.address_mask.bit_length() // 8)
+        self.summaries = FunctionSummaries(self.debugger, self.parser)
+        self.skipped_calls = []
+        self.summarized_calls = []
+        self.collapsed_reps = []
+        self.insns_checked = 0
+        self.insns_filtered = 0
+        self.unsaved = 0
+        self.frontier = None
+        self.goto_index = 0
+        self.summary_insn = None
+        self.criteria = [DEFAULT_CRITERION]
+        self.operand_list = OperandSet()
         self.insn_list = []
 
         if crashed == True:
@@ -64,6 +117,194 @@ class Slice():
                 f.write(insn.to_string(False)+ "\n");
         self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "Slice saved to " + path)
 
+    # Streams slice instructions to a file, keeping only the last window
+    # instructions in memory
+    def open_sink(self, path, window=SINK_WINDOW):
+        sink = InsnSink(path, window)
+        for insn in self.insn_list:
+            sink.append(insn)
+        self.close_sink(False)
+        self.insn_list = sink
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "Streaming slice instructions to " + path)
+
+    # Releases the slice once it is replaced by another
+    def release(self):
+        self.close_sink(False)
+        self.debugger.release()
+
+    # Finishes the sink file. The instructions are read back into memory
+    # unless reload is False, when the slice is being replaced
+    def close_sink(self, reload=True):
+        if not isinstance(self.insn_list, InsnSink):
+            return
+        sink = self.insn_list
+        insn_list = []
+        if reload:
+            insn_list = list(sink)
+        sink.close()
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "%d slice instructions saved to %s" % (len(sink), sink.path))
+        self.insn_list = insn_list
+
+    # Gets the record instruction number of the slice
+    def get_position(self):
+        return self.debugger.get_record_insn_number()
+
+    # Moves the slice to a record instruction number
+    def set_position(self, position):
+        if position == None:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_WARNING, \
+                    "Checkpoint was not taken while replaying")
+        else:
+            self.debugger.record_goto(position)
+        self.pc = self.debugger.get_pc()
+
+    # Gets the record position of the slice, RECORD_END if the recording is
+    # not being replayed
+    def get_record_number(self):
+        position = self.get_position()
+        if position == None:
+            return RECORD_END
+        return position
+
+    # Gets the pc the slice is at
+    def get_current_pc(self):
+        return self.debugger.get_pc()
+
+    # Gets whether stack registers are tracked
+    def get_monitor_stack(self):
+        return self.parser.monitor_stack
+
+    # Sets whether stack registers are tracked
+    def set_monitor_stack(self, monitor_stack):
+        self.parser.monitor_stack = monitor_stack
+
+    # Saves the slice state to a checkpoint file
+    def checkpoint(self, path, level=DEBUG_PRINT_LEVEL_ALWAYS):
+        global checkpoint_callbacks
+        self.return_to_frontier()
+        count = write_checkpoint(self, path, checkpoint_callbacks)
+        self.debugger.print_msg(level, \
+                "Checkpoint of %d instructions saved to %s" % (count, path))
+
+    # Restores the slice state from a checkpoint file
+    def resume(self, path):
+        global checkpoint_callbacks
+        self.frontier = None
+        self.goto_index = 0
+        read_checkpoint(self, path, checkpoint_callbacks)
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "Resumed slice of %d instructions and %d operands from %s" % \
+                (len(self.insn_list), len(self.operand_list), path))
+
+    # Counts an instruction stepped over, saving a checkpoint if autosave is
+    # on and enough instructions were stepped over since the last one
+    def autosave(self):
+        try:
+            path = pydslice_debugger.autosave_path
+            interval = pydslice_debugger.autosave_interval
+        except NameError:
+            path = pydslice.pydslice_debugger.autosave_path
+            interval = pydslice.pydslice_debugger.autosave_interval
+
+        self.unsaved = self.unsaved + 1
+        if path == None or self.unsaved < interval:
+            return
+        self.unsaved = 0
+        self.checkpoint(path, DEBUG_PRINT_LEVEL_INFO)
+
+    # Replays the recording from its beginning up to the current instruction
+    # and writes the def/use sets of every instruction to a trace file
+    def capture_trace(self, path):
+        self.return_to_frontier()
+        end = self.debugger.get_record_insn_number()
+        first,last = self.debugger.get_record_bounds()
+        if first == None:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "No recording to capture")
+            return
+
+        header = {}
+        header['architecture'] = self.debugger.get_architecture()
+        header['signal'] = self.signal
+        header['monitor_stack'] = self.parser.monitor_stack
+        header['first_insn'] = first
+        header['registers'] = operands_to_registers(self.operand_list)
+        header['memory'] = operands_to_ranges(self.operand_list)
+        header['insns'] = [TraceRecord.from_insn(x).to_list() for x in \
+                self.insn_list]
+
+        writer = create_trace_writer(path, header)
+        self.debugger.record_goto("begin")
+        self.keep_going = True
+        while self.keep_going:
+            number = self.debugger.get_record_insn_number()
+            pc = self.debugger.get_pc()
+            opcode = self.debugger.disassemble(pc).split()[0]
+
+            # read() syscalls need the return value of the syscall
+            if opcode in ["syscall", "sysenter"] and number != None:
+                self.debugger.step()
+                self.parser.step_cleanup()
+                self.debugger.reverse_step()
+
+            insn = self.parser.parse_insn(pc)
+            line,file,sym = self.debugger.get_line_info(pc)
+            insn.set_line_info(line,file,sym)
+            writer.write(TraceRecord.from_insn(insn))
+
+            # Stop at the instruction the capture was started from
+            if number == None or number == end:
+                break
+            self.debugger.step()
+        writer.close()
+
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "Captured %d instructions to %s" % (writer.count, path))
+
+    # Prints statistics about the slice computation
+    def print_stats(self):
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "--- slice stats ---")
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "instructions in slice: %d" % len(self.insn_list))
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "operands tracked: %d" % len(self.operand_list))
+        if isinstance(self.insn_list, InsnSink):
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "insn sink: %s (%d in memory)" % \
+                    (self.insn_list.path, len(self.insn_list.tail)))
+        if self.parser:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "insn cache: " + self.parser.template_cache.to_string())
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "insn cache invalidations: %d" % \
+                    self.parser.template_invalidations)
+        if self.insns_checked:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "insns skipped by def mask: %d/%d (%.1f%%)" % \
+                    (self.insns_filtered, self.insns_checked, \
+                    100.0 * self.insns_filtered / self.insns_checked))
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "def mask cache: " + \
+                    self.parser.def_mask_cache.to_string())
+        if self.summaries != None:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "function summaries: %d" % len(self.summaries))
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "calls skipped: %d (%d instructions)" % \
+                (len(self.skipped_calls), \
+                sum(x[2] for x in self.skipped_calls)))
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "library calls summarized: %d (%d instructions)" % \
+                (len(self.summarized_calls), \
+                sum(x[2] for x in self.summarized_calls)))
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "rep instructions collapsed: %d (%d iterations)" % \
+                (len(self.collapsed_reps), \
+                sum(x[1] for x in self.collapsed_reps)))
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "")
+
     # Sets operand to be followed
     def set_followed_operand(self, operand):
         if operand == None:
@@ -77,14 +318,17 @@ class Slice():
         self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "--- operand list ---")
         for t in self.operand_list:
             str = "%d\t%s" % (index, t.to_string())
-            if t == self.followed_operand:
+            if len(self.criteria) > 1:
+                str = str + " [" + ",".join(self.criteria_names(t.criteria)) \
+                        + "]"
+            if t.overlaps(self.followed_operand):
                 str = str + " (following)"
             self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, str)
             index = index + 1
         self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "")
      
     # Prints all instruction currently in the slice
-    def print_insn_list(self, index=1, count=-1, verbose=False):
+    def print_insn_list(self, index=1, count=-1, verbose=False, criteria=0):
         try:
             current_level = pydslice_debugger.debug_print_level
         except NameError:
@@ -107,6 +351,9 @@ class Slice():
             return
 
         for insn in self.insn_list[index:max]:
+            if criteria and not insn.criteria & criteria:
+                index = index + 1
+                continue
             if current_level < DEBUG_PRINT_LEVEL_INFO and \
                     (insn.opcode == "call" or insn.opcode == "ret" or \
                     insn.opcode == "leave"):
@@ -122,13 +369,155 @@ class Slice():
         str = "%d - %s" % (index, self.insn_list[index-1].to_string(True))
         self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, str)
 
-    # Adds an instruction to the list of instructions in the slice
+    # Adds an instruction to the list of instructions in the slice. The
+    # instruction is at the current record position unless it has one
     def add_insn(self, insn):
+        if insn.record_number == None:
+            insn.record_number = self.get_record_number()
         self.insn_list.append(insn)
 
-    # Adds a operandn to the slice operand list
+    # Moves the recording to the slice instruction at index so the program
+    # state there can be examined. The position the slice computation
+    # stopped at is kept to return to
+    def goto_insn(self, index):
+        if index < 1 or index > len(self.insn_list):
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "No slice instruction %d" % index)
+            return
+        insn = self.insn_list[index-1]
+        if insn.record_number == None:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "Slice instruction %d has no record instruction number" \
+                    % index)
+            return
+
+        if self.frontier == None:
+            self.frontier = self.get_record_number()
+        self.set_position(insn.record_number)
+        self.goto_index = index
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "At slice instruction %d (record instruction %s):" % \
+                (index, insn.record_number))
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                insn.to_string(False))
+
+    # Moves the recording to the slice instruction executed after the last
+    # one gone to, or back to where the slice computation stopped
+    def goto_next_insn(self):
+        if self.goto_index <= 1:
+            if self.frontier == None:
+                self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                        "No later slice instruction")
+                return
+            self.return_to_frontier()
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "Back where the slice computation stopped")
+            return
+        self.goto_insn(self.goto_index - 1)
+
+    # Moves the recording to the slice instruction executed before the last
+    # one gone to
+    def goto_prev_insn(self):
+        if self.goto_index >= len(self.insn_list):
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "No earlier slice instruction")
+            return
+        self.goto_insn(self.goto_index + 1)
+
+    # Moves the recording back to where the slice computation stopped
+    def return_to_frontier(self):
+        if self.frontier == None:
+            return
+        self.set_position(self.frontier)
+        self.frontier = None
+        self.goto_index = 0
+
+    # Gets the bit of a named slice criterion, adding the criterion if needed
+    def get_criterion(self, name):
+        if name not in self.criteria:
+            self.criteria.append(name)
+        return 1 << self.criteria.index(name)
+
+    # Gets the names of the criteria in a criteria bitset
+    def criteria_names(self, criteria):
+        return [x for i,x in enumerate(self.criteria) if criteria & (1 << i)]
+
+    # Prints the criteria with their instruction and operand counts
+    def print_criteria(self):
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "--- criteria ---")
+        counts = [0] * len(self.criteria)
+        for insn in self.insn_list:
+            for i in range(len(self.criteria)):
+                if insn.criteria & (1 << i):
+                    counts[i] = counts[i] + 1
+        for i,name in enumerate(self.criteria):
+            insns = counts[i]
+            operands = len([x for x in self.operand_list if \
+                    x.criteria & (1 << i)])
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "%s\t%d instructions, %d operands" % \
+                    (name, insns, operands))
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "")
+
+    # Adds a operandn to the slice operand list. Memory already tracked by
+    # the slice is not added again and adjacent memory ranges are merged.
+    # Operands without criteria belong to the default criterion
     def add_operand(self, operand):
-        self.operand_list.append(operand)
+        if not operand.criteria:
+            operand.criteria = 1
+        self.join_criteria(operand)
+        for part in self.operand_list.add(operand):
+            if part.operand_type != OPERAND_TYPE_MEMORY:
+                continue
+            for t in self.operand_list.find_adjacent(part):
+                if t.match_function != part.match_function or \
+                        t.symbol != part.symbol or \
+                        t.criteria != part.criteria:
+                    continue
+                merged = Operand(OPERAND_TYPE_MEMORY, False, \
+                        min(t.address, part.address), 0, t.size + part.size)
+                merged.symbol = t.symbol
+                merged.match_function = t.match_function
+                merged.criteria = t.criteria
+                self.operand_list.remove(t)
+                self.operand_list.remove(part)
+                self.operand_list.add(merged)
+                part = merged
+
+    # Adds the criteria of operand to the tracked data it overlaps. Memory
+    # ranges which are partially covered are split
+    def join_criteria(self, operand):
+        for t in self.operand_list.find_overlaps(operand):
+            if t.criteria | operand.criteria == t.criteria:
+                continue
+            if t.operand_type != OPERAND_TYPE_MEMORY:
+                t.criteria = t.criteria | operand.criteria
+                continue
+            self.operand_list.remove(t)
+            self.operand_list.extend(t.subtract(operand.address, \
+                    operand.end()))
+            part = t.slice_range(max(t.address, operand.address), \
+                    min(t.end(), operand.end()))
+            part.criteria = t.criteria | operand.criteria
+            self.operand_list.add(part)
+
+    # Finds the slice operands which overlap any of the given operands
+    def find_matches(self, operands):
+        matches = []
+        for o in operands:
+            for t in self.operand_list.find_overlaps(o):
+                if not any(t is x for x in matches):
+                    matches.append(t)
+        return matches
+
+    # Removes the data referred to by the given operands from the slice
+    # operand list. Memory ranges which are partially covered are split
+    def remove_operands(self, operands):
+        for o in operands:
+            for t in self.operand_list.find_overlaps(o):
+                self.operand_list.remove(t)
+                if t.operand_type == OPERAND_TYPE_MEMORY:
+                    self.operand_list.extend(t.subtract(o.address, o.end()))
 
     # Adds current instruction to the slice
     def add_current_insn(self):
@@ -136,7 +525,7 @@ class Slice():
         self.insn = self.parser.parse_insn(self.pc)
         to_add = []
 
-        line,file,sym = self.debugger.get_line_info()
+        line,file,sym = self.debugger.get_line_info(self.pc)
         self.insn.set_line_info(line,file,sym)
 
         # Add instruction's src operand to the slice operand
@@ -148,17 +537,11 @@ class Slice():
                     s.symbol = self.debugger.get_addr_info(s.address)
                 to_add.append(s)
 
-        # Prune operandl list of duplicates
-        self.operand_list[:] = [x for x in self.operand_list]
+        # add_operand skips data already tracked by the slice
         for item in to_add:
-            exists = False
-            for t in self.operand_list:
-                if t.operand_type == item.operand_type and \
-                        t.address == item.address:
-                    exists = True
-            if exists == False:
-                self.add_operand(item)
-        self.insn_list.append(self.insn)
+            self.add_operand(item)
+        self.insn.criteria = self.get_criterion(DEFAULT_CRITERION)
+        self.add_insn(self.insn)
         self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
                 "Added insn: " + self.insn.text)
 
@@ -166,11 +549,12 @@ class Slice():
     def delete_insn(self, index):
         self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
                 "Removed insn (%d): %s" % (index+1, self.insn_list[index].text))
-        self.insn_list.remove(self.insn_list[index])
+        del self.insn_list[index]
 
     # Adds an expression to the list of slice operand
-    def add_expr_to_operand_list(self, expr):
-        self.parser.add_expr_to_operand_list(expr, self.operand_list)
+    def add_expr_to_operand_list(self, expr, criterion=DEFAULT_CRITERION):
+        self.parser.add_expr_to_operand_list(expr, self, \
+                self.get_criterion(criterion))
    
     # Removes operand from slice operand list
     def remove_operand_list_index(self, index):
@@ -179,6 +563,17 @@ class Slice():
                 (index+1, self.operand_list[index].to_string()))
         self.operand_list.remove(self.operand_list[index]) 
 
+    # Determines if the instruction at pc may write a tracked operand, using
+    # only its def mask. Other instructions do not need to be parsed
+    def may_define(self, pc):
+        mask = self.parser.get_def_mask(pc)
+        if mask.unknown or self.operand_list.others:
+            return True
+        if mask.writes_memory and self.operand_list.memory:
+            return True
+        return mask.registers & \
+                self.parser.get_register_mask(self.operand_list.registers) != 0
+
     # Determines if parsed instruction is relevant to the slice
     def compute_insn(self, insn):
         global callbacks
@@ -187,13 +582,13 @@ class Slice():
         to_add = []
         matches = []
 
-        matches[:] = [x for x in self.operand_list if x in insn.dest_list]
+        matches = self.find_matches(insn.dest_list)
         
         # do we have a match?
         if not matches:
             return False,False
 
-        if self.followed_operand in matches:
+        if any(x.overlaps(self.followed_operand) for x in matches):
             self.followed_operand = None
             found_followed = True
 
@@ -206,8 +601,8 @@ class Slice():
             if x.operand_type == OPERAND_TYPE_MEMORY:
                 x.symbol = self.debugger.get_addr_info(x.address)
 
-        line,file,sym = self.debugger.get_line_info()
-        self.insn.set_line_info(line,file,sym)
+        line,file,sym = self.debugger.get_line_info(insn.pc)
+        insn.set_line_info(line,file,sym)
 
         # Do callbacks
         for callback in callbacks:
@@ -217,12 +612,17 @@ class Slice():
             if operand.match_function:
                 operand.match_function(insn, matches, to_add, self)
 
+        # src operands join the criteria of the matched operands
+        for x in matches:
+            insn.criteria = insn.criteria | x.criteria
+
         # remove matched operands
-        self.operand_list[:] = [x for x in self.operand_list if \
-                x not in matches and x not in insn.src_list]
+        self.remove_operands(insn.dest_list)
 
         # add insn src operands
-        self.operand_list = self.operand_list + to_add
+        for x in to_add:
+            x.criteria = x.criteria | insn.criteria
+            self.add_operand(x)
         
         return found_insn, found_followed
 
@@ -233,33 +633,312 @@ class Slice():
         self.debugger.reverse_step()
         self.pc = self.debugger.get_pc()
 
-        if self.insn:
-            opcode = self.insn.opcode
-        else:
-            insn_text = self.debugger.disassemble(self.pc)
-            opcode = insn_text.split()[0]
-        
-        if self.pc == self.last_pc and "rep" not in opcode:
+        if self.pc == self.last_pc and \
+                "rep" not in self.parser.get_opcode(self.pc):
             self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
                     "Reached end of recording")
             return False 
 
+        self.debugger.update_call_stack(self.pc, self.parser.get_opcode)
+
+        try:
+            skip_calls = pydslice_debugger.skip_calls
+            summarize_library = pydslice_debugger.summarize_library
+        except NameError:
+            skip_calls = pydslice.pydslice_debugger.skip_calls
+            summarize_library = pydslice.pydslice_debugger.summarize_library
+
+        if not self.parser.is_return(self.pc):
+            return True
+        if summarize_library:
+            self.summary_insn = self.summarize_library_call()
+            if self.summary_insn != None:
+                return True
+        if skip_calls:
+            self.skip_call()
+        return True
+
+    # Reverses over the rest of a call when the reverse step reached the ret
+    # of a function which cannot write any tracked operand. Skipped calls are
+    # recorded as (call pc, function, instruction count). Returns True if the
+    # call was skipped
+    def skip_call(self):
+        summary = self.summaries.get(self.pc)
+        sp = self.debugger.get_register(self.summaries.stack_register[0])
+        if summary.may_define(self.operand_list, sp):
+            return False
+
+        return_address = self.parser.read_value(sp, \
+                self.summaries.word_size)
+        count = self.reverse_over_call(summary.name, return_address)
+        if count == None:
+            return False
+
+        self.skipped_calls.append((self.pc, summary.name, count))
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_INFO, \
+                "Skipped call to %s (%d instructions)" % (summary.name, count))
+        return True
+
+    # Reverses from inside a call, or from its ret, to the call instruction.
+    # return_address is the address the call returns to, or None if it is not
+    # known. Returns the number of instructions reversed over, or None if the
+    # call could not be reached, in which case the recording is not moved
+    def reverse_over_call(self, name, return_address):
+        last_pc = self.pc
+        end = self.debugger.get_record_insn_number()
+        self.debugger.reverse_finish()
+        self.pc = self.debugger.get_pc()
+        start = self.debugger.get_record_insn_number()
+
+        # Go back if gdb did not stop at the call
+        if not self.parser.get_opcode(self.pc).startswith("call") or \
+                (return_address != None and \
+                self.pc + self.debugger.get_insn_length(self.pc) != \
+                return_address):
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_WARNING, \
+                    "Could not reverse over call to %s" % name)
+            if end != None:
+                self.debugger.record_goto(end)
+            self.pc = last_pc
+            return None
+
+        if start != None and end != None:
+            return end - start
+        return 0
+
+    # Reverses over a call to a summarized library function and returns a
+    # single instruction which writes the memory the call writes from the
+    # memory it copies and from its arguments, for the slice to process
+    # before the call instruction. Called at the ret of the function or at an
+    # instruction inside it. Summarized calls are recorded as (call pc,
+    # function, instruction count). Returns None if the call was not
+    # summarized
+    def summarize_library_call(self):
+        name = self.debugger.get_function(self.pc)[0]
+        if not name:
+            return None
+        library_summary = find_library_summary(name)
+        if library_summary == None:
+            return None
+        arg_count,summarize = library_summary
+
+        # The summary does not say what the call leaves in the registers it
+        # may overwrite, so the call is stepped through if any are tracked
+        clobbered = Insn(self.pc)
+        for x in self.parser.get_volatile_registers():
+            if x != self.parser.get_return_register():
+                self.parser.parse_arg(x, clobbered, OPERAND_DIRECTION_DST)
+        if self.find_matches(clobbered.dest_list):
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_INFO, \
+                    "Stepping through call to %s, it may overwrite a " \
+                    "tracked register" % name)
+            return None
+
+        # The return address is only known at the ret
+        return_address = None
+        if self.parser.is_return(self.pc):
+            sp = self.debugger.get_register(self.summaries.stack_register[0])
+            return_address = self.parser.read_value(sp, \
+                    self.summaries.word_size)
+
+        last_pc = self.pc
+        end = self.debugger.get_record_insn_number()
+        count = self.reverse_over_call(name, return_address)
+        if count == None:
+            return None
+
+        args = [self.parser.get_call_arg(x) for x in range(arg_count)]
+        summary = summarize(args, self)
+        if summary == None:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_WARNING, \
+                    "Could not summarize call to %s" % name)
+            if end != None:
+                self.debugger.record_goto(end)
+            self.pc = last_pc
+            return None
+        (dest,size),sources = summary
+
+        # The call instruction itself is left for the slice to process, so
+        # the summary only has the operands of the function's body
+        insn = Insn(self.pc)
+        insn.text = self.parser.parse_insn(self.pc).text
+        insn.comment = "<%s summary>" % name
+        for x in range(arg_count):
+            self.parser.parse_arg(self.parser.get_call_arg_text(x), insn, \
+                    OPERAND_DIRECTION_SRC)
+        for address,length in sources:
+            if length > 0:
+                insn.add_operand(Operand(OPERAND_TYPE_MEMORY, False, \
+                        address, 0, length), OPERAND_DIRECTION_SRC)
+        self.parser.parse_arg(self.parser.get_return_register(), insn, \
+                OPERAND_DIRECTION_DST)
+        if size > 0:
+            insn.add_operand(Operand(OPERAND_TYPE_MEMORY, False, dest, 0, \
+                    size), OPERAND_DIRECTION_DST)
+
+        self.summarized_calls.append((self.pc, name, count))
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_INFO, \
+                "Summarized call to %s (%d instructions)" % (name, count))
+        return insn
+
+    # Determines if the recording at position is at an iteration of the rep
+    # instruction at pc with count iterations left
+    def is_rep_iteration(self, position, pc, count):
+        self.debugger.record_goto(position)
+        return self.debugger.get_pc() == pc and \
+                self.debugger.get_register( \
+                self.parser.get_count_register()) == count
+
+    # Moves the recording back to the first iteration of the rep instruction
+    # at pc. Iterations are at consecutive record positions and each one
+    # decrements the count register, so the first iteration is found by
+    # galloping back and then bisecting. Returns the number of iterations
+    # before the current one, or None if the recording cannot be moved
+    def find_rep_start(self, pc):
+        position = self.debugger.get_record_insn_number()
+        first = self.debugger.get_record_bounds()[0]
+        if position == None or first == None:
+            return None
+        count = self.debugger.get_register(self.parser.get_count_register())
+
+        good = 0
+        bad = None
+        step = 1
+        while bad == None:
+            if position - good - step < first:
+                bad = position - first + 1
+            elif not self.is_rep_iteration(position - good - step, pc, \
+                    count + good + step):
+                bad = good + step
+            else:
+                good = good + step
+                step = step * 2
+
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            if self.is_rep_iteration(position - middle, pc, count + middle):
+                good = middle
+            else:
+                bad = middle
+
+        self.debugger.record_goto(position - good)
+        return good
+
+    # Parses a rep movs or rep stos as a single instruction covering every
+    # iteration up to the current one, moving the recording back to the
+    # first iteration. Collapsed instructions are recorded as (pc, number of
+    # iterations)
+    def collapse_rep(self):
+        # A rep with no iterations left does not write memory
+        if self.debugger.get_register(self.parser.get_count_register()) == 0:
+            return self.parser.parse_insn(self.pc)
+
+        before = self.find_rep_start(self.pc)
+        if before == None:
+            return self.parser.parse_insn(self.pc)
+
+        iterations = before + 1
+        insn = self.parser.parse_insn(self.pc)
+        self.parser.parse_arg(self.parser.get_count_register(), insn, \
+                OPERAND_DIRECTION_BOTH)
+
+        # Widen the memory of the first iteration to the memory of all of them
+        backwards = self.parser.is_direction_backwards()
+        for operand in insn.src_list + insn.dest_list:
+            if operand.operand_type != OPERAND_TYPE_MEMORY:
+                continue
+            length = operand.size * iterations
+            if backwards:
+                operand.address = operand.address - length + operand.size
+            operand.size = length
+            operand.value = 0
+
+        insn.comment = "<%d iterations>" % iterations
+        self.collapsed_reps.append((self.pc, iterations))
+        return insn
+
+    # Reverses to the last instruction which wrote tracked memory. Falls back
+    # to reverse stepping when registers are tracked or there are not enough
+    # watchpoints for all tracked memory
+    def reverse_to_write(self):
+        try:
+            use_watchpoints = pydslice_debugger.use_watchpoints
+        except NameError:
+            use_watchpoints = pydslice.pydslice_debugger.use_watchpoints
+
+        chunks = None
+        if use_watchpoints:
+            chunks = self.watchpoints.schedule(self.operand_list)
+        if chunks == None:
+            return self.reverse_step()
+
+        self.parser.step_cleanup()
+        self.last_pc = self.pc
+        found = self.debugger.reverse_to_write(chunks)
+        self.pc = self.debugger.get_pc()
+
+        if not found and self.pc == self.last_pc:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "Reached end of recording")
+            return False
+
+        # read() syscalls need the return value of the syscall
+        if self.parser.get_opcode(self.pc) in ["syscall", "sysenter"]:
+            self.debugger.step()
+            self.parser.step_cleanup()
+            self.debugger.reverse_step()
+            return True
+
+        try:
+            summarize_library = pydslice_debugger.summarize_library
+        except NameError:
+            summarize_library = pydslice.pydslice_debugger.summarize_library
+
+        # A write inside a summarized library function is handled by
+        # summarizing the whole call
+        if summarize_library:
+            self.summary_insn = self.summarize_library_call()
         return True
     
     # Computes the rest of the slice or steps to the next slice instruction
     def compute_slice(self, stepping):
+        self.return_to_frontier()
 
         if not self.operand_list:
             self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "No operands to track. " \
                     "Add new operands with 'slice operand add' or " \
                     "'slice new crashed'")
 
+        try:
+            collapse_rep = pydslice_debugger.collapse_rep
+        except NameError:
+            collapse_rep = pydslice.pydslice_debugger.collapse_rep
+
         self.keep_going = True
+        self.stepping = stepping
         self.pc = self.debugger.get_pc()
 
         while self.keep_going:
-            self.insn = self.parser.parse_insn(self.pc)
-            found_insn,found_operand = self.compute_insn(self.insn)
+            found_insn = False
+            found_operand = False
+            self.insns_checked = self.insns_checked + 1
+
+            # A summarized call is processed before its call instruction,
+            # which the recording is left at
+            summarized = self.summary_insn != None and \
+                    self.summary_insn.pc == self.pc
+            if summarized:
+                self.insn = self.summary_insn
+                found_insn,found_operand = self.compute_insn(self.insn)
+            elif collapse_rep and self.parser.is_rep_string(self.pc):
+                self.insn = self.collapse_rep()
+                found_insn,found_operand = self.compute_insn(self.insn)
+            elif self.may_define(self.pc):
+                self.insn = self.parser.parse_insn(self.pc)
+                found_insn,found_operand = self.compute_insn(self.insn)
+            else:
+                self.insns_filtered = self.insns_filtered + 1
+            self.summary_insn = None
             
             # If we found an instruction in the slice, add to list and get line
             if found_insn:
@@ -269,8 +948,9 @@ class Slice():
                 self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "Slice complete")
                 break
 
-            if not self.reverse_step():
+            if not summarized and not self.reverse_to_write():
                 break
+            self.autosave()
 
             if found_operand:
                 self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
@@ -0,0 +1,192 @@
+# pydslice_auto_record.py
+#
+# Records only the end of a program's execution
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+# GDB's record full slows the program down enormously, so recording from
+# main is only practical for short runs. Auto recording runs the program
+# twice. The first run is not recorded and finds the functions on the stack
+# where the program stopped. The second run starts recording at the entry of
+# one of them, when it is called from the same call sites as in the first
+# run.
+
+import gdb
+
+try:
+    import pydslice_debugger
+    from pydslice_debugger import *
+except ImportError:
+    import pydslice.pydslice_debugger
+    from pydslice.pydslice_debugger import *
+
+# Stack frame recording starts at by default: the caller of the function the
+# program stopped in
+AUTO_RECORD_LEVEL = 1
+
+# Number of call sites compared to find the invocation of a start point
+AUTO_RECORD_CALLERS = 8
+
+# Prints string to gdb based on current debug level
+def auto_record_print(level, str):
+    try:
+        current_level = pydslice_debugger.debug_print_level
+    except NameError:
+        current_level = pydslice.pydslice_debugger.debug_print_level
+
+    if level <= current_level:
+        gdb.write(str + '\n')
+        gdb.flush()
+
+# Gets the return addresses of the callers of a frame, innermost first
+def get_callers(frame, count=AUTO_RECORD_CALLERS):
+    callers = []
+    frame = frame.older()
+    while frame and len(callers) < count:
+        callers.append(frame.pc())
+        frame = frame.older()
+    return callers
+
+# Determines if the program is still running
+def is_running():
+    return gdb.selected_inferior().pid != 0
+
+# Runs the program from its beginning without asking to restart it
+def run_program():
+    confirm = gdb.parameter("confirm")
+    gdb.execute("set confirm off", False, True)
+    try:
+        gdb.execute("run", False)
+    finally:
+        if confirm:
+            gdb.execute("set confirm on", False, True)
+
+# A function on the stack of the first run
+class StartPoint():
+    level = 0
+    name = ""
+    filename = ""
+    callers = []
+
+    # Initializes the start point from a frame of the first run
+    def __init__(self, level, frame):
+        self.level = level
+        self.name = frame.name()
+        self.filename = ""
+        sal = frame.find_sal()
+        if sal and sal.symtab:
+            self.filename = sal.symtab.filename
+        self.callers = get_callers(frame)
+
+    def to_string(self):
+        if self.filename:
+            return "#%d %s (%s)" % (self.level, self.name, self.filename)
+        return "#%d %s" % (self.level, self.name)
+
+# Breakpoint on a start point which only stops when the function was called
+# from the same call sites as in the first run
+class StartPointBreakpoint(gdb.Breakpoint):
+    callers = []
+    reached = False
+
+    # Sets the breakpoint on the entry of the function of a start point, so
+    # the recording includes the prologue
+    def __init__(self, start_point):
+        gdb.Breakpoint.__init__(self, "*" + start_point.name, \
+                gdb.BP_BREAKPOINT, 0, True)
+        self.callers = start_point.callers
+        self.reached = False
+
+    def stop(self):
+        callers = get_callers(gdb.newest_frame(), len(self.callers))
+        self.reached = callers == self.callers
+        return self.reached
+
+# Records the end of a program's execution
+class AutoRecorder():
+    start_points = []
+
+    # Initializes the recorder
+    def __init__(self):
+        self.start_points = []
+
+    # Runs the program without recording and finds the functions on the
+    # stack when it stops. Returns False if the program exited
+    def find_start_points(self):
+        run_program()
+        if not is_running():
+            auto_record_print(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "Program exited without stopping")
+            return False
+
+        self.start_points = []
+        frame = gdb.newest_frame()
+        level = 0
+        while frame:
+            if frame.name():
+                self.start_points.append(StartPoint(level, frame))
+            frame = frame.older()
+            level = level + 1
+
+        auto_record_print(DEBUG_PRINT_LEVEL_ALWAYS, "Start points:")
+        for start_point in self.start_points:
+            auto_record_print(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "  " + start_point.to_string())
+        return True
+
+    # Gets the start point at a stack level, or the nearest one above it
+    def get_start_point(self, level):
+        for start_point in self.start_points:
+            if start_point.level >= level:
+                return start_point
+        if self.start_points:
+            return self.start_points[-1]
+        return None
+
+    # Runs the program again and records from the entry of a start point
+    # until the program stops. max_insns limits the recording to the last
+    # instructions executed
+    def record(self, start_point, max_insns=None):
+        breakpoint = StartPointBreakpoint(start_point)
+        try:
+            run_program()
+        finally:
+            reached = breakpoint.reached
+            breakpoint.delete()
+
+        if not reached or not is_running():
+            auto_record_print(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "Program did not reach %s" % start_point.to_string())
+            return False
+
+        if max_insns != None:
+            gdb.execute("set record full insn-number-max %d" % max_insns, \
+                    False, True)
+            gdb.execute("set record full stop-at-limit off", False, True)
+        gdb.execute("record full", False, True)
+        auto_record_print(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "Recording from %s" % start_point.to_string())
+        gdb.execute("continue", False)
+        return True
+
+    # Finds the start points, then records from the one at a stack level
+    def run(self, level=AUTO_RECORD_LEVEL, max_insns=None):
+        if not self.find_start_points():
+            return False
+
+        start_point = self.get_start_point(level)
+        if start_point == None:
+            auto_record_print(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "No function on the stack to start recording at")
+            return False
+
+        # Pending breakpoints are needed for functions in shared libraries
+        pending = gdb.parameter("breakpoint pending")
+        gdb.execute("set breakpoint pending on", False, True)
+        try:
+            return self.record(start_point, max_insns)
+        finally:
+            if pending == None:
+                gdb.execute("set breakpoint pending auto", False, True)
+            elif not pending:
+                gdb.execute("set breakpoint pending off", False, True)
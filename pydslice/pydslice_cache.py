@@ -0,0 +1,77 @@
+# pydslice_cache.py
+#
+# Size bounded least recently used cache
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+from collections import OrderedDict
+
+class LRUCache():
+    max_size = 0
+    entries = None
+    hits = 0
+    misses = 0
+
+    # Initializes the cache. At most max_size entries are kept
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    # Returns the entry for key, or None if key is not cached. Entries for
+    # which validate returns False are removed
+    def get(self, key, validate=None):
+        if key not in self.entries:
+            self.misses = self.misses + 1
+            return None
+        if validate and not validate(self.entries[key]):
+            self.entries.pop(key)
+            self.misses = self.misses + 1
+            return None
+        self.hits = self.hits + 1
+
+        # Move entry to the most recently used end
+        value = self.entries.pop(key)
+        self.entries[key] = value
+        return value
+
+    # Returns the entry for key without counting or reordering it
+    def peek(self, key):
+        return self.entries.get(key)
+
+    # Adds an entry, evicting the least recently used entry if full
+    def put(self, key, value):
+        if key in self.entries:
+            self.entries.pop(key)
+        elif len(self.entries) >= self.max_size:
+            self.entries.popitem(last=False)
+        self.entries[key] = value
+
+    # Removes an entry
+    def remove(self, key):
+        if key in self.entries:
+            self.entries.pop(key)
+
+    # Removes all entries and resets the counters
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    # Returns a human-readable summary of the cache usage
+    def to_string(self):
+        total = self.hits + self.misses
+        if total:
+            rate = 100.0 * self.hits / total
+        else:
+            rate = 0.0
+        return "%d/%d entries, %d hits, %d misses (%.1f%% hit rate)" % \
+                (len(self.entries), self.max_size, self.hits, self.misses, rate)
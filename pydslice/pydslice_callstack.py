@@ -0,0 +1,67 @@
+# pydslice_callstack.py
+#
+# Shadow call stack maintained while walking the recording backwards
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+# Call stack of (function, file) entries, innermost last. Counts of the
+# functions and files on the stack make membership tests O(1)
+class ShadowCallStack():
+    frames = []
+    functions = {}
+    files = {}
+    valid = False
+
+    # Initializes an empty, invalid call stack
+    def __init__(self):
+        self.invalidate()
+
+    # Discards the call stack. It must be reset before it is used again
+    def invalidate(self):
+        self.frames = []
+        self.functions = {}
+        self.files = {}
+        self.valid = False
+
+    # Replaces the call stack with frames, given innermost first
+    def reset(self, frames):
+        self.invalidate()
+        for function,filename in reversed(frames):
+            self.push(function, filename)
+        self.valid = True
+
+    # Adds a frame for a function entered while walking backwards
+    def push(self, function, filename):
+        self.frames.append((function, filename))
+        self.functions[function] = self.functions.get(function, 0) + 1
+        self.files[filename] = self.files.get(filename, 0) + 1
+
+    # Removes the innermost frame
+    def pop(self):
+        if not self.frames:
+            self.valid = False
+            return
+        function,filename = self.frames.pop()
+        self.remove_count(self.functions, function)
+        self.remove_count(self.files, filename)
+
+    # Decrements the count of key
+    def remove_count(self, counts, key):
+        counts[key] = counts[key] - 1
+        if counts[key] == 0:
+            del counts[key]
+
+    # Returns the innermost function, or "" if the stack is empty
+    def current_function(self):
+        if not self.frames:
+            return ""
+        return self.frames[-1][0]
+
+    # Determines if function is on the call stack
+    def contains_function(self, function):
+        return function in self.functions
+
+    # Determines if a function of filename is on the call stack
+    def contains_file(self, filename):
+        return filename in self.files
@@ -0,0 +1,134 @@
+# pydslice_checkpoint.py
+#
+# Saves and restores the state of a slice computation
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+# A checkpoint is a JSON Lines file. The first line holds the slice state
+# and each following line is an instruction in the slice. Match functions
+# of operands are saved by module and function name and looked up again
+# when the checkpoint is restored.
+
+import importlib
+import json
+import os
+import sys
+
+try:
+    from pydslice_debugger import *
+    from pydslice_operand import *
+    from pydslice_operand_set import *
+    from pydslice_sink import *
+except ImportError:
+    from pydslice.pydslice_debugger import *
+    from pydslice.pydslice_operand import *
+    from pydslice.pydslice_operand_set import *
+    from pydslice.pydslice_sink import *
+
+CHECKPOINT_VERSION = 1
+
+# Gets the name a function is saved under, or None
+def function_to_name(function):
+    if function == None:
+        return None
+    return [function.__module__, function.__name__]
+
+# Looks up a function saved by function_to_name. Returns None if its module
+# cannot be found
+def name_to_function(name):
+    if name == None:
+        return None
+    module,function = name
+    if module not in sys.modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            return None
+    return getattr(sys.modules[module], function, None)
+
+# Serializes a tracked operand
+def tracked_operand_to_list(operand):
+    return operand_to_list(operand) + [operand.criteria, \
+            function_to_name(operand.match_function)]
+
+# Creates a tracked operand from its serialized form
+def tracked_operand_from_list(data, debugger):
+    operand = operand_from_list(data)
+    operand.criteria = data[7]
+    operand.match_function = name_to_function(data[8])
+    if data[8] != None and operand.match_function == None:
+        debugger.print_msg(DEBUG_PRINT_LEVEL_WARNING, \
+                "Match function %s.%s not found" % tuple(data[8]))
+    return operand
+
+# Writes the state of a slice to a checkpoint file. The file is replaced
+# only once it is complete
+def write_checkpoint(slice, path, callbacks):
+    state = {}
+    state['version'] = CHECKPOINT_VERSION
+    state['architecture'] = slice.debugger.get_architecture()
+    state['position'] = slice.get_position()
+    state['pc'] = slice.pc
+    state['signal'] = slice.signal
+    state['monitor_stack'] = slice.get_monitor_stack()
+    state['criteria'] = slice.criteria
+    state['operands'] = [tracked_operand_to_list(x) for x in \
+            slice.operand_list]
+    state['followed_operand'] = None
+    if slice.followed_operand != None:
+        state['followed_operand'] = \
+                tracked_operand_to_list(slice.followed_operand)
+    state['plugins'] = {}
+    for name,(save,restore) in callbacks.items():
+        state['plugins'][name] = save(slice)
+
+    temp_path = path + ".tmp"
+    count = 0
+    with open(temp_path, 'w') as f:
+        f.write(json.dumps(state) + "\n")
+        for insn in slice.insn_list:
+            f.write(json.dumps(insn_to_list(insn)) + "\n")
+            count = count + 1
+    os.rename(temp_path, path)
+    return count
+
+# Restores the state of a slice from a checkpoint file
+def read_checkpoint(slice, path, callbacks):
+    with open(path, 'r') as f:
+        state = json.loads(f.readline())
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise ValueError("Unsupported checkpoint version in %s" % path)
+        if state['architecture'] != slice.debugger.get_architecture():
+            raise ValueError("Checkpoint is for %s, not %s" % \
+                    (state['architecture'], \
+                    slice.debugger.get_architecture()))
+
+        slice.set_position(state['position'])
+        if slice.pc != state['pc']:
+            slice.debugger.print_msg(DEBUG_PRINT_LEVEL_WARNING, \
+                    "Checkpoint was at 0x%x but the recording is at 0x%x" % \
+                    (state['pc'], slice.pc))
+
+        slice.signal = state['signal']
+        slice.set_monitor_stack(state['monitor_stack'])
+        slice.criteria = state['criteria']
+        slice.operand_list = OperandSet()
+        for data in state['operands']:
+            slice.add_operand(tracked_operand_from_list(data, slice.debugger))
+        slice.followed_operand = None
+        if state['followed_operand'] != None:
+            slice.followed_operand = tracked_operand_from_list( \
+                    state['followed_operand'], slice.debugger)
+
+        slice.close_sink(False)
+        slice.insn_list = []
+        for line in f:
+            slice.insn_list.append(insn_from_list(json.loads(line)))
+
+    for name,data in state['plugins'].items():
+        if name in callbacks:
+            callbacks[name][1](slice, data)
+        else:
+            slice.debugger.print_msg(DEBUG_PRINT_LEVEL_WARNING, \
+                    "Plugin %s is not loaded, its state was not restored" % \
+                    name)
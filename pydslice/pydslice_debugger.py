@@ -21,6 +21,23 @@ DEBUG_SYMBOL_LEVEL_VARIABLES = 2
 
 debug_symbol_level = DEBUG_SYMBOL_LEVEL_LINES
 
+# Use hardware watchpoints to find writes to tracked memory. Off by default
+# because a write watchpoint misses stores of the value already in memory
+use_watchpoints = False
+
+# Reverse over calls to functions which cannot write tracked operands
+skip_calls = True
+
+# Summarize calls to C library memory and string functions
+summarize_library = True
+
+# Handle the iterations of rep movs and rep stos as one instruction
+collapse_rep = True
+
+# Checkpoint file saved every autosave_interval instructions, or None
+autosave_path = None
+autosave_interval = 100000
+
 class Debugger():
    
     # Initializes the debugger interface
@@ -31,6 +48,10 @@ class Debugger():
     def print_msg(self, level, str):
         pass
 
+    # Releases the debugger interface once its slice is replaced
+    def release(self):
+        pass
+
     # Gets the value of $pc
     def get_pc(self):
         pass
@@ -51,6 +72,24 @@ class Debugger():
     def read_byte(self,address):
         pass
 
+    # Retrieves length bytes from memory of the debugged process
+    def read_memory(self, address, length):
+        return bytearray([self.read_byte("0x%x" % (address + i)) for i in \
+                range(0, length)])
+
+    # Retrieves the memory range [address, address + length) as a memoryview
+    def read_range(self, address, length):
+        return memoryview(self.read_memory(address, length))
+
+    # Gets the value of a register as an unsigned integer
+    def get_register(self, name):
+        return 0
+
+    # Gets the length of the instruction at pc. Defaults to the longest
+    # possible x86 instruction
+    def get_insn_length(self, pc):
+        return 15
+
     # Disassembles the instruction at pc
     def disassemble(self, address, length):
         pass
@@ -59,8 +98,9 @@ class Debugger():
     def setup_slice(self, slice, init_callbacks):
         pass
 
-    # Gets symbol information about the current line of code
-    def get_line_info(self):
+    # Gets symbol information about the line of code at pc, or at the current
+    # pc if none is given
+    def get_line_info(self, pc=None):
         pass
 
     # Get symbol info for address
@@ -71,6 +111,48 @@ class Debugger():
     def is_address_executable(self, address):
         pass
 
+    # Finds the memory region (section or mapping) containing address
+    def get_region(self, address):
+        return None
+
+    # Gets the record instruction number of the current position
+    def get_record_insn_number(self):
+        return None
+
+    # Gets the lowest and highest recorded instruction numbers
+    def get_record_bounds(self):
+        return None,None
+
+    # Moves the recording to the specified instruction number
+    def record_goto(self, position):
+        pass
+
+    # Reverses execution until one of the (address, size) memory chunks is
+    # written. Returns True if a write was found
+    def reverse_to_write(self, chunks):
+        return False
+
+    # Reverses execution to the call of the current function
+    def reverse_finish(self):
+        pass
+
+    # Disassembles the function containing pc. Returns a list of the
+    # (address, text) of its instructions
+    def disassemble_function(self, pc):
+        return []
+
+    # Gets the name and source file of the function containing pc
+    def get_function(self, pc):
+        return "",""
+
+    # Updates the call stack after a reverse step landed on pc
+    def update_call_stack(self, pc, get_opcode):
+        pass
+
+    # Gets the name of the function containing pc
+    def get_current_function(self):
+        return ""
+
     # Determines if pc is inside specified file
     def inside_file(self, filename):
         return False
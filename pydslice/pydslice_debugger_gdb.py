@@ -13,11 +13,48 @@ try:
     from pydslice_debugger import *
     from pydslice_parser_x86 import Parser
     from pydslice_operand import *
+    from pydslice_x86_defs import *
+    from pydslice_cache import LRUCache
+    from pydslice_symbols import *
+    from pydslice_sections import *
+    from pydslice_callstack import ShadowCallStack
 except ImportError:
     import pydslice.pydslice_debugger
     from pydslice.pydslice_debugger import *
     from pydslice.pydslice_parser_x86 import Parser
     from pydslice.pydslice_operand import *
+    from pydslice.pydslice_x86_defs import *
+    from pydslice.pydslice_cache import LRUCache
+    from pydslice.pydslice_symbols import *
+    from pydslice.pydslice_sections import *
+    from pydslice.pydslice_callstack import ShadowCallStack
+
+# Size of the pages cached by read_range
+PAGE_SIZE = 0x1000
+
+# Number of frames whose locals are indexed by get_addr_info
+FRAME_INDEX_CACHE_SIZE = 64
+
+# Number of pcs whose line information is kept
+LINE_INFO_CACHE_SIZE = 4096
+
+# Number of pcs whose enclosing function is kept
+FUNCTION_CACHE_SIZE = 4096
+
+# Number of data addresses whose minimal symbol is kept
+DATA_SYMBOL_CACHE_SIZE = 4096
+
+# Bytes skipped at a time while looking for the next compilation unit in
+# code without debug information
+GLOBAL_INDEX_STRIDE = 16
+
+# Types used to watch memory chunks of each size
+watch_types = {
+    1 : "unsigned char",
+    2 : "unsigned short",
+    4 : "unsigned int",
+    8 : "unsigned long long",
+}
 
 gdb_signals = [
     "",
@@ -174,16 +211,108 @@ gdb_signals = [
     "NULL3"
     ]
 
+# Disassembles the instruction at an address. Falls back to the executable's
+# sections when there is no live process
+def disassemble_address(address):
+    try:
+        architecture = gdb.selected_frame().architecture()
+        return architecture.disassemble(address)[0]['asm'].split('#')[0]
+    except gdb.error:
+        pass
+    gdb.execute("set disassembly-flavor intel", False, to_string=True)
+    output = gdb.execute("x/i 0x%x" % address, False, True)
+    return output.split(":\t", 1)[-1].split('#')[0].strip()
+
 class GDBDebugger(Debugger):
     architecture = None
+    registers_table = None
+    registers = {}
+    pages = {}
+    global_index = None
+    frame_indexes = None
+    pointer_values = {}
+    sections = None
+    mappings = None
+    line_info = None
+    functions = None
+    data_symbols = None
+    call_stack = None
+    stepping = False
+    handlers = []
 
     # Initializes the gdb debugger interface
     def __init__(self):
         self.architecture = gdb.selected_frame().architecture()
+        if "64" in self.architecture.name():
+            self.registers_table = x86_64_registers
+        else:
+            self.registers_table = x86_registers
+        self.registers = {}
+        self.pages = {}
+        self.global_index = None
+        self.frame_indexes = LRUCache(FRAME_INDEX_CACHE_SIZE)
+        self.pointer_values = {}
+        self.sections = None
+        self.mappings = None
+        self.line_info = LRUCache(LINE_INFO_CACHE_SIZE)
+        self.functions = LRUCache(FUNCTION_CACHE_SIZE)
+        self.data_symbols = LRUCache(DATA_SYMBOL_CACHE_SIZE)
+        self.call_stack = ShadowCallStack()
+        self.stepping = False
+        self.handlers = []
         
         # our parser expects certain settings from gdb
         gdb.execute("set radix 0x10", False, to_string=True)
         gdb.execute("set disassembly-flavor intel", False, to_string=True)
+
+        # Register and memory values are only valid until the process moves
+        self.connect("stop", self.stopped)
+        self.connect("register_changed", self.invalidate_cache)
+        self.connect("memory_changed", self.invalidate_cache)
+
+        # Newly loaded objfiles are picked up by rebuilding the symbol
+        # indexes and the section map
+        self.connect("new_objfile", self.invalidate_symbols)
+        self.connect("clear_objfiles", self.invalidate_symbols)
+
+    # Connects a handler to a gdb event, if this gdb has the event
+    def connect(self, name, handler):
+        event = getattr(gdb.events, name, None)
+        if event == None:
+            return
+        event.connect(handler)
+        self.handlers.append((event, handler))
+
+    # Disconnects the event handlers so the debugger interface is no longer
+    # kept alive and updated by gdb
+    def release(self):
+        for event,handler in self.handlers:
+            event.disconnect(handler)
+        self.handlers = []
+
+    # Handles the process stopping. The call stack is only kept across
+    # reverse steps of the slice
+    def stopped(self, event=None):
+        self.invalidate_cache()
+        if not self.stepping:
+            self.call_stack.invalidate()
+
+    # Discards the register values and memory pages read since the last step
+    def invalidate_cache(self, event=None):
+        self.registers = {}
+        self.pages = {}
+        self.pointer_values = {}
+
+    # Discards the symbol indexes and the section map
+    def invalidate_symbols(self, event=None):
+        self.global_index = None
+        self.frame_indexes.clear()
+        self.sections = None
+        self.mappings = None
+        self.line_info.clear()
+        self.functions.clear()
+        self.data_symbols.clear()
+        self.call_stack.invalidate()
     
     # Prints string to gdb based on current debug level
     def print_msg(self, level, str):
@@ -202,12 +331,71 @@ class GDBDebugger(Debugger):
 
     # Reverses execution of the debugged process by one step
     def reverse_step(self):
-        gdb.execute("reverse-stepi", False, to_string=True)
+        self.invalidate_cache()
+        self.stepping = True
+        try:
+            gdb.execute("reverse-stepi", False, to_string=True)
+        finally:
+            self.stepping = False
 
     # Executes the debugged process by one step
     def step(self):
+        self.invalidate_cache()
+        self.call_stack.invalidate()
         gdb.execute("stepi", False, to_string=True)
 
+    # Gets the record instruction number of the current position. Returns None
+    # when the process is not replaying the recording
+    def get_record_insn_number(self):
+        inforecord = gdb.execute("info record", False, True)
+        m = re.search("Current instruction number is ([0-9]+)", inforecord)
+        if m:
+            return int(m.group(1))
+        return None
+
+    # Gets the lowest and highest recorded instruction numbers
+    def get_record_bounds(self):
+        inforecord = gdb.execute("info record", False, True)
+        low = re.search("Lowest recorded instruction number is ([0-9]+)", \
+                inforecord)
+        high = re.search("Highest recorded instruction number is ([0-9]+)", \
+                inforecord)
+        if not low or not high:
+            return None,None
+        return int(low.group(1)),int(high.group(1))
+
+    # Moves the recording to the specified instruction number, "begin" or "end"
+    def record_goto(self, position):
+        self.invalidate_cache()
+        self.call_stack.invalidate()
+        gdb.execute("record goto %s" % position, False, to_string=True)
+
+    # Reverses execution to the call of the current function
+    def reverse_finish(self):
+        self.invalidate_cache()
+        self.stepping = True
+        try:
+            gdb.execute("reverse-finish", False, to_string=True)
+        finally:
+            self.stepping = False
+        self.call_stack.pop()
+
+    # Reverses execution until one of the (address, size) memory chunks is
+    # written. Returns True if a write was found
+    def reverse_to_write(self, chunks):
+        watchpoints = []
+        try:
+            for address,size in chunks:
+                watchpoints.append(gdb.Breakpoint("*(%s *) 0x%x" % \
+                        (watch_types[size], address), gdb.BP_WATCHPOINT, \
+                        gdb.WP_WRITE, True))
+            self.invalidate_cache()
+            gdb.execute("reverse-continue", False, to_string=True)
+            return any(x.hit_count > 0 for x in watchpoints)
+        finally:
+            for watchpoint in watchpoints:
+                watchpoint.delete()
+
     # Returns the architecture for the process
     def get_architecture(self):
         return self.architecture.name()
@@ -216,8 +404,27 @@ class GDBDebugger(Debugger):
     def disassemble(self, pc):
         return self.architecture.disassemble(pc)[0]['asm'].split('#')[0]
    
-    # Gets symbol information about the current line of code
-    def get_line_info(self):
+    # Disassembles the function containing pc. Returns a list of the
+    # (address, text) of its instructions, or an empty list if no function
+    # contains pc
+    def disassemble_function(self, pc):
+        try:
+            output = gdb.execute("disassemble 0x%x" % pc, False, True)
+        except gdb.error:
+            return []
+
+        insns = []
+        for line in output.splitlines():
+            if ":\t" not in line:
+                continue
+            address,text = line.split(":\t", 1)
+            address = address.replace("=>", "").split()[0]
+            insns.append((int(address, 16), text.split('#')[0].strip()))
+        return insns
+
+    # Gets symbol information about the line of code at pc, or at the current
+    # pc if none is given
+    def get_line_info(self, pc=None):
         try:
             current_level = pydslice_debugger.debug_symbol_level
         except NameError:
@@ -226,19 +433,29 @@ class GDBDebugger(Debugger):
         if  current_level< DEBUG_SYMBOL_LEVEL_LINES:
             return "","",""
 
-        try:
-            infoline = gdb.execute("info line", False, True)
-            m = re.match("Line ([0-9]+) of \"(.*)\" .* (<.*>)", infoline, \
-                    re.I | re.M)
-            line = "%d" % (int(m.group(1)) - 1)
-            filename = m.group(2)
-            sym = m.group(3)
-        except:
-            line = ""
-            filename = ""
-            sym = ""
+        if pc == None:
+            pc = self.get_pc()
 
-        return line,filename,sym
+        info = self.line_info.get(pc)
+        if info == None:
+            info = self.find_line_info(pc)
+            self.line_info.put(pc, info)
+        return info
+
+    # Finds the line, file and function symbol of pc
+    def find_line_info(self, pc):
+        sal = gdb.find_pc_line(pc)
+        if not sal.symtab or not sal.line:
+            return "","",""
+
+        sym = ""
+        block = gdb.block_for_pc(pc)
+        while block and not block.function:
+            block = block.superblock
+        if block:
+            sym = "<%s+%d>" % (block.function.name, pc - block.start)
+
+        return "%d" % sal.line,sal.symtab.filename,sym
 
     # Get symbol info for address
     def get_addr_info(self, address):
@@ -250,68 +467,174 @@ class GDBDebugger(Debugger):
         if current_level < DEBUG_SYMBOL_LEVEL_VARIABLES:
             return ''
 
-        addr = '0x%x' % address
-        
-        # Is it a local?
-        all_locals = gdb.execute("info locals", False, True)
+        # Is it a local or an arg?
+        try:
+            index = self.get_frame_index(gdb.selected_frame())
+        except gdb.error:
+            index = None
+
+        if index:
+            for name,value in index.pointers:
+                if value() == address:
+                    return '<' + name + '>'
+            found = index.lookup(address)
+            if found:
+                return '<&' + symbol_to_string(*found) + '>'
 
-        for var in all_locals.split("\n"):
-            tok = var.split()
-            if len(tok) < 3:
-                continue
+        # Is it a global?
+        if self.global_index == None:
+            self.global_index = self.build_global_index()
+        found = self.global_index.lookup(address)
+        if found:
+            return '<' + symbol_to_string(*found) + '>'
+
+        # Variables without debug information, or of compilation units
+        # without code, only have minimal symbols
+        found = self.get_data_symbol(address)
+        if found:
+            return '<' + symbol_to_string(*found) + '>'
 
-            name = tok[0]
-            val = tok[2]
-            if addr == val:
-                return '<' + name + '>'
-            try:
-                ref = gdb.parse_and_eval('&' + name).__str__()
-                if addr == ref:
-                    return '<&' + name + '>'
-            except:
-                pass
-        
-        # Is it an arg?
-        all_args = gdb.execute("info args", False, True)
+        return ''
 
-        for var in all_args.split("\n"):
-            tok = var.split()
-            if len(tok) < 3:
+    # Finds the minimal symbol covering an address in a data section.
+    # Returns the name and the offset of address within the symbol, or None
+    def get_data_symbol(self, address):
+        region = self.get_region(address)
+        if region == None or \
+                region.region not in [REGION_DATA, REGION_BSS, REGION_RODATA]:
+            return None
+
+        found = self.data_symbols.get(address)
+        if found != None:
+            return found or None
+
+        found = ()
+        msymbol = gdb.execute("info symbol 0x%x" % address, False, True)
+        s = msymbol.split()
+        if len(s) >= 3 and s[1] == "+":
+            found = (s[0], int(s[2], 0))
+        elif s and not msymbol.startswith("No symbol"):
+            found = (s[0], 0)
+        self.data_symbols.put(address, found)
+        return found or None
+
+    # Gets the index of the locals and args of a frame. Indexes are kept for
+    # the innermost block of the frame and the stack pointer of its caller
+    def get_frame_index(self, frame):
+        try:
+            block = frame.block()
+        except RuntimeError:
+            return None
+        older = frame.older()
+        if older:
+            caller_sp = self.value_to_int(older.read_register('sp'))
+        else:
+            caller_sp = 0
+        key = (block.start, block.end, caller_sp)
+
+        index = self.frame_indexes.get(key)
+        if index == None:
+            index = self.build_frame_index(frame, block)
+            self.frame_indexes.put(key, index)
+        return index
+
+    # Builds the index of the locals and args visible in block
+    def build_frame_index(self, frame, block):
+        index = SymbolIndex()
+        while block:
+            for symbol in block:
+                if not symbol.is_variable and not symbol.is_argument:
+                    continue
+                try:
+                    value = symbol.value(frame)
+                except Exception:
+                    continue
+                if value.type.strip_typedefs().code == gdb.TYPE_CODE_PTR:
+                    index.add_pointer(symbol.name, \
+                            self.pointer_reader(symbol, frame))
+                if value.address is None:
+                    continue
+                index.add(self.value_to_int(value.address), \
+                        value.type.sizeof, symbol.name)
+            if block.function:
+                break
+            block = block.superblock
+        index.build()
+        return index
+
+    # Returns a function reading the value of a pointer variable once per step
+    def pointer_reader(self, symbol, frame):
+        key = (symbol.name, symbol.line, symbol.symtab.filename)
+
+        def read():
+            if key not in self.pointer_values:
+                try:
+                    value = self.value_to_int(symbol.value(frame))
+                except Exception:
+                    value = None
+                self.pointer_values[key] = value
+            return self.pointer_values[key]
+        return read
+
+    # Builds the index of global and static variables from the symbol tables
+    def build_global_index(self):
+        index = SymbolIndex()
+        if self.sections == None:
+            self.sections = self.build_section_map()
+
+        # Compilation units are found through the blocks of the code they
+        # contain, skipping from the end of each one to the next
+        seen = set()
+        for region in self.sections:
+            if not region.executable:
                 continue
-            name = tok[0]
-            val = tok[2]
-            if addr == val:
-                return '<' + name + '>'
-            
-            try:
-                ref = gdb.parse_and_eval('&' + name).__str__()
-                if addr == ref:
-                    return '<&' + name + '>'
-            except:
-                pass
-
-        # Is it a global?
-        all_globals = gdb.execute("info variables", False, True)
-
-        for var in all_globals.split("\n")[3:]:
-            tok = var.split()
-            if len(tok) < 2:
+            pc = region.start
+            while pc < region.end:
+                try:
+                    block = gdb.block_for_pc(pc)
+                except RuntimeError:
+                    block = None
+                if block == None:
+                    pc = pc + GLOBAL_INDEX_STRIDE
+                    continue
+
+                static_block = block.static_block
+                key = (static_block.start, static_block.end)
+                if key not in seen:
+                    seen.add(key)
+                    self.add_block_variables(index, block.global_block)
+                    self.add_block_variables(index, static_block)
+                pc = max(pc + 1, static_block.end)
+
+        index.build()
+        return index
+
+    # Adds the global or static variables of a global or static block to an
+    # index
+    def add_block_variables(self, index, block):
+        for symbol in block:
+            if not symbol.is_variable:
                 continue
-            name = tok[1]
-            val = tok[0]
-            if addr == val:
-                return '<' + name + '>'
             try:
-                ref = gdb.parse_and_eval('&' + name).__str__()
-                if addr == ref:
-                    return '<&' + name + '>'
-            except:
+                value = symbol.value()
+                index.add(self.value_to_int(value.address), \
+                        value.type.sizeof, symbol.name)
+            except Exception:
                 pass
 
-        return ''
+    # Converts a gdb integer or pointer value to an integer
+    def value_to_int(self, value):
+        mask = (1 << (8 * value.type.sizeof)) - 1
+        if value.type.strip_typedefs().code == gdb.TYPE_CODE_PTR:
+            value = value.cast(gdb.lookup_type('long'))
+        return int(value) & mask
  
-    # Evaluates an expression
+    # Evaluates an expression. Registers are read from the current step's
+    # register values
     def evaluate(self, expr):
+        m = re.match("^\$([a-z0-9]+)(\.uint128)?$", expr)
+        if m and m.group(1) in self.registers_table:
+            return self.get_register(m.group(1))
         try:
             val = int(gdb.parse_and_eval(expr).__str__().split()[0], 16)
             return val
@@ -332,11 +655,73 @@ class GDBDebugger(Debugger):
    
     # Retrieves a 1 byte value from memory of the debugged process
     def read_byte(self, address):
+        if isinstance(address, str):
+            address = int(address, 16)
+        return bytearray(self.read_range(address, 1))[0]
+
+    # Retrieves length bytes from memory of the debugged process
+    def read_memory(self, address, length):
         try:
-            mem = gdb.selected_inferior().read_memory(int(address,16), 1)
-            return int(mem.tobytes()[0])
+            mem = gdb.selected_inferior().read_memory(address, length)
+            return bytearray(mem.tobytes())
         except Exception:
-            return 0
+            return bytearray()
+
+    # Retrieves the memory range [address, address + length) as a memoryview.
+    # Ranges inside one page are served from the pages read during this step,
+    # larger ranges are read with a single inferior access. Unreadable memory
+    # reads as zeros
+    def read_range(self, address, length):
+        page = address & ~(PAGE_SIZE - 1)
+        offset = address - page
+        if offset + length <= PAGE_SIZE:
+            if page not in self.pages:
+                self.pages[page] = self.read_memory(page, PAGE_SIZE)
+            data = self.pages[page]
+            if len(data) == PAGE_SIZE:
+                return memoryview(data)[offset:offset + length]
+
+        data = self.read_memory(address, length)
+        if len(data) != length:
+            data = bytearray(length)
+        return memoryview(data)
+
+    # Reads a full register from the selected frame. Each register is read
+    # from gdb at most once per step
+    def read_register(self, name):
+        if name in self.registers:
+            return self.registers[name]
+        try:
+            value = gdb.selected_frame().read_register(name)
+            if value.type.code == gdb.TYPE_CODE_UNION:
+                value = value['uint128']
+            mask = (1 << (8 * value.type.sizeof)) - 1
+            if value.type.code == gdb.TYPE_CODE_PTR:
+                value = value.cast(gdb.lookup_type('long'))
+            try:
+                result = int(value) & mask
+            except gdb.error:
+                result = int(value.__str__().split()[0], 16) & mask
+        except Exception:
+            self.print_msg(DEBUG_PRINT_LEVEL_WARNING, \
+                    "GDB failed to read register %s" % name)
+            result = 0
+        self.registers[name] = result
+        return result
+
+    # Gets the value of a register or sub-register as an unsigned integer
+    def get_register(self, name):
+        if name not in self.registers_table:
+            return self.read_register(name)
+        value = self.read_register(self.registers_table[name][0])
+        if name in x86_subregisters:
+            shift,mask = x86_subregisters[name]
+            value = (value >> shift) & mask
+        return value
+
+    # Gets the length of the instruction at pc
+    def get_insn_length(self, pc):
+        return self.architecture.disassemble(pc)[0]['length']
 
     # Gets the signal value for the debugged process
     def get_signal(self):
@@ -345,21 +730,87 @@ class GDBDebugger(Debugger):
 
     # Determines if a given address is in executable memory
     def is_address_executable(self, address):
-        all_sections = gdb.execute("maintenance info sections", False, True)
-        sections = all_sections.split("\n")
-        for section in sections:
-            if "CODE" in section:
-                s = section.split()
-                if "->" in s[0]:
-                    mem_range = s[0].split("->")
+        region = self.get_region(address)
+        return region != None and region.executable
+
+    # Finds the section, or else the memory mapping, containing address.
+    # Returns a MemoryRegion or None
+    def get_region(self, address):
+        if self.sections == None:
+            self.sections = self.build_section_map()
+        region = self.sections.find(address)
+        if region:
+            return region
+
+        if self.mappings == None:
+            self.mappings = self.build_mapping_map()
+        return self.mappings.find(address)
+
+    # Builds the map of the loaded sections of all object files
+    def build_section_map(self):
+        sections = SectionMap()
+        try:
+            output = gdb.execute("maintenance info sections ALLOBJ", False, \
+                    True)
+        except gdb.error:
+            output = gdb.execute("maintenance info sections", False, True)
+
+        objfile = ""
+        for line in output.split("\n"):
+            m = re.match(".*(Exec|Object|Core) file:? `?([^',]*)", line)
+            if m:
+                objfile = m.group(2)
+                continue
+
+            s = line.split()
+            if len(s) < 2:
+                continue
+            if "->" in s[0]:
+                i = 0
+            elif "->" in s[1]:
+                i = 1
+            else:
+                continue
+
+            # Only sections loaded into memory can be matched
+            flags = s[i+4:]
+            if "LOAD" not in flags and "ALLOC" not in flags:
+                continue
+            if "LOAD" not in flags and not s[i+3].startswith(".bss"):
+                continue
+
+            mem_range = s[i].split("->")
+            sections.add(MemoryRegion(int(mem_range[0], 16), \
+                    int(mem_range[1], 16), s[i+3], objfile, \
+                    section_region(s[i+3], flags), "CODE" in flags))
+        sections.build()
+        return sections
+
+    # Builds the map of the memory mappings of the process
+    def build_mapping_map(self):
+        mappings = SectionMap()
+        try:
+            output = gdb.execute("info proc mappings", False, True)
+        except gdb.error:
+            output = ""
+
+        for line in output.split("\n"):
+            s = line.split()
+            if len(s) < 4 or not s[0].startswith("0x"):
+                continue
+
+            # Newer versions of gdb print the permissions of mappings
+            perms = ""
+            name = ""
+            for tok in s[4:]:
+                if re.match("^[r-][w-][x-][ps]$", tok):
+                    perms = tok
                 else:
-                    mem_range = s[1].split("->")
-                        
-                # is the address in the memory range of the section?
-                if address >= int(mem_range[0],16) and \
-                        address <= int(mem_range[1],16):
-                    return True 
-        return False 
+                    name = tok
+            mappings.add(MemoryRegion(int(s[0], 16), int(s[1], 16), name, \
+                    name, mapping_region(name), "x" in perms))
+        mappings.build()
+        return mappings
 
     # Performs initial callbacks
     def do_init_callbacks(self, init_callbacks, slice):
@@ -379,7 +830,7 @@ class GDBDebugger(Debugger):
 
         elif gdb_signals[slice.signal] == "SIGBUS":
             crash_insn = slice.parser.parse_insn(pc)
-            line,file,sym = self.get_line_info()
+            line,file,sym = self.get_line_info(pc)
             crash_insn.set_line_info(line,file,sym)
             slice.parser.monitor_stack = False
             slice.add_insn(crash_insn) 
@@ -400,7 +851,7 @@ class GDBDebugger(Debugger):
 
         elif gdb_signals[slice.signal] == "SIGSEGV":
             crash_insn = slice.parser.parse_insn(pc)
-            line,file,sym = self.get_line_info()
+            line,file,sym = self.get_line_info(pc)
             crash_insn.set_line_info(line,file,sym)
             slice.parser.monitor_stack = False
             slice.add_insn(crash_insn)
@@ -425,7 +876,7 @@ class GDBDebugger(Debugger):
              
         elif gdb_signals[slice.signal] == "SIGFPE":
             crash_insn = slice.parser.parse_insn(pc)
-            line,file,sym = self.get_line_info()
+            line,file,sym = self.get_line_info(pc)
             crash_insn.set_line_info(line,file,sym)
             slice.parser.monitor_stack = False
             slice.add_insn(crash_insn)
@@ -445,10 +896,10 @@ class GDBDebugger(Debugger):
             if self.is_address_executable(pc) == False:
                 if "64" in self.get_architecture():
                     operand = Operand(OPERAND_TYPE_REGISTER, False, "$rip", pc)
-                    operand.base_register = ['rip']
+                    operand.base_register = intern_base_register(['rip'])
                 else:
                     operand = Operand(OPERAND_TYPE_REGISTER, False, "$eip", pc)
-                    operand.base_register = ['eip']
+                    operand.base_register = intern_base_register(['eip'])
                 slice.add_operand(operand)
                 slice.parser.monitor_stack = True
                 self.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
@@ -463,23 +914,84 @@ class GDBDebugger(Debugger):
         
         self.reverse_step()
 
-    # Determines if pc is inside specified file
-    def inside_file(self, filename):
+    # Gets the name and file of the function containing pc
+    def get_function(self, pc):
+        function = self.functions.get(pc)
+        if function != None:
+            return function
+
+        name = ""
+        filename = ""
+        block = None
+        try:
+            block = gdb.block_for_pc(pc)
+        except RuntimeError:
+            pass
+        while block and not block.function:
+            block = block.superblock
+        if block:
+            name = block.function.name
+        else:
+            msymbol = gdb.execute("info symbol 0x%x" % pc, False, True)
+            if not msymbol.startswith("No symbol"):
+                name = msymbol.split()[0]
+
+        sal = gdb.find_pc_line(pc)
+        if sal.symtab:
+            filename = sal.symtab.filename
+
+        function = (name, filename)
+        self.functions.put(pc, function)
+        return function
+
+    # Rebuilds the shadow call stack from gdb's frames
+    def sync_call_stack(self):
+        frames = []
         frame = gdb.selected_frame()
         while frame:
+            name = frame.name()
+            if name:
+                name = name.__str__()
+            else:
+                name = ""
             sal = frame.find_sal()
-            if sal and sal.symtab and sal.symtab.filename == filename:
-                return True
+            if sal and sal.symtab:
+                frames.append((name, sal.symtab.filename))
+            else:
+                frames.append((name, ""))
             frame = frame.older()
-        return False
+        self.call_stack.reset(frames)
+
+    # Updates the shadow call stack after a reverse step landed on the
+    # instruction at pc. Landing on a ret enters the returning function,
+    # landing on a call leaves the called function. get_opcode is a function
+    # returning the opcode at pc
+    def update_call_stack(self, pc, get_opcode):
+        if not self.call_stack.valid:
+            return
+
+        opcode = get_opcode(pc)
+        if opcode.startswith("ret"):
+            self.call_stack.push(*self.get_function(pc))
+        elif opcode.startswith("call"):
+            self.call_stack.pop()
+            if self.call_stack.current_function() != self.get_function(pc)[0]:
+                self.call_stack.invalidate()
+
+    # Gets the shadow call stack, rebuilding it if needed
+    def get_call_stack(self):
+        if not self.call_stack.valid:
+            self.sync_call_stack()
+        return self.call_stack
+
+    # Gets the name of the function containing pc
+    def get_current_function(self):
+        return self.get_call_stack().current_function()
+
+    # Determines if pc is inside specified file
+    def inside_file(self, filename):
+        return self.get_call_stack().contains_file(filename)
     
     # Determines if pc is inside specified function
     def inside_function(self, function_name):
-        frame = gdb.selected_frame()
-        while frame:
-            frame_function = frame.name()
-            if frame_function:
-                if function_name == frame_function.__str__():
-                    return True
-            frame = frame.older()
-        return False
+        return self.get_call_stack().contains_function(function_name)
@@ -20,6 +20,12 @@ import traceback
 from array import *
 
 from pydslice import Slice
+from pydslice.pydslice_offline import OfflineSlice
+from pydslice.pydslice_record_file import record_file_to_trace, \
+        policy_recording_to_trace, POLICY_MANIFEST_SUFFIX
+from pydslice.pydslice_auto_record import AutoRecorder, AUTO_RECORD_LEVEL
+from pydslice.pydslice_policy import PolicyRecorder, read_policy
+from pydslice.pydslice_debugger_gdb import disassemble_address
 from pydslice.pydslice_debugger import * 
 
 # Import pydslice plug-ins here:
@@ -76,6 +82,119 @@ class CmdSliceSave(gdb.Command):
             traceback.print_exc()
 CmdSliceSave()
 
+class CmdSliceCheckpoint(gdb.Command):
+    """Saves the slice state to a checkpoint file"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice checkpoint", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        global slice
+
+        if slice == None:
+            gdb.write("Slice not initialized. Execute 'slice new' or " \
+                    "'slice new crashed'\n")
+            return
+        try:
+            if not arg:
+                gdb.write("Usage: slice checkpoint <file path>\n")
+            else:
+                slice.checkpoint(arg)
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceCheckpoint()
+
+class CmdSliceResume(gdb.Command):
+    """Restores the slice state from a checkpoint file"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice resume", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        global slice
+        try:
+            if not arg:
+                gdb.write("Usage: slice resume <file path>\n")
+                return
+            # Trace slices resume in the loaded trace
+            if not isinstance(slice, OfflineSlice):
+                if slice != None:
+                    slice.release()
+                    slice = None
+                slice = Slice()
+            slice.resume(arg)
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceResume()
+
+class CmdSliceAutosave(gdb.Command):
+    """Saves a checkpoint periodically while computing the slice"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice autosave", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        args = arg.split()
+        if len(args) == 1 and args[0] == "off":
+            pydslice.pydslice_debugger.autosave_path = None
+            gdb.write("Autosave off\n")
+        elif len(args) in [1, 2]:
+            if len(args) == 2:
+                try:
+                    interval = int(args[1], 0)
+                except ValueError:
+                    gdb.write("Invalid instruction count: %s\n" % args[1])
+                    return
+                pydslice.pydslice_debugger.autosave_interval = interval
+            pydslice.pydslice_debugger.autosave_path = args[0]
+            gdb.write("Saving a checkpoint to %s every %d instructions\n" % \
+                    (args[0], pydslice.pydslice_debugger.autosave_interval))
+        elif pydslice.pydslice_debugger.autosave_path == None:
+            gdb.write("Autosave is off\n")
+            gdb.write("Usage: slice autosave <file path> [instructions]|off\n")
+        else:
+            gdb.write("Saving a checkpoint to %s every %d instructions\n" % \
+                    (pydslice.pydslice_debugger.autosave_path, \
+                    pydslice.pydslice_debugger.autosave_interval))
+            gdb.write("Usage: slice autosave <file path> [instructions]|off\n")
+
+CmdSliceAutosave()
+
+class CmdSliceSink(gdb.Command):
+    """Streams slice instructions to a file as they are found"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice sink", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        global slice
+
+        if slice == None:
+            gdb.write("Slice not initialized. Execute 'slice new' or " \
+                    "'slice new crashed'\n")
+            return
+        try:
+            args = arg.split()
+            if len(args) == 1 and args[0] == "close":
+                slice.close_sink()
+            elif len(args) == 1:
+                slice.open_sink(args[0])
+            elif len(args) == 2:
+                slice.open_sink(args[0], int(args[1], 0))
+            else:
+                gdb.write("Usage: slice sink <file path> [window]\n")
+                gdb.write("       slice sink close\n")
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceSink()
+
 class CmdSliceNew(gdb.Command):
     """Initializes Slice Computation"""
 
@@ -86,6 +205,9 @@ class CmdSliceNew(gdb.Command):
     def invoke (self, arg, from_tty):
         global slice
         try:
+            if slice != None:
+                slice.release()
+                slice = None
             slice = Slice()
         except Exception:
             traceback.print_exc()
@@ -101,12 +223,206 @@ class CmdSliceNewCrashed(gdb.Command):
     def invoke (self, arg, from_tty):
         global slice
         try:
+            if slice != None:
+                slice.release()
+                slice = None
             slice = Slice(crashed=True)
         except Exception:
             traceback.print_exc()
 
 CmdSliceNewCrashed()
 
+class CmdSliceAutoRecord(gdb.Command):
+    """Records the program from a function on the stack of a first run"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice auto-record", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        args = arg.split()
+        if len(args) > 2:
+            gdb.write("Usage: slice auto-record [frame] [max instructions]\n")
+            return
+        try:
+            level = AUTO_RECORD_LEVEL
+            max_insns = None
+            if len(args) > 0:
+                level = int(args[0], 0)
+            if len(args) > 1:
+                max_insns = int(args[1], 0)
+        except ValueError:
+            gdb.write("Usage: slice auto-record [frame] [max instructions]\n")
+            return
+        try:
+            AutoRecorder().run(level, max_insns)
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceAutoRecord()
+
+class CmdSlicePolicyRecord(gdb.Command):
+    """Records the program, skipping the regions listed in a policy file"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice policy-record", \
+                gdb.COMMAND_OBSCURE, gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        args = arg.split()
+        if len(args) != 2:
+            gdb.write("Usage: slice policy-record <policy file> " \
+                    "<output prefix>\n")
+            return
+        try:
+            PolicyRecorder(read_policy(args[0]), args[1]).run()
+        except Exception:
+            traceback.print_exc()
+
+CmdSlicePolicyRecord()
+
+class CmdSliceTrace(gdb.Command):
+    """Slice trace commands"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice trace", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        gdb.write("Usage: slice trace capture|load <file path>\n")
+        gdb.write("       slice trace import <record file> <file path>\n")
+        gdb.write("       slice trace parallel [processes]\n")
+        gdb.write("       slice trace executions <pc>\n")
+
+CmdSliceTrace()
+
+class CmdSliceTraceCapture(gdb.Command):
+    """Captures the recording to a trace file for offline slicing"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice trace capture", \
+                gdb.COMMAND_OBSCURE, gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        global slice
+
+        if slice == None:
+            gdb.write("Slice not initialized. Execute 'slice new' or " \
+                    "'slice new crashed'\n")
+            return
+        try:
+            if not arg:
+                gdb.write("Usage: slice trace capture <file path>\n")
+            else:
+                slice.capture_trace(arg)
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceTraceCapture()
+
+class CmdSliceTraceLoad(gdb.Command):
+    """Inits Slice Computation from a trace file"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice trace load", \
+                gdb.COMMAND_OBSCURE, gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        global slice
+        try:
+            if not arg:
+                gdb.write("Usage: slice trace load <file path>\n")
+            else:
+                if slice != None:
+                    slice.release()
+                    slice = None
+                slice = OfflineSlice(arg)
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceTraceLoad()
+
+class CmdSliceTraceImport(gdb.Command):
+    """Converts a GDB 'record save' file to a trace file"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice trace import", \
+                gdb.COMMAND_OBSCURE, gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        try:
+            args = arg.split()
+            if len(args) != 2:
+                gdb.write("Usage: slice trace import <record file> " \
+                        "<file path>\n")
+                return
+            if args[0].endswith(POLICY_MANIFEST_SUFFIX):
+                count = policy_recording_to_trace(args[0], args[1], \
+                        disassemble_address)
+            else:
+                count = record_file_to_trace(args[0], args[1], \
+                        disassemble_address)
+            gdb.write("Imported %d instructions to %s\n" % (count, args[1]))
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceTraceImport()
+
+class CmdSliceTraceParallel(gdb.Command):
+    """Computes the slice of a loaded trace across several processes"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice trace parallel", \
+                gdb.COMMAND_OBSCURE, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        global slice
+
+        if not isinstance(slice, OfflineSlice):
+            gdb.write("No trace loaded. Execute 'slice trace load " \
+                    "<file path>'\n")
+            return
+        try:
+            processes = None
+            if arg:
+                processes = int(arg, 0)
+            gdb.write("Computing slice...\n")
+            slice.compute_slice_parallel(processes)
+        except ValueError:
+            gdb.write("Usage: slice trace parallel [processes]\n")
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceTraceParallel()
+
+class CmdSliceTraceExecutions(gdb.Command):
+    """Shows every execution of a pc in a loaded trace"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice trace executions", \
+                gdb.COMMAND_OBSCURE, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        global slice
+
+        if not isinstance(slice, OfflineSlice):
+            gdb.write("No trace loaded. Execute 'slice trace load " \
+                    "<file path>'\n")
+            return
+        try:
+            if not arg:
+                gdb.write("Usage: slice trace executions <pc>\n")
+                return
+            indices = slice.trace.executions(int(arg, 0))
+            for index in indices:
+                insn = slice.trace[index].to_insn()
+                gdb.write("%d: %s\n" % (index, insn.to_string(False)))
+            gdb.write("%d executions\n" % len(indices))
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceTraceExecutions()
+
 class CmdSliceStep(gdb.Command):
     """Step to next instruction in slice"""
 
@@ -128,6 +444,69 @@ class CmdSliceStep(gdb.Command):
 
 CmdSliceStep()
 
+class CmdSliceGoto(gdb.Command):
+    """Goes to the recorded execution of a slice instruction"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice goto", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        global slice
+        try:
+            if slice == None:
+                gdb.write("Slice not initialized. Execute 'slice new' or " \
+                       "'slice new crashed'\n")
+                return
+            if arg == "":
+                gdb.write("Usage: slice goto #\n")
+                return
+            slice.goto_insn(int(arg))
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceGoto()
+
+class CmdSliceNext(gdb.Command):
+    """Goes to the next slice instruction in execution order"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice next", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        global slice
+        try:
+            if slice == None:
+                gdb.write("Slice not initialized. Execute 'slice new' or " \
+                       "'slice new crashed'\n")
+                return
+            slice.goto_next_insn()
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceNext()
+
+class CmdSlicePrev(gdb.Command):
+    """Goes to the previous slice instruction in execution order"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice prev", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        global slice
+        try:
+            if slice == None:
+                gdb.write("Slice not initialized. Execute 'slice new' or " \
+                       "'slice new crashed'\n")
+                return
+            slice.goto_prev_insn()
+        except Exception:
+            traceback.print_exc()
+
+CmdSlicePrev()
+
 class CmdSliceOperand(gdb.Command):
     """Show tracked operands"""
 
@@ -229,6 +608,77 @@ class CmdSliceFollow(gdb.Command):
 
 CmdSliceFollow()
 
+class CmdSliceCriterion(gdb.Command):
+    """Show slice criteria"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice criterion", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        global slice
+        if slice == None:
+            gdb.write("Slice not initialized. Execute 'slice new' or " \
+                    "'slice new crashed'\n")
+            return
+
+        slice.print_criteria()
+
+CmdSliceCriterion()
+
+class CmdSliceCriterionAdd(gdb.Command):
+    """Add operand to be tracked for a named criterion"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice criterion add", \
+                gdb.COMMAND_OBSCURE, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        global slice
+        if slice == None:
+            gdb.write("Slice not initialized. Execute 'slice new' or " \
+                    "'slice new crashed'\n")
+            return
+
+        args = arg.split(None, 1)
+        if len(args) != 2:
+            gdb.write("Usage: slice criterion add <name> <expr>\n")
+            return
+
+        try:
+            slice.add_expr_to_operand_list(args[1], args[0])
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceCriterionAdd()
+
+class CmdSliceCriterionInsns(gdb.Command):
+    """List instructions in the slice of a criterion"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice criterion insns", \
+                gdb.COMMAND_OBSCURE, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        global slice
+        if slice == None:
+            gdb.write("Slice not initialized. Execute 'slice new' or " \
+                    "'slice new crashed'\n")
+            return
+
+        if arg not in slice.criteria:
+            gdb.write("Usage: slice criterion insns <name>\n")
+            return
+
+        slice.print_insn_list(criteria=slice.get_criterion(arg))
+
+    def complete(self, text, word):
+        if slice == None:
+            return []
+        return [x for x in slice.criteria if x.startswith(text)]
+
+CmdSliceCriterionInsns()
+
 class CmdSliceInsn(gdb.Command):
     """Slice instruction commands"""
 
@@ -318,6 +768,26 @@ class CmdSliceInsnDel(gdb.Command):
 
 CmdSliceInsnDel()
 
+class CmdSliceStats(gdb.Command):
+    """Prints slice computation statistics"""
+
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice stats", gdb.COMMAND_OBSCURE, \
+                gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        global slice
+        if slice == None:
+            gdb.write("Slice not initialized. Execute 'slice new' or " \
+                    "'slice new crashed'\n")
+            return
+        try:
+            slice.print_stats()
+        except Exception:
+            traceback.print_exc()
+
+CmdSliceStats()
+
 class CmdSliceDebug(gdb.Command):
     """Slice debug commands"""
 
@@ -386,3 +856,83 @@ class CmdSliceDebugSymbolLevel(gdb.Command):
         return [x for x in ["none", "line", "variables"] if x.startswith(text)]
 
 CmdSliceDebugSymbolLevel()
+
+class CmdSliceDebugWatchpoints(gdb.Command):
+    """Enables or disables hardware watchpoints for tracked memory"""
+    
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice debug watchpoints", \
+                gdb.COMMAND_OBSCURE)
+
+    def invoke (self, arg, from_tty):
+        if "on" in arg:
+            pydslice.pydslice_debugger.use_watchpoints = True
+        elif "off" in arg:
+            pydslice.pydslice_debugger.use_watchpoints = False
+        else:
+            print("Usage: slice debug watchpoints on|off\n")
+    
+    def complete(self, text, word):
+        return [x for x in ["on", "off"] if x.startswith(text)]
+
+CmdSliceDebugWatchpoints()
+
+class CmdSliceDebugSkipCalls(gdb.Command):
+    """Enables or disables skipping calls which cannot write operands"""
+    
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice debug skip_calls", \
+                gdb.COMMAND_OBSCURE)
+
+    def invoke (self, arg, from_tty):
+        if "on" in arg:
+            pydslice.pydslice_debugger.skip_calls = True
+        elif "off" in arg:
+            pydslice.pydslice_debugger.skip_calls = False
+        else:
+            print("Usage: slice debug skip_calls on|off\n")
+    
+    def complete(self, text, word):
+        return [x for x in ["on", "off"] if x.startswith(text)]
+
+CmdSliceDebugSkipCalls()
+
+class CmdSliceDebugLibrarySummaries(gdb.Command):
+    """Enables or disables summarizing C library memory and string calls"""
+    
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice debug library_summaries", \
+                gdb.COMMAND_OBSCURE)
+
+    def invoke (self, arg, from_tty):
+        if "on" in arg:
+            pydslice.pydslice_debugger.summarize_library = True
+        elif "off" in arg:
+            pydslice.pydslice_debugger.summarize_library = False
+        else:
+            print("Usage: slice debug library_summaries on|off\n")
+    
+    def complete(self, text, word):
+        return [x for x in ["on", "off"] if x.startswith(text)]
+
+CmdSliceDebugLibrarySummaries()
+
+class CmdSliceDebugCollapseRep(gdb.Command):
+    """Enables or disables handling rep movs and rep stos as one instruction"""
+    
+    def __init__ (self):
+        gdb.Command.__init__(self, "slice debug collapse_rep", \
+                gdb.COMMAND_OBSCURE)
+
+    def invoke (self, arg, from_tty):
+        if "on" in arg:
+            pydslice.pydslice_debugger.collapse_rep = True
+        elif "off" in arg:
+            pydslice.pydslice_debugger.collapse_rep = False
+        else:
+            print("Usage: slice debug collapse_rep on|off\n")
+    
+    def complete(self, text, word):
+        return [x for x in ["on", "off"] if x.startswith(text)]
+
+CmdSliceDebugCollapseRep()
@@ -5,35 +5,77 @@
 # Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
 #
 
+import weakref
+
 try:
     from pydslice_operand import *
 except ImportError:
     from pydslice.pydslice_operand import *
 
-class Insn():
-    comment = ""
-    opcode = ""
-    opcode2 = ""
-    text = ""
-    pc = 0
-    line = ""
-    file = ""
-    sym = ""
-
-    dest_list = []
-    src_list = []
+# Parts of an instruction which are the same every time its pc executes.
+# Statics are shared, so they must not be changed once created
+class InsnStatic(object):
+    __slots__ = ("key", "pc", "text", "opcode", "opcode2", "line", "file", \
+            "sym", "__weakref__")
+
+    # Initializes the static parts of the instruction
+    def __init__(self, key):
+        self.key = key
+        self.pc,self.text,self.opcode,self.opcode2,self.line,self.file, \
+                self.sym = key
+
+    # Gets the static with the field at index of key replaced by value
+    def replace(self, index, value):
+        if self.key[index] == value:
+            return self
+        return get_insn_static(self.key[:index] + (value,) + \
+                self.key[index + 1:])
+
+# Statics in use, by (pc, text, opcode, opcode2, line, file, sym)
+insn_statics = weakref.WeakValueDictionary()
+
+# Gets the shared static with the given fields
+def get_insn_static(key):
+    static = insn_statics.get(key)
+    if static == None:
+        static = InsnStatic(key)
+        insn_statics[key] = static
+    return static
+
+# Creates a property for a field of the instruction's static
+def static_property(index, name):
+    def get_field(self):
+        return getattr(self.static, name)
+    def set_field(self, value):
+        self.static = self.static.replace(index, value)
+    return property(get_field, set_field)
+
+class Insn(object):
+    __slots__ = ("static", "comment", "criteria", "dest_list", "src_list", \
+            "record_number")
+
+    pc = static_property(0, "pc")
+    text = static_property(1, "text")
+    opcode = static_property(2, "opcode")
+    opcode2 = static_property(3, "opcode2")
+    line = static_property(4, "line")
+    file = static_property(5, "file")
+    sym = static_property(6, "sym")
 
     # Initializes the instruction
     def __init__(self, pc):
-        self.pc = pc
+        self.static = get_insn_static((pc, "", "", "", "", "", ""))
+        self.comment = ""
+        self.criteria = 0
         self.dest_list = []
         self.src_list = []
+        self.record_number = None
 
     # Sets symbol information about the instruction
     def set_line_info(self, line, file, sym):
-        self.line = line
-        self.file = file
-        self.sym = sym
+        key = self.static.key
+        if key[4:] != (line, file, sym):
+            self.static = get_insn_static(key[:4] + (line, file, sym))
 
     # Adds operand to specified list of instruction
     def add_operand(self, operand, operand_direction):
@@ -0,0 +1,125 @@
+# pydslice_libc.py
+#
+# Summaries of C library memory and string functions
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+# Optimized implementations of these functions run long unrolled loops
+# which are slow to reverse-step. A summary gives the memory a call writes
+# and the memory it copies from, computed from the call's arguments, so the
+# slice can reverse over the whole call at once.
+
+# Library function summary signature:
+# (dest, sources) summary(args, slice)
+# args are the values of the function's arguments at the call. dest is the
+# (address, size) range the function writes and sources are the (address,
+# size) ranges the written data is copied from. Returns None if the call
+# cannot be summarized
+#
+# library_summaries maps a function name to (argument count, summary).
+# Plugins may add their own functions
+library_summaries = {}
+
+# Longest string followed when summarizing string functions
+LIBRARY_MAX_STRING = 1 << 20
+
+# Largest range a summarized function may write
+LIBRARY_MAX_SIZE = 1 << 32
+
+# Bytes read at a time when finding the end of a string
+LIBRARY_READ_SIZE = 256
+
+# Gets the length of the string at address, reading at most limit bytes.
+# Reads are aligned so that they never cross into an unreadable page.
+# Returns None if the string cannot be read
+def get_string_length(slice, address, limit=LIBRARY_MAX_STRING):
+    length = 0
+    while length < limit:
+        size = LIBRARY_READ_SIZE - (address + length) % LIBRARY_READ_SIZE
+        size = min(size, limit - length)
+        data = slice.debugger.read_memory(address + length, size)
+        if not data:
+            return None
+        end = data.find(b"\0")
+        if end >= 0:
+            return length + end
+        length = length + len(data)
+    if limit < LIBRARY_MAX_STRING:
+        return limit
+    return None
+
+# Summarizes memcpy(dest, src, n) and memmove, mempcpy
+def summarize_memcpy(args, slice):
+    if args[2] > LIBRARY_MAX_SIZE:
+        return None
+    return (args[0], args[2]),[(args[1], args[2])]
+
+# Summarizes memset(dest, c, n)
+def summarize_memset(args, slice):
+    if args[2] > LIBRARY_MAX_SIZE:
+        return None
+    return (args[0], args[2]),[]
+
+# Summarizes strcpy(dest, src) and stpcpy
+def summarize_strcpy(args, slice):
+    length = get_string_length(slice, args[1])
+    if length == None:
+        return None
+    return (args[0], length + 1),[(args[1], length + 1)]
+
+# Summarizes strncpy(dest, src, n) and stpncpy. The rest of dest is
+# padded with zeros
+def summarize_strncpy(args, slice):
+    if args[2] > LIBRARY_MAX_SIZE:
+        return None
+    length = get_string_length(slice, args[1], args[2])
+    if length == None:
+        return None
+    return (args[0], args[2]),[(args[1], min(length + 1, args[2]))]
+
+# Summarizes strcat(dest, src)
+def summarize_strcat(args, slice):
+    start = get_string_length(slice, args[0])
+    length = get_string_length(slice, args[1])
+    if start == None or length == None:
+        return None
+    return (args[0] + start, length + 1),[(args[1], length + 1)]
+
+library_summaries["memcpy"] = (3, summarize_memcpy)
+library_summaries["memmove"] = (3, summarize_memcpy)
+library_summaries["mempcpy"] = (3, summarize_memcpy)
+library_summaries["memset"] = (3, summarize_memset)
+library_summaries["strcpy"] = (2, summarize_strcpy)
+library_summaries["stpcpy"] = (2, summarize_strcpy)
+library_summaries["strncpy"] = (3, summarize_strncpy)
+library_summaries["stpncpy"] = (3, summarize_strncpy)
+library_summaries["strcat"] = (2, summarize_strcat)
+
+# Suffixes glibc adds to the names of its optimized implementations, such as
+# __memmove_avx_unaligned_erms, and of its checked variants, such as
+# __memcpy_chk, which take the same leading arguments
+library_variant_suffixes = ["_sse2", "_ssse3", "_sse4_1", "_sse4_2", \
+        "_avx", "_avx2", "_avx512", "_evex", "_evex512", "_erms", \
+        "_unaligned", "_aligned", "_back", "_rtm", "_no_vzeroupper", \
+        "_generic", "_chk"]
+
+# Finds the summary of a library function by name. The __GI_ prefix of
+# glibc's internal aliases, the __ prefix of its implementations, symbol
+# versions and @plt are removed, as are glibc's variant suffixes. Any other
+# name must match a summarized function exactly
+def find_library_summary(name):
+    name = name.split("@")[0]
+    if name.startswith("__GI_"):
+        name = name[5:]
+    if name.startswith("__"):
+        name = name[2:]
+
+    stripped = True
+    while stripped and name not in library_summaries:
+        stripped = False
+        for suffix in library_variant_suffixes:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                stripped = True
+                break
+    return library_summaries.get(name)
@@ -0,0 +1,241 @@
+# pydslice_offline.py
+#
+# Offline slice computation over a captured execution trace
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+try:
+    from pydslice_debugger import *
+    from pydslice import Slice, DEFAULT_CRITERION, callbacks
+    from pydslice_operand import *
+    from pydslice_operand_set import *
+    from pydslice_trace import *
+    from pydslice_trace_columns import *
+    from pydslice_parallel import ParallelSlicer
+except ImportError:
+    from pydslice.pydslice_debugger import *
+    from pydslice.pydslice import Slice, DEFAULT_CRITERION, callbacks
+    from pydslice.pydslice_operand import *
+    from pydslice.pydslice_operand_set import *
+    from pydslice.pydslice_trace import *
+    from pydslice.pydslice_trace_columns import *
+    from pydslice.pydslice_parallel import ParallelSlicer
+
+class OfflineSlice(Slice):
+    trace = None
+    position = 0
+    monitor_stack = False
+    stack_registers = []
+
+    # Initializes the slice from a trace file
+    def __init__(self, path):
+        self.trace = open_trace(path)
+        header = self.trace.header
+        self.debugger = TraceDebugger(header.get('architecture', ''))
+
+        self.signal = header.get('signal', 0)
+        self.monitor_stack = header.get('monitor_stack', False)
+        if "64" in header.get('architecture', ''):
+            self.stack_registers = ['rip', 'rsp', 'rbp']
+        else:
+            self.stack_registers = ['eip', 'esp', 'ebp']
+
+        self.criteria = [DEFAULT_CRITERION]
+        self.operand_list = OperandSet()
+        for name in header.get('registers', []):
+            self.add_operand(register_operand(name))
+        for start,length in header.get('memory', []):
+            self.add_operand(Operand(OPERAND_TYPE_MEMORY, False, start, 0, \
+                    length))
+
+        self.insn_list = [TraceRecord.from_list(x).to_insn() for x in \
+                header.get('insns', [])]
+        self.position = len(self.trace) - 1
+        self.frontier = None
+        self.goto_index = 0
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "Loaded trace of %d instructions from %s" % \
+                (len(self.trace), path))
+
+    # Gets the trace position of the slice
+    def get_position(self):
+        return self.position
+
+    # Moves the slice to a trace position
+    def set_position(self, position):
+        self.position = position
+
+    # Gets the pc of the trace record the slice is at
+    def get_current_pc(self):
+        if self.position < 0:
+            return 0
+        return self.trace[self.position].pc
+
+    # Gets whether stack registers are tracked
+    def get_monitor_stack(self):
+        return self.monitor_stack
+
+    # Sets whether stack registers are tracked
+    def set_monitor_stack(self, monitor_stack):
+        self.monitor_stack = monitor_stack
+
+    # Determines if an operand should be considered for a slice
+    def ignore_operand(self, operand):
+        if operand.operand_type == OPERAND_TYPE_IMMEDIATE:
+            return True
+        return self.monitor_stack == False and \
+                operand.operand_type == OPERAND_TYPE_REGISTER and \
+                operand.base_register[0] in self.stack_registers
+
+    # Adds an expression ($register or address) to the slice operand list
+    def add_expr_to_operand_list(self, expr, criterion=DEFAULT_CRITERION):
+        if expr.startswith('$'):
+            operand = register_operand(expr[1:])
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "added register %s" % expr)
+        else:
+            address = int(expr, 0)
+            operand = Operand(OPERAND_TYPE_MEMORY, False, address, 0)
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "added address 0x%x" % address)
+        operand.criteria = self.get_criterion(criterion)
+        self.add_operand(operand)
+
+    # Adds current trace instruction to the slice
+    def add_current_insn(self):
+        self.insn = self.trace[self.position].to_insn()
+        for s in self.insn.src_list:
+            if self.ignore_operand(s) == False:
+                self.add_operand(s)
+        self.insn.criteria = self.get_criterion(DEFAULT_CRITERION)
+        self.add_insn(self.insn)
+        self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "Added insn: " + self.insn.text)
+
+    # Determines if a trace record may define an operand of the slice
+    def record_matches(self, record):
+        for name in record.def_regs:
+            if self.operand_list.find_register(name):
+                return True
+        for start,length in record.def_mem:
+            if self.operand_list.find_range(start, start + length):
+                return True
+        return False
+
+    # Determines if plugin callbacks or match functions are set. They run
+    # without a live process, so questions about the call stack, such as
+    # inside_function, are answered with False
+    def has_plugins(self):
+        return len(callbacks) > 0 or \
+                any(x.match_function for x in self.operand_list)
+
+    # Warns that plugins cannot see the call stack of a trace
+    def warn_plugins(self):
+        if self.has_plugins():
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "Plugins run without a live process and cannot see the " \
+                    "call stack of a trace")
+
+    # Determines if a trace record is relevant to the slice
+    def compute_record(self, record):
+        global callbacks
+        found_followed = False
+
+        # Only build operands for records which define slice operands
+        if not self.record_matches(record):
+            return False,False
+
+        insn = record.to_insn()
+        matches = self.find_matches(insn.dest_list)
+
+        if any(x.overlaps(self.followed_operand) for x in matches):
+            self.followed_operand = None
+            found_followed = True
+
+        to_add = [x for x in insn.src_list if self.ignore_operand(x) == False]
+
+        # Do callbacks
+        for callback in callbacks:
+            callback(insn, matches, to_add, self)
+
+        for operand in matches:
+            if operand.match_function:
+                operand.match_function(insn, matches, to_add, self)
+
+        # the record's src operands join the criteria of the matches
+        for x in matches:
+            insn.criteria = insn.criteria | x.criteria
+
+        # replace matched operands with the record's src operands
+        self.remove_operands(insn.dest_list)
+        for x in to_add:
+            x.criteria = x.criteria | insn.criteria
+            self.add_operand(x)
+
+        self.insn = insn
+        return True,found_followed
+
+    # Computes the rest of the slice or steps to the next slice instruction
+    def compute_slice(self, stepping):
+        self.return_to_frontier()
+
+        if not self.operand_list:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "No operands to track. Add new operands with " \
+                    "'slice operand add'")
+        self.warn_plugins()
+
+        self.keep_going = True
+
+        while self.keep_going:
+            if self.position < 0:
+                self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                        "Reached end of trace")
+                break
+
+            record = self.trace[self.position]
+            found_insn,found_operand = self.compute_record(record)
+
+            if found_insn:
+                self.add_insn(self.insn)
+
+            if len(self.operand_list) == 0:
+                self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                        "Slice complete")
+                break
+
+            self.position = self.position - 1
+            self.autosave()
+
+            if found_operand:
+                self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                        "At Instruction:")
+                self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                        self.insn.to_string(False))
+                break
+
+            if stepping and found_insn:
+                self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                        "Next slice instruction found:")
+                self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                        self.insn.to_string(False))
+                break
+
+    # Computes the rest of the slice across several processes
+    def compute_slice_parallel(self, processes=None):
+        self.return_to_frontier()
+        if not self.operand_list:
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "No operands to track. Add new operands with " \
+                    "'slice operand add'")
+            return
+
+        # Plugins may stop the slice, which segments sliced in other
+        # processes cannot do
+        if self.has_plugins():
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "Plugins are loaded, computing the slice in one process")
+            self.compute_slice(False)
+            return
+        ParallelSlicer(self, processes).run()
@@ -14,22 +14,48 @@ OPERAND_DIRECTION_SRC  = 1
 OPERAND_DIRECTION_DST  = 2
 OPERAND_DIRECTION_BOTH = 3
 
-class Operand():
-    operand_type = OPERAND_TYPE_UNKNOWN
-    value = 0
-    address = 0
-    is_memory = False
-    symbol = ''
-    base_register = ''
-    match_function = None
-
-    # Initializes the operand
-    def __init__(self, operand_type, is_memory, address, value):
+try:
+    from sys import intern
+except ImportError:
+    pass
+
+# Shared base register lists, so that operands of the same register do not
+# each hold a copy
+base_registers = {}
+
+# Gets the shared base register list equal to base
+def intern_base_register(base):
+    key = tuple(base)
+    shared = base_registers.get(key)
+    if shared == None:
+        shared = [intern(x) for x in base]
+        base_registers[key] = shared
+    return shared
+
+# Gets a copy of a register dictionary whose values are shared base register
+# lists
+def intern_registers(registers):
+    shared = {}
+    for name,base in registers.items():
+        shared[intern(name)] = intern_base_register(base)
+    return shared
+
+class Operand(object):
+    __slots__ = ("operand_type", "value", "address", "is_memory", "symbol", \
+            "base_register", "match_function", "size", "criteria")
+
+    # Initializes the operand. Memory operands cover the byte range
+    # [address, address + size)
+    def __init__(self, operand_type, is_memory, address, value, size=1):
         self.operand_type = operand_type
         self.address = address
         self.value = value
         self.is_memory = is_memory
         self.symbol = ''
+        self.base_register = ''
+        self.match_function = None
+        self.size = size
+        self.criteria = 0
 
     def __eq__(self, other):
         if not other:
@@ -38,12 +64,58 @@ class Operand():
         if self.operand_type == other.operand_type:
             if self.operand_type == OPERAND_TYPE_REGISTER:
                 return self.base_register == other.base_register
-            return self.address == other.address
+            return self.address == other.address and self.size == other.size
         return False 
 
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        if self.operand_type == OPERAND_TYPE_REGISTER:
+            return hash(tuple(self.base_register))
+        return hash((self.operand_type, self.address, self.size))
+
+    # Returns the end of the memory range covered by the operand
+    def end(self):
+        return self.address + self.size
+
+    # Determines if the operand refers to data also referred to by other
+    def overlaps(self, other):
+        if not other or self.operand_type != other.operand_type:
+            return False
+        if self.operand_type == OPERAND_TYPE_REGISTER:
+            return self.base_register == other.base_register
+        if self.operand_type == OPERAND_TYPE_MEMORY:
+            return self.address < other.end() and other.address < self.end()
+        return False
+
+    # Creates an operand for the part of the memory range [start, end)
+    def slice_range(self, start, end):
+        operand = Operand(self.operand_type, self.is_memory, start, 0, \
+                end - start)
+        shift = 8 * (start - self.address)
+        operand.value = (self.value >> shift) & ((1 << (8 * (end - start))) - 1)
+        operand.symbol = self.symbol
+        operand.match_function = self.match_function
+        operand.criteria = self.criteria
+        return operand
+
+    # Returns the parts of the memory operand not covered by [start, end)
+    def subtract(self, start, end):
+        if start >= self.end() or end <= self.address:
+            return [self]
+        parts = []
+        if self.address < start:
+            parts.append(self.slice_range(self.address, start))
+        if end < self.end():
+            parts.append(self.slice_range(end, self.end()))
+        return parts
+
     # dests a human-readable string
     def to_string(self):
-        if type(self.address) == type(0):
+        if type(self.address) == type(0) and self.size > 1:
+            str = ("0x%x-0x%x:0x%x" % (self.address, self.end(), self.value))
+        elif type(self.address) == type(0):
             str = ("0x%x:0x%x" % (self.address, self.value))
         else:
             str = ("%s:0x%x" % (self.address, self.value))
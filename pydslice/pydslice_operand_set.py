@@ -0,0 +1,147 @@
+# pydslice_operand_set.py
+#
+# Container for the operands tracked by a slice
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+try:
+    from pydslice_operand import *
+except ImportError:
+    from pydslice.pydslice_operand import *
+
+# Registers are kept in a map keyed by base register. Memory operands are
+# kept as non-overlapping ranges sorted by start address so overlapping
+# ranges can be found with a binary search. Iteration yields registers in the
+# order they were added followed by memory in address order
+class OperandSet():
+    registers = None
+    starts = []
+    memory = []
+    others = []
+
+    # Initializes the operand set
+    def __init__(self, operands=[]):
+        self.registers = OrderedDict()
+        self.starts = []
+        self.memory = []
+        self.others = []
+        self.extend(operands)
+
+    def __len__(self):
+        return len(self.registers) + len(self.memory) + len(self.others)
+
+    def __iter__(self):
+        for operand in list(self.registers.values()):
+            yield operand
+        for operand in list(self.memory):
+            yield operand
+        for operand in list(self.others):
+            yield operand
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def __contains__(self, operand):
+        if operand.operand_type == OPERAND_TYPE_REGISTER:
+            return tuple(operand.base_register) in self.registers
+        if operand.operand_type == OPERAND_TYPE_MEMORY:
+            return self.find_memory(operand) != None
+        return operand in self.others
+
+    # Returns the position of a memory operand in the memory index
+    def find_memory(self, operand):
+        index = bisect_left(self.starts, operand.address)
+        while index < len(self.starts) and \
+                self.starts[index] == operand.address:
+            if self.memory[index] == operand:
+                return index
+            index = index + 1
+        return None
+
+    # Adds an operand and returns the operands actually added. Only the
+    # parts of a memory range not already in the set are added
+    def add(self, operand):
+        if operand.operand_type == OPERAND_TYPE_REGISTER:
+            key = tuple(operand.base_register)
+            if key in self.registers:
+                return []
+            self.registers[key] = operand
+            return [operand]
+
+        if operand.operand_type != OPERAND_TYPE_MEMORY:
+            if operand in self.others:
+                return []
+            self.others.append(operand)
+            return [operand]
+
+        parts = [operand]
+        for t in self.find_range(operand.address, operand.end()):
+            parts = [p for x in parts for p in x.subtract(t.address, t.end())]
+        for part in parts:
+            index = bisect_right(self.starts, part.address)
+            self.starts.insert(index, part.address)
+            self.memory.insert(index, part)
+        return parts
+
+    # Adds operands to the set
+    def extend(self, operands):
+        for operand in operands:
+            self.add(operand)
+
+    # Keeps list compatibility for code which appends to the operand list
+    def append(self, operand):
+        self.add(operand)
+
+    # Removes an operand from the set
+    def remove(self, operand):
+        if operand.operand_type == OPERAND_TYPE_REGISTER:
+            del self.registers[tuple(operand.base_register)]
+        elif operand.operand_type == OPERAND_TYPE_MEMORY:
+            index = self.find_memory(operand)
+            if index == None:
+                raise ValueError("operand not in set")
+            del self.starts[index]
+            del self.memory[index]
+        else:
+            self.others.remove(operand)
+
+    # Finds the tracked register with the given base register name
+    def find_register(self, name):
+        return self.registers.get((name,))
+
+    # Finds the tracked memory ranges which overlap [start, end)
+    def find_range(self, start, end):
+        found = []
+        index = max(bisect_right(self.starts, start) - 1, 0)
+        while index < len(self.starts) and self.starts[index] < end:
+            if self.memory[index].end() > start:
+                found.append(self.memory[index])
+            index = index + 1
+        return found
+
+    # Finds the tracked operands which overlap operand
+    def find_overlaps(self, operand):
+        if operand.operand_type == OPERAND_TYPE_REGISTER:
+            key = tuple(operand.base_register)
+            if key in self.registers:
+                return [self.registers[key]]
+            return []
+        if operand.operand_type == OPERAND_TYPE_MEMORY:
+            return self.find_range(operand.address, operand.end())
+        return []
+
+    # Finds the tracked memory ranges which end where operand starts or
+    # start where operand ends
+    def find_adjacent(self, operand):
+        found = []
+        index = bisect_left(self.starts, operand.address) - 1
+        if index >= 0 and self.memory[index].end() == operand.address:
+            found.append(self.memory[index])
+        index = bisect_left(self.starts, operand.end())
+        if index < len(self.starts) and self.starts[index] == operand.end():
+            found.append(self.memory[index])
+        return found
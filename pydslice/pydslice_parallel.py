@@ -0,0 +1,391 @@
+# pydslice_parallel.py
+#
+# Segment-wise slice computation of a trace across several processes
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+# A trace is split into segments. Each segment is summarized by a forward
+# pass mapping every register and memory range it defines to the registers
+# and ranges at the segment start that the value depends on. The
+# dependencies are kept as a graph with a node per defining record, so
+# records on a long dependency chain share their dependencies instead of each
+# copying them. Summaries are independent, so they are computed in parallel.
+# Stitching the summaries from the end of the trace backward gives the data
+# tracked at each segment boundary, after which the segments are sliced
+# exactly, again in parallel.
+#
+# Tracked data is passed between processes as TrackedData, mapping register
+# names and memory ranges to criteria bitsets.
+
+import multiprocessing
+from bisect import bisect_left, bisect_right
+
+try:
+    from pydslice_debugger import *
+    from pydslice_operand import *
+    from pydslice_operand_set import *
+    from pydslice_trace import *
+except ImportError:
+    from pydslice.pydslice_debugger import *
+    from pydslice.pydslice_operand import *
+    from pydslice.pydslice_operand_set import *
+    from pydslice.pydslice_trace import *
+
+# Fewest trace records in a segment
+MIN_SEGMENT_SIZE = 10000
+
+# Segments per process, so that uneven segments balance out
+SEGMENTS_PER_PROCESS = 4
+
+# Slice whose trace is being sliced. Worker processes inherit it when they
+# are forked
+worker_slice = None
+
+# Splits count records into at most segments [start, end) ranges
+def split_segments(count, segments):
+    segments = max(1, min(segments, count // MIN_SEGMENT_SIZE))
+    bounds = []
+    for i in range(segments):
+        bounds.append((count * i // segments, count * (i + 1) // segments))
+    return bounds
+
+# Maps non-overlapping memory ranges to values. Ranges are kept sorted by
+# start address so the ranges overlapping an address range are found with a
+# binary search. Setting a range splits the ranges it partially overlaps, and
+# adjacent ranges with the same value are joined, so equal maps compare equal
+class RangeMap():
+    starts = []
+    ends = []
+    values = []
+
+    # Initializes the range map
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.values = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return iter(list(zip(self.starts, self.ends, self.values)))
+
+    def __eq__(self, other):
+        return self.starts == other.starts and self.ends == other.ends and \
+                self.values == other.values
+
+    def __ne__(self, other):
+        return not self == other
+
+    # Gets the pieces of [start, end) as (start, end, value) in address
+    # order. Pieces not in the map have the value None
+    def get(self, start, end):
+        pieces = []
+        index = bisect_right(self.ends, start)
+        while index < len(self.starts) and self.starts[index] < end:
+            piece_start = max(self.starts[index], start)
+            if piece_start > start:
+                pieces.append((start, piece_start, None))
+            start = min(self.ends[index], end)
+            pieces.append((piece_start, start, self.values[index]))
+            index = index + 1
+        if start < end:
+            pieces.append((start, end, None))
+        return pieces
+
+    # Maps [start, end) to value, replacing what it overlaps
+    def set(self, start, end, value):
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end)
+        pieces = [[start, end, value]]
+        if first < last and self.starts[first] < start:
+            pieces.insert(0, [self.starts[first], start, self.values[first]])
+        if first < last and self.ends[last - 1] > end:
+            pieces.append([end, self.ends[last - 1], self.values[last - 1]])
+
+        # Join the neighbours with the same value
+        if first > 0 and self.ends[first - 1] == pieces[0][0]:
+            first = first - 1
+            pieces.insert(0, [self.starts[first], self.ends[first], \
+                    self.values[first]])
+        if last < len(self.starts) and self.starts[last] == pieces[-1][1]:
+            pieces.append([self.starts[last], self.ends[last], \
+                    self.values[last]])
+            last = last + 1
+        joined = [pieces[0]]
+        for piece in pieces[1:]:
+            if piece[2] == joined[-1][2]:
+                joined[-1][1] = piece[1]
+            else:
+                joined.append(piece)
+
+        self.starts[first:last] = [x[0] for x in joined]
+        self.ends[first:last] = [x[1] for x in joined]
+        self.values[first:last] = [x[2] for x in joined]
+
+    # Adds criteria to the criteria bitsets of [start, end)
+    def add_criteria(self, start, end, criteria):
+        for piece_start,piece_end,value in self.get(start, end):
+            if value == None:
+                value = 0
+            self.set(piece_start, piece_end, value | criteria)
+
+# Registers and memory ranges tracked at a point in the trace, with their
+# criteria bitsets
+class TrackedData():
+    registers = None
+    memory = None
+
+    # Initializes empty tracked data
+    def __init__(self):
+        self.registers = {}
+        self.memory = RangeMap()
+
+    def __len__(self):
+        return len(self.registers) + len(self.memory)
+
+    def __eq__(self, other):
+        return self.registers == other.registers and \
+                self.memory == other.memory
+
+    def __ne__(self, other):
+        return not self == other
+
+    # Adds criteria to a register or to a memory range given as (start, end)
+    def add_criteria(self, loc, criteria):
+        if isinstance(loc, str):
+            self.registers[loc] = self.registers.get(loc, 0) | criteria
+        else:
+            self.memory.add_criteria(loc[0], loc[1], criteria)
+
+# Converts slice operands to tracked data
+def operands_to_tracked(operands):
+    tracked = TrackedData()
+    for x in operands:
+        if x.operand_type == OPERAND_TYPE_REGISTER:
+            tracked.add_criteria(x.base_register[0], x.criteria)
+        elif x.operand_type == OPERAND_TYPE_MEMORY:
+            tracked.add_criteria((x.address, x.end()), x.criteria)
+    return tracked
+
+# Adds tracked data to a slice as operands
+def add_tracked(tracked, slice):
+    for name,criteria in tracked.registers.items():
+        operand = register_operand(name)
+        operand.criteria = criteria
+        slice.add_operand(operand)
+    for start,end,criteria in tracked.memory:
+        operand = Operand(OPERAND_TYPE_MEMORY, False, start, 0, end - start)
+        operand.criteria = criteria
+        slice.add_operand(operand)
+
+# Applies a segment summary to the data tracked at the segment end. Returns
+# the data tracked at the segment start. Tracked data with the same criteria
+# is followed through the dependency graph together, visiting each node once
+def apply_summary(summary, tracked):
+    def_regs,def_mem,nodes = summary
+    result = TrackedData()
+    groups = {}
+    for name,criteria in tracked.registers.items():
+        node = def_regs.get(name)
+        if node == None:
+            result.add_criteria(name, criteria)
+        else:
+            groups.setdefault(criteria, []).append(node)
+    for start,end,criteria in tracked.memory:
+        for piece_start,piece_end,node in def_mem.get(start, end):
+            if node == None:
+                result.add_criteria((piece_start, piece_end), criteria)
+            else:
+                groups.setdefault(criteria, []).append(node)
+
+    for criteria,stack in groups.items():
+        visited = set()
+        while stack:
+            node = stack.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            origins,children = nodes[node]
+            for origin in origins:
+                result.add_criteria(origin, criteria)
+            stack.extend(children)
+    return result
+
+# Summarizes the trace records [start, end) of the worker slice. Returns
+# (def_regs, def_mem, nodes): def_regs maps each register the segment
+# defines to a node and def_mem does the same for memory ranges. Each node
+# is (origins, children), the registers and (start, end) memory ranges at
+# the segment start and the nodes the value depends on
+def summarize_segment(bounds):
+    start,end = bounds
+    slice = worker_slice
+    ignored = []
+    if not slice.monitor_stack:
+        ignored = slice.stack_registers
+
+    def_regs = {}
+    def_mem = RangeMap()
+    nodes = []
+    for index in range(start, end):
+        record = slice.trace[index]
+        if not record.def_regs and not record.def_mem:
+            continue
+
+        origins = set()
+        children = set()
+        for name in record.use_regs:
+            if name in ignored:
+                continue
+            node = def_regs.get(name)
+            if node == None:
+                origins.add(name)
+            else:
+                children.add(node)
+        for address,length in record.use_mem:
+            for piece_start,piece_end,node in \
+                    def_mem.get(address, address + length):
+                if node == None:
+                    origins.add((piece_start, piece_end))
+                else:
+                    children.add(node)
+
+        # A record which only copies one defined value shares its node
+        if not origins and len(children) == 1:
+            node = children.pop()
+        else:
+            node = len(nodes)
+            nodes.append((tuple(origins), tuple(children)))
+
+        for name in record.def_regs:
+            def_regs[name] = node
+        for address,length in record.def_mem:
+            def_mem.set(address, address + length, node)
+    return def_regs,def_mem,nodes
+
+# Slices the trace records [start, end) of the worker slice backward from the
+# data tracked at end. Returns the (index, criteria) of the records in the
+# slice, the data tracked at start and the index of the record that left
+# nothing tracked, or None
+def slice_segment(task):
+    start,end,tracked = task
+    slice = worker_slice
+    slice.operand_list = OperandSet()
+    slice.followed_operand = None
+    add_tracked(tracked, slice)
+
+    matches = []
+    for index in range(end - 1, start - 1, -1):
+        if len(slice.operand_list) == 0:
+            return matches,TrackedData(),index + 1
+        found_insn,found_operand = slice.compute_record(slice.trace[index])
+        if found_insn:
+            matches.append((index, slice.insn.criteria))
+    if len(slice.operand_list) == 0:
+        return matches,TrackedData(),start
+    return matches,operands_to_tracked(slice.operand_list),None
+
+# Creates a pool of forked worker processes
+def create_pool(processes):
+    if hasattr(multiprocessing, "get_context"):
+        return multiprocessing.get_context("fork").Pool(processes)
+    return multiprocessing.Pool(processes)
+
+# Computes the slice of a trace based slice across several processes
+class ParallelSlicer():
+    slice = None
+    processes = 1
+    segments = []
+
+    # Initializes the slicer. All cores are used unless processes is given
+    def __init__(self, slice, processes=None):
+        self.slice = slice
+        if processes == None:
+            processes = multiprocessing.cpu_count()
+        self.processes = max(1, processes)
+        self.segments = split_segments(slice.position + 1, \
+                self.processes * SEGMENTS_PER_PROCESS)
+
+    # Maps function over tasks, in the worker pool if there is one
+    def map(self, pool, function, tasks):
+        if pool:
+            return pool.map(function, tasks, 1)
+        return [function(x) for x in tasks]
+
+    # Computes the rest of the slice
+    def run(self):
+        global worker_slice
+        slice = self.slice
+        debugger = slice.debugger
+
+        if slice.position < 0:
+            debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, "Reached end of trace")
+            return
+
+        worker_slice = slice
+        operand_list = slice.operand_list
+        pool = None
+        if self.processes > 1 and len(self.segments) > 1:
+            pool = create_pool(self.processes)
+        try:
+            debugger.print_msg(DEBUG_PRINT_LEVEL_INFO, \
+                    "Summarizing %d segments with %d processes" % \
+                    (len(self.segments), self.processes))
+            summaries = self.map(pool, summarize_segment, self.segments)
+
+            # Stitch the summaries from the end of the trace backward
+            tracked = [None] * len(self.segments)
+            current = operands_to_tracked(operand_list)
+            for i in reversed(range(len(self.segments))):
+                tracked[i] = current
+                current = apply_summary(summaries[i], current)
+            summaries = None
+
+            tasks = [(start, end, tracked[i]) for i,(start,end) in \
+                    enumerate(self.segments) if tracked[i]]
+            results = self.map(pool, slice_segment, tasks)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+            worker_slice = None
+            slice.operand_list = operand_list
+
+        self.finish(tasks, results, [current] + tracked[:-1])
+
+    # Adds the results of the segments to the slice, from the end of the
+    # trace backward. starts is the stitched data tracked at the start of
+    # each segment
+    def finish(self, tasks, results, starts):
+        slice = self.slice
+        slice.operand_list = OperandSet()
+        slice.followed_operand = None
+
+        stop = None
+        for task,result in reversed(list(zip(tasks, results))):
+            matches,tracked,empty = result
+            for index,criteria in matches:
+                slice.insn = slice.trace[index].to_insn()
+                slice.insn.criteria = criteria
+                slice.insn.record_number = index
+                slice.add_insn(slice.insn)
+            if empty != None:
+                stop = empty
+                break
+
+            segment = self.segments.index(task[:2])
+            if tracked != starts[segment]:
+                slice.debugger.print_msg(DEBUG_PRINT_LEVEL_WARNING, \
+                        "Summary of records %d-%d does not match the slice" % \
+                        task[:2])
+
+        if stop != None:
+            slice.position = stop
+            slice.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "Slice complete")
+            return
+
+        add_tracked(starts[0], slice)
+        slice.position = -1
+        slice.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "Reached end of trace")
@@ -9,6 +9,8 @@ import re
 
 try:
     from pydslice_insn import Insn
+    from pydslice_cache import LRUCache
+    from pydslice_sections import REGION_TEXT
     from pydslice_debugger import *
     from pydslice_insn import *
     from pydslice_parser import Parser
@@ -16,12 +18,61 @@ try:
     from pydslice_x86_defs import *
 except ImportError:
     from pydslice.pydslice_insn import Insn
+    from pydslice.pydslice_cache import LRUCache
+    from pydslice.pydslice_sections import REGION_TEXT
     from pydslice.pydslice_debugger import *
     from pydslice.pydslice_insn import *
     from pydslice.pydslice_parser import Parser
     from pydslice.pydslice_operand import *
     from pydslice.pydslice_x86_defs import *
 
+# Kinds of decoded opcode arguments
+ARG_REGISTER  = 1
+ARG_IMMEDIATE = 2
+ARG_MEMORY    = 3
+
+# Number of decoded instructions kept by the parser
+TEMPLATE_CACHE_SIZE = 4096
+
+# Number of instruction def masks kept by the parser
+DEF_MASK_CACHE_SIZE = 16384
+
+# Registers a call may overwrite without restoring
+x86_volatile_registers = ["eax", "ecx", "edx"] + \
+        ["xmm%d" % x for x in range(8)]
+
+# Decoded form of an instruction at a pc. Only the register and memory values
+# need to be read to build the instruction's operands from a template
+class InsnTemplate():
+    code = None
+    text = ""
+    opcode = ""
+    opcode2 = ""
+    args = []
+
+    # Initializes the template
+    def __init__(self, code, text, opcode, opcode2, args):
+        self.code = code
+        self.text = text
+        self.opcode = opcode
+        self.opcode2 = opcode2
+        self.args = args
+
+# Registers and memory an instruction may write, decoded without reading any
+# register or memory values. Registers are a bitmask of base registers
+class DefMask():
+    code = None
+    registers = 0
+    writes_memory = False
+    unknown = False
+
+    # Initializes an empty mask for the instruction bytes code
+    def __init__(self, code):
+        self.code = code
+        self.registers = 0
+        self.writes_memory = False
+        self.unknown = False
+
 class Parser_x86(Parser):
     debugger = None
     monitor_stack = False
@@ -29,58 +80,92 @@ class Parser_x86(Parser):
     syscall_table = None
     last_eax = 0
     x86_parse_opcode_fxn = None
+    address_mask = 0xffffffff
+    template_cache = None
+    template_invalidations = 0
+    template = None
+    decoding = False
+    def_mask_cache = None
+    register_bits = {}
 
     # Initializes the parser
     def __init__(self, debugger):
         self.debugger = debugger
         self.monitor_stack = False 
-        self.registers = x86_registers
+        self.registers = intern_registers(x86_registers)
         self.syscall_table = x86_syscall_table
         self.last_eax = 0
         self.x86_parse_opcode_fxn = x86_parse_opcode_fxn
+        self.address_mask = 0xffffffff
+        self.template_cache = LRUCache(TEMPLATE_CACHE_SIZE)
+        self.template_invalidations = 0
+        self.template = None
+        self.decoding = False
+        self.def_mask_cache = LRUCache(DEF_MASK_CACHE_SIZE)
+        self.register_bits = {}
 
-    # Gets a register and its value
-    def get_reg(self, arg):
+    # Finds the register at the start of arg. Returns the register operand
+    # address
+    def match_reg(self, arg):
         if arg.startswith("eiz"):
-            return "$eiz",0
+            return "$eiz"
 
         if arg.startswith("xmm"):
-            try:
-                base = self.registers[arg[:5]]
-                value = self.debugger.evaluate("$" + arg[:5] + ".uint128")
-                address = "$" + arg[:5]
-                return address,value
-            except:
-                pass
-
-            try:
-                base = self.registers[arg[:4]]
-                value = self.debugger.evaluate("$" + arg[:4] + ".uint128")
-                address = "$" + arg[:4]
-                return address,value
-            except:
-                return "","" 
-        try:
-            base = self.registers[arg[:3]]
-            value = self.debugger.evaluate("$" + arg[:3])
-            address = "$" + arg[:3] 
-            return address,value
-        except:
-            pass
+            for length in [5, 4]:
+                if arg[:length] in self.registers:
+                    return "$" + arg[:length]
+            return ""
 
-        try:
-            base = self.registers[arg[:2]]
-            value = self.debugger.evaluate("$" + arg[:2])
-            address = "$" + arg[:2] 
-            return address,value
-        except:
-            pass
-        return "",""
+        for length in [3, 2]:
+            if arg[:length] in self.registers:
+                return "$" + arg[:length]
+        return ""
+
+    # Gets a register and its value
+    def get_reg(self, arg):
+        reg = self.match_reg(arg)
+        if reg == "" or reg == "$eiz":
+            return reg,0
+        return reg,self.debugger.get_register(reg[1:])
+
+    # Converts an unsigned register value to a signed integer
+    def to_signed(self, value, bits):
+        if value & (1 << (bits - 1)):
+            return value - (1 << bits)
+        return value
 
     # Determines if the register is a 'pointer' register
     def is_register_pointer(self, reg):
         return reg in ["$ebp", "$esp", "$eip"] 
 
+    # Gets the text of the argument holding argument index of a call. Only
+    # valid at the call
+    def get_call_arg_text(self, index):
+        if index == 0:
+            return "DWORD PTR [esp]"
+        return "DWORD PTR [esp+0x%x]" % (4 * index)
+
+    # Gets the value of argument index of a call. Only valid at the call
+    def get_call_arg(self, index):
+        sp = self.debugger.get_register("esp")
+        return self.read_value((sp + 4 * index) & self.address_mask, 4)
+
+    # Gets the register holding the return value of a call
+    def get_return_register(self):
+        return "eax"
+
+    # Gets the registers a call may overwrite without restoring
+    def get_volatile_registers(self):
+        return x86_volatile_registers
+
+    # Gets the register counting the iterations of a rep instruction
+    def get_count_register(self):
+        return "ecx"
+
+    # Determines if string instructions step backwards through memory
+    def is_direction_backwards(self):
+        return self.debugger.get_register("eflags") & X86_FLAG_DF != 0
+
     # Attempt to infer pointer size from instruction opcode
     def get_ptr_size_from_insn(self, insn):
         return 4
@@ -455,9 +540,12 @@ class Parser_x86(Parser):
 
     # Parse syscall opcode
     def parse_syscall(self, insn, args):
+
+        # Operands depend on the syscall, so the instruction is not cached
+        self.template = None
         
         # Get EAX
-        eax = self.debugger.evaluate('$eax')
+        eax = self.debugger.get_register('eax')
         
         # Determine if syscall requires us to do anything special
         # For now, only read() is special
@@ -477,8 +565,17 @@ class Parser_x86(Parser):
     
     # Parses opcode argument as memory type
     def parse_mem_addr_value(self, arg, size, insn, operand_direction):
+        self.add_arg(self.decode_mem_addr(arg, size, insn), insn, \
+                operand_direction)
+
+    # Decodes a memory reference. The address is a sum of terms, each a list
+    # of factors which are either immediates or register names
+    def decode_mem_addr(self, arg, size, insn):
         i = 0
-        expr = ""
+        terms = []
+        factors = []
+        sign = 1
+        regs = []
         if arg[i] == '[':
             i = i + 1
         
@@ -486,15 +583,20 @@ class Parser_x86(Parser):
 
         while i < length and arg[i] != ']':
             # Do we have an operator?
-            if arg[i] == '+' or arg[i] == '-' or arg[i] == '*':
-                expr = expr + arg[i]
+            if arg[i] == '+' or arg[i] == '-':
+                if factors:
+                    terms.append((sign, factors))
+                factors = []
+                sign = 1 if arg[i] == '+' else -1
+                i = i + 1
+            elif arg[i] == '*':
                 i = i + 1
        
             # Do we have an immediate?
             if (arg[i] == '0' and arg[i+1] == 'x') or \
                     (arg[i] >= '0' and arg[i] <= '9'):
                 m = re.match('([0x]*[0-9a-f]+).*', arg[i:], re.M | re.I)
-                expr = expr + m.group(1)
+                factors.append(self.parse_number(m.group(1)))
                 i = i + len(m.group(1))
                 continue
             
@@ -502,55 +604,99 @@ class Parser_x86(Parser):
             if arg[i:i+3] == "ds:" and arg[i+3] >= '0' and arg[i+3] <= '9':
                 i = i + 3 
                 m = re.match('([0x]*[0-9a-f]+).*', arg[i:], re.M | re.I)
-                expr = expr + m.group(1)
+                factors.append(self.parse_number(m.group(1)))
                 i = i + len(m.group(1))
                 continue
 
             # Do we have a register?
-            reg,reg_value = self.get_reg(arg[i:])
+            reg = self.match_reg(arg[i:])
 
             if reg != "":
+                i = i + len(reg) - 1
                 if reg == "$eiz":
-                    expr = expr + "0"
-                    i = i + len(reg) - 1
+                    factors.append(0)
                     continue
-                 
-                if self.is_register_pointer(reg):
-                    reg_value = self.debugger.evaluate_as_address(reg)
-                    expr = expr + ("0x%x"%reg_value)
-                    i = i + len(reg) - 1
-                else:    
-                    expr = expr + reg
-                    i = i + len(reg) - 1
-                
-                operand = Operand(OPERAND_TYPE_REGISTER, True, reg, reg_value)
-                operand.base_register = self.registers[reg[1:]]
-                insn.add_operand(operand, OPERAND_DIRECTION_SRC)
+                factors.append(reg)
+                regs.append((reg, self.registers[reg[1:]]))
                 continue
             self.debugger.print_msg(DEBUG_PRINT_LEVEL_VERBOSE, \
                     "Unknown Operand: " + arg[i:] + " - Insn: " + insn.text)
+            size = 0
+            break
+
+        if factors:
+            terms.append((sign, factors))
+        return (ARG_MEMORY, size, terms, regs)
+
+    # Converts an immediate of an address expression to an integer
+    def parse_number(self, num):
+        if num.startswith("0x"):
+            return int(num, 16)
+        return int(num, 10)
+
+    # Adds the operands of a decoded memory reference to the instruction
+    def emit_mem_addr(self, arg, insn, operand_direction):
+        kind,size,terms,regs = arg
+        values = {}
+        for reg,base in regs:
+            values[reg] = self.debugger.get_register(reg[1:])
+            operand = Operand(OPERAND_TYPE_REGISTER, True, reg, values[reg])
+            operand.base_register = base
+            insn.add_operand(operand, OPERAND_DIRECTION_SRC)
+
+        if size <= 0:
             return
 
-        address = self.debugger.evaluate_as_address(expr)
-        for i in range(0, size):
-            addr = "0x%x" % (address + i) 
-            value = self.debugger.read_byte(addr)
-            operand = Operand(OPERAND_TYPE_MEMORY, False, address+i, value)
-            insn.add_operand(operand, operand_direction)
+        address = 0
+        for sign,factors in terms:
+            product = sign
+            for factor in factors:
+                if isinstance(factor, str):
+                    factor = values[factor]
+                product = product * factor
+            address = address + product
+        address = address & self.address_mask
+
+        value = self.read_value(address, size)
+        operand = Operand(OPERAND_TYPE_MEMORY, False, address, value, size)
+        insn.add_operand(operand, operand_direction)
+
+    # Reads the little endian value of a memory range. Large ranges, such as
+    # syscall buffers, are not read
+    def read_value(self, address, size):
+        value = 0
+        if size > 16:
+            return value
+        for byte in reversed(bytearray(self.debugger.read_range(address, \
+                size))):
+            value = (value << 8) | byte
+        return value
 
     # Parses the argument to an opcode
     def parse_arg(self, arg, insn, operand_direction):
+        self.add_arg(self.decode_arg(arg, insn), insn, operand_direction)
+
+    # Adds a decoded argument to the instruction and to the template of the
+    # instruction being parsed
+    def add_arg(self, arg, insn, operand_direction):
+        if self.template != None:
+            self.template.append((arg, operand_direction))
+        if not self.decoding:
+            self.emit_arg(arg, insn, operand_direction)
+
+    # Decodes the argument to an opcode without reading any values
+    def decode_arg(self, arg, insn):
         if "gs:" in arg:
-            return
+            return None
             
         # is it a memory reference 
         if arg.find(":0x") == 2:
             size = self.get_ptr_size_from_insn(insn)
-            self.parse_mem_addr_value(arg, size, insn, operand_direction)
+            return self.decode_mem_addr(arg, size, insn)
             
         elif arg.startswith("["):
             size = self.get_ptr_size_from_insn(insn)
-            self.parse_mem_addr_value(arg, size, insn, operand_direction)
+            return self.decode_mem_addr(arg, size, insn)
             
         elif "PTR" in arg:
             tok = arg.split()
@@ -561,14 +707,12 @@ class Parser_x86(Parser):
                         "Unknown size: %s - Insn: %s" % (tok[0], insn.text))
             
             if tok[2] == "gs:":
-                return
+                return None
             
             if tok[2][2] == ":":
-                self.parse_mem_addr_value(tok[2][3:], size, insn, \
-                        operand_direction)
+                return self.decode_mem_addr(tok[2][3:], size, insn)
             else:
-                self.parse_mem_addr_value(tok[2], size, insn, \
-                        operand_direction)
+                return self.decode_mem_addr(tok[2], size, insn)
                
         elif ord(arg[0]) >= ord('0') and ord(arg[0]) <= ord('9'):
             if arg[1] == 'x':
@@ -577,28 +721,43 @@ class Parser_x86(Parser):
                 base = 10
             m = re.match("^(0x)*([0-9a-f]+)", arg, re.M | re.I)
             num = m.group(1) + m.group(2)
-            operand = Operand(OPERAND_TYPE_IMMEDIATE, False, 0, int(num, base))
-            insn.add_operand(operand, operand_direction)
+            return (ARG_IMMEDIATE, int(num, base), '')
         
         # Is it a register ?
         elif arg in self.registers.keys():
             if arg == "eiz":
-                operand = Operand(OPERAND_TYPE_IMMEDIATE, False, 0, 0)
-                operand.base_register = self.registers[arg]
-                insn.add_operand(operand, operand_direction)
-            else:
-                reg_addr,reg_value = self.get_reg(arg)
-
-                operand = Operand(OPERAND_TYPE_REGISTER, False, 
-                                reg_addr, reg_value)
-                operand.base_register = self.registers[arg]
-                insn.add_operand(operand, operand_direction)
+                return (ARG_IMMEDIATE, 0, self.registers[arg])
+            return (ARG_REGISTER, self.match_reg(arg), self.registers[arg])
         else:
             self.debugger.print_msg(DEBUG_PRINT_LEVEL_VERBOSE, \
                     "Unknown Operand: " + arg + " - Insn: " + insn.text)
+        return None
+
+    # Adds the operands of a decoded argument to the instruction, reading
+    # the current register and memory values
+    def emit_arg(self, arg, insn, operand_direction):
+        if arg == None:
+            return
+
+        if arg[0] == ARG_MEMORY:
+            self.emit_mem_addr(arg, insn, operand_direction)
+            return
+
+        if arg[0] == ARG_IMMEDIATE:
+            kind,value,base = arg
+            operand = Operand(OPERAND_TYPE_IMMEDIATE, False, 0, value)
+            if base:
+                operand.base_register = base
+        else:
+            kind,reg,base = arg
+            operand = Operand(OPERAND_TYPE_REGISTER, False, reg, \
+                    self.debugger.get_register(reg[1:]))
+            operand.base_register = base
+        insn.add_operand(operand, operand_direction)
    
-    # Adds an expression to a list of operand
-    def add_expr_to_operand_list(self, expr, operand_list):
+    # Adds an expression to the operand list of a slice for the given
+    # criteria
+    def add_expr_to_operand_list(self, expr, slice, criteria=0):
         # is it a register?
         if expr[0] == '$' and expr[1:] in self.registers.keys():
             address,value = self.get_reg(expr[1:])
@@ -610,13 +769,14 @@ class Parser_x86(Parser):
         else:
             # assume expression that is memory address - may want size
             address = self.debugger.evaluate_as_address(expr)
-            value = self.debugger.read_byte(address)
+            value = self.read_value(address, 1)
             operand_type = OPERAND_TYPE_MEMORY
             operand = Operand(operand_type, False, address, value)
             self.debugger.print_msg(DEBUG_PRINT_LEVEL_ALWAYS, \
                     "added address %s" % address)
 
-        operand_list.append(operand)
+        operand.criteria = criteria
+        slice.add_operand(operand)
 
     # Detremines if a operand should be considered for a slice
     def ignore_operand(self, operand):
@@ -629,11 +789,36 @@ class Parser_x86(Parser):
                 return True
         return False
 
-    # Parses an x86 instruction
-    def parse_insn(self, pc):
-        line,file,sym = self.debugger.get_line_info() 
-        insn = Insn(pc)
-        insn.text = self.debugger.disassemble(pc)
+    # Finds the cached template of the instruction at pc. Templates whose
+    # instruction bytes have changed are discarded
+    def get_template(self, pc):
+        return self.template_cache.get(pc, lambda x: self.valid_template(pc, x))
+
+    # Determines if the instruction bytes of a template are still at pc
+    def valid_template(self, pc, template):
+        if self.debugger.read_memory(pc, len(template.code)) == template.code:
+            return True
+        self.template_invalidations = self.template_invalidations + 1
+        return False
+
+    # Determines if the instruction bytes of a def mask are still at pc. Text
+    # sections are not written, so their masks are not checked
+    def valid_def_mask(self, pc, mask):
+        region = self.debugger.get_region(pc)
+        if region != None and region.region == REGION_TEXT:
+            return True
+        return self.valid_template(pc, mask)
+
+    # Gets the opcode of the instruction at pc
+    def get_opcode(self, pc):
+        template = self.template_cache.peek(pc)
+        if template:
+            return template.opcode
+        return self.debugger.disassemble(pc).split(' ', 1)[0]
+
+    # Parses the opcode and arguments of the instruction text. Returns False
+    # if the opcode is unknown
+    def parse_text(self, insn):
         tok = insn.text.split(' ', 1)
         insn.opcode = tok[0]
         if insn.opcode in ["rep", "repz", "repnz"]:
@@ -645,10 +830,10 @@ class Parser_x86(Parser):
                 args = ""
             if insn.opcode2 in self.x86_parse_opcode_fxn.keys():
                 self.x86_parse_opcode_fxn[insn.opcode2](self, insn, args)
-            else:
-                self.debugger.print_msg(DEBUG_PRINT_LEVEL_VERBOSE, \
-                        "Unknown Opcode: %s - Insn: %s" % \
-                        (insn.opcode2, insn.text))
+                return True
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_VERBOSE, \
+                    "Unknown Opcode: %s - Insn: %s" % \
+                    (insn.opcode2, insn.text))
         else:
             if len(tok) > 1:
                 args = tok[1].strip().split(",")
@@ -657,16 +842,127 @@ class Parser_x86(Parser):
             
             if insn.opcode in self.x86_parse_opcode_fxn.keys():
                 self.x86_parse_opcode_fxn[insn.opcode](self, insn, args)
-            else:
-                self.debugger.print_msg(DEBUG_PRINT_LEVEL_VERBOSE, \
-                        "Unknown Opcode: %s - Insn: %s" % \
-                        (insn.opcode, insn.text))
+                return True
+            self.debugger.print_msg(DEBUG_PRINT_LEVEL_VERBOSE, \
+                    "Unknown Opcode: %s - Insn: %s" % \
+                    (insn.opcode, insn.text))
+        return False
+
+    # Decodes the instruction text without reading any register or memory
+    # values. Returns the instruction and its decoded (argument, direction)
+    # pairs, or None if the instruction cannot be decoded
+    def decode_insn(self, pc, text):
+        insn = Insn(pc)
+        insn.text = text
+        self.template = []
+        self.decoding = True
+        try:
+            known = self.parse_text(insn)
+        finally:
+            self.decoding = False
+        args = self.template
+        self.template = None
+        if not known or args == None:
+            return None
+        return insn,args
+
+    # Gets the bit of a base register in def masks
+    def get_register_bit(self, key):
+        if key not in self.register_bits:
+            self.register_bits[key] = 1 << len(self.register_bits)
+        return self.register_bits[key]
+
+    # Gets the def mask bits of the base registers in keys
+    def get_register_mask(self, keys):
+        mask = 0
+        for key in keys:
+            mask = mask | self.get_register_bit(key)
+        return mask
+
+    # Gets the registers and memory the instruction at pc may write
+    def get_def_mask(self, pc):
+        mask = self.def_mask_cache.get(pc, \
+                lambda x: self.valid_def_mask(pc, x))
+        if mask != None:
+            return mask
+
+        # Decoded templates already hold the arguments of the instruction
+        template = self.template_cache.peek(pc)
+        if template:
+            mask = DefMask(template.code)
+            args = template.args
+        else:
+            mask = DefMask(self.debugger.read_memory(pc, \
+                    self.debugger.get_insn_length(pc)))
+            args = None
+            decoded = self.decode_insn(pc, self.debugger.disassemble(pc))
+            if decoded != None:
+                args = decoded[1]
+
+        if args == None:
+            mask.unknown = True
+        else:
+            for arg,operand_direction in args:
+                if arg == None or operand_direction == OPERAND_DIRECTION_SRC:
+                    continue
+                if arg[0] == ARG_REGISTER:
+                    mask.registers = mask.registers | \
+                            self.get_register_bit(tuple(arg[2]))
+                elif arg[0] == ARG_MEMORY:
+                    mask.writes_memory = True
+
+        if mask.code:
+            self.def_mask_cache.put(pc, mask)
+        return mask
+
+    # Determines if the instruction at pc returns from a function
+    def is_return(self, pc):
+        opcode = self.get_opcode(pc)
+        if opcode in ["rep", "repz", "bnd"]:
+            opcode = self.debugger.disassemble(pc).split()[1]
+        return opcode.startswith("ret")
+
+    # Determines if the instruction at pc is a rep movs or rep stos
+    def is_rep_string(self, pc):
+        if self.get_opcode(pc) != "rep":
+            return False
+        template = self.template_cache.peek(pc)
+        if template:
+            opcode = template.opcode2
+        else:
+            opcode = self.debugger.disassemble(pc).split()[1]
+        return opcode.startswith("movs") or opcode.startswith("stos")
+
+    # Parses an x86 instruction
+    def parse_insn(self, pc):
+        insn = Insn(pc)
+
+        template = self.get_template(pc)
+        if template:
+            insn.text = template.text
+            insn.opcode = template.opcode
+            insn.opcode2 = template.opcode2
+            for arg,operand_direction in template.args:
+                self.emit_arg(arg, insn, operand_direction)
+            return insn
+
+        self.template = []
+        insn.text = self.debugger.disassemble(pc)
+        self.parse_text(insn)
+
+        if self.template != None:
+            code = self.debugger.read_memory(pc, \
+                    self.debugger.get_insn_length(pc))
+            if code:
+                self.template_cache.put(pc, InsnTemplate(code, insn.text, \
+                        insn.opcode, insn.opcode2, self.template))
+        self.template = None
         
         return insn 
     
     # Performs any additional tasks after performing a slice step
     def step_cleanup(self):
-        self.last_eax = self.debugger.evaluate('$eax')
+        self.last_eax = self.to_signed(self.debugger.get_register('eax'), 32)
 
 x86_parse_opcode_fxn = {
     'aaa'  : Parser_x86.parse_none,
@@ -16,6 +16,13 @@ except ImportError:
     from pydslice.pydslice_operand import *
     from pydslice.pydslice_parser_x86 import *
 
+# Registers holding the integer arguments of a call
+x86_64_call_arg_registers = ["rdi", "rsi", "rdx", "rcx", "r8", "r9"]
+
+# Registers a call may overwrite without restoring
+x86_64_volatile_registers = ["rax", "rcx", "rdx", "rsi", "rdi", "r8", "r9", \
+        "r10", "r11"] + ["xmm%d" % x for x in range(16)]
+
 class Parser_x86_64(Parser_x86):
     
     last_rax = 0
@@ -23,13 +30,41 @@ class Parser_x86_64(Parser_x86):
     def __init__(self,debugger):
         self.debugger = debugger
         self.monitor_stack = False
-        self.registers = x86_64_registers
+        self.registers = intern_registers(x86_64_registers)
         self.syscall_table = x86_64_syscall_table
         self.x86_parse_opcode_fxn = x86_64_parse_opcode_fxn
+        self.address_mask = 0xffffffffffffffff
+        self.template_cache = LRUCache(TEMPLATE_CACHE_SIZE)
+        self.template_invalidations = 0
+        self.template = None
+        self.decoding = False
+        self.def_mask_cache = LRUCache(DEF_MASK_CACHE_SIZE)
+        self.register_bits = {}
     
     # Determines if the register is a 'pointer' register
     def is_register_pointer(self, reg):
         return reg in ["$ebp", "$esp", "$eip", "$rbp", "$rsp", "$rip"]
+
+    # Gets the text of the argument holding argument index of a call. Only
+    # valid at the call
+    def get_call_arg_text(self, index):
+        return x86_64_call_arg_registers[index]
+
+    # Gets the value of argument index of a call. Only valid at the call
+    def get_call_arg(self, index):
+        return self.debugger.get_register(x86_64_call_arg_registers[index])
+
+    # Gets the register holding the return value of a call
+    def get_return_register(self):
+        return "rax"
+
+    # Gets the registers a call may overwrite without restoring
+    def get_volatile_registers(self):
+        return x86_64_volatile_registers
+
+    # Gets the register counting the iterations of a rep instruction
+    def get_count_register(self):
+        return "rcx"
  
     # Parse x86 movs opcode
     def parse_movs(self, insn, args):
@@ -236,9 +271,12 @@ class Parser_x86_64(Parser_x86):
 
     # Parse syscall opcode
     def parse_syscall(self, insn, args):
+
+        # Operands depend on the syscall, so the instruction is not cached
+        self.template = None
         
         # Get RAX
-        rax = self.debugger.evaluate('$rax')
+        rax = self.debugger.get_register('rax')
         
         # Determine if syscall requires us to do anything special
         # For now, only read() is special 
@@ -266,7 +304,7 @@ class Parser_x86_64(Parser_x86):
     
     # Performs any additional tasks after performing a slice step
     def step_cleanup(self):
-        self.last_rax = self.debugger.evaluate('$rax')
+        self.last_rax = self.to_signed(self.debugger.get_register('rax'), 64)
         pass
     
 x86_64_parse_opcode_fxn = {
@@ -7,13 +7,13 @@
 
 try:
     from pydslice import *
-    from pydslice import init_callbacks
+    from pydslice import init_callbacks, checkpoint_callbacks
     from pydslice_debugger_gdb import *
     from pydslice_debugger import *
     from pydslice_operand import *
 except ImportError:
     from pydslice.pydslice import *
-    from pydslice.pydslice import init_callbacks
+    from pydslice.pydslice import init_callbacks, checkpoint_callbacks
     from pydslice.pydslice_debugger_gdb import *
     from pydslice.pydslice_debugger import *
     from pydslice.pydslice_operand import *
@@ -132,4 +132,15 @@ def abrt_init_callback(slice):
             if operand.operand_type == OPERAND_TYPE_REGISTER:
                 operand.match_function = abrt_match_register
 
+def abrt_checkpoint_callback(slice):
+    return {'found_instruction': found_instruction, \
+            'match_memory_func': function_to_name(abrt_match_memory_func)}
+
+def abrt_resume_callback(slice, state):
+    global found_instruction
+    global abrt_match_memory_func
+    found_instruction = state['found_instruction']
+    abrt_match_memory_func = name_to_function(state['match_memory_func'])
+
 init_callbacks.append(abrt_init_callback)
+checkpoint_callbacks['abrt'] = (abrt_checkpoint_callback, abrt_resume_callback)
@@ -0,0 +1,369 @@
+# pydslice_policy.py
+#
+# Records a program while skipping code regions the slice does not need
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+# A policy file lists the regions to skip, one per line:
+#
+#     function <name>
+#     address <address>
+#
+# Lines starting with '#' are comments. A region is entered by a call to the
+# function or address and left when the call returns. GDB cannot pause a
+# recording, so on entry to a region the recording is saved to a segment
+# file and stopped. The region then runs without recording and the
+# recording starts again when it returns. The registers and memory the
+# region changed are kept as a gap, which becomes one instruction between
+# the segments when they are imported with "slice trace import".
+#
+# The segments and gaps are listed in order in a JSON manifest, as
+# ["record", <segment file>] and ["gap", <trace record>] parts.
+
+import gdb
+import json
+import re
+
+try:
+    import pydslice_debugger
+    from pydslice_debugger import *
+    from pydslice_auto_record import auto_record_print, is_running
+    from pydslice_record_file import bytes_to_int, POLICY_MANIFEST_SUFFIX, \
+            POLICY_PART_RECORD, POLICY_PART_GAP
+except ImportError:
+    import pydslice.pydslice_debugger
+    from pydslice.pydslice_debugger import *
+    from pydslice.pydslice_auto_record import auto_record_print, is_running
+    from pydslice.pydslice_record_file import bytes_to_int, \
+            POLICY_MANIFEST_SUFFIX, POLICY_PART_RECORD, POLICY_PART_GAP
+
+POLICY_REGION_FUNCTION = "function"
+POLICY_REGION_ADDRESS = "address"
+
+# Largest amount of writable memory compared to find the memory a skipped
+# region wrote
+POLICY_MAX_SNAPSHOT = 64 << 20
+
+# Registers compared to find the registers a skipped region wrote
+policy_registers_x86 = ["eax", "ebx", "ecx", "edx", "esi", "edi", "ebp", \
+        "esp"] + ["xmm%d" % x for x in range(8)]
+policy_registers_x86_64 = ["rax", "rbx", "rcx", "rdx", "rsi", "rdi", "rbp", \
+        "rsp", "r8", "r9", "r10", "r11", "r12", "r13", "r14", "r15"] + \
+        ["xmm%d" % x for x in range(16)]
+
+# Registers holding the arguments of a call, used by skipped regions
+policy_arguments_x86_64 = ["rdi", "rsi", "rdx", "rcx", "r8", "r9"]
+
+# Number of stack arguments used by skipped regions on x86
+POLICY_STACK_ARGUMENTS = 6
+
+# A code region skipped while recording
+class PolicyRegion():
+    kind = POLICY_REGION_FUNCTION
+    name = ""
+    address = 0
+
+    # Initializes the region
+    def __init__(self, kind, name, address=0):
+        self.kind = kind
+        self.name = name
+        self.address = address
+
+    # Gets the location of the region's entry breakpoint
+    def get_location(self):
+        if self.kind == POLICY_REGION_FUNCTION:
+            return "*" + self.name
+        return "*0x%x" % self.address
+
+    def to_string(self):
+        if self.kind == POLICY_REGION_FUNCTION:
+            return self.name
+        return "0x%x" % self.address
+
+# Reads the regions of a policy file
+def read_policy(path):
+    regions = []
+    with open(path, 'r') as f:
+        for number,line in enumerate(f):
+            s = line.split('#', 1)[0].split()
+            if not s:
+                continue
+            if s[0] == POLICY_REGION_FUNCTION and len(s) == 2:
+                regions.append(PolicyRegion(s[0], s[1]))
+            elif s[0] == POLICY_REGION_ADDRESS and len(s) == 2:
+                regions.append(PolicyRegion(s[0], s[1], int(s[1], 0)))
+            else:
+                raise ValueError("%s:%d: expected 'function <name>' or " \
+                        "'address <address>'" % (path, number + 1))
+    return regions
+
+# Gets the (start, end) memory mappings of the process which can be written
+def get_writable_mappings():
+    mappings = []
+    try:
+        output = gdb.execute("info proc mappings", False, True)
+    except gdb.error:
+        return mappings
+    for line in output.split("\n"):
+        s = line.split()
+        if len(s) < 5 or not s[0].startswith("0x"):
+            continue
+        if any(re.match("^[r-]w[x-][ps]$", x) for x in s[4:]):
+            mappings.append((int(s[0], 16), int(s[1], 16)))
+    return mappings
+
+# Converts the differences between two copies of memory at address into a
+# list of [start, length] ranges
+def diff_memory(address, old, new, page_size=0x1000):
+    ranges = []
+    for offset in range(0, len(old), page_size):
+        if old[offset:offset + page_size] == new[offset:offset + page_size]:
+            continue
+        for i in range(offset, min(offset + page_size, len(old))):
+            if old[i] == new[i]:
+                continue
+            if ranges and ranges[-1][0] + ranges[-1][1] == address + i:
+                ranges[-1][1] = ranges[-1][1] + 1
+            else:
+                ranges.append([address + i, 1])
+    return ranges
+
+# Breakpoint which stops only while its recorder is recording
+class PolicyBreakpoint(gdb.Breakpoint):
+    recorder = None
+    region = None
+
+    # Sets the breakpoint on the entry of a region
+    def __init__(self, recorder, region):
+        gdb.Breakpoint.__init__(self, region.get_location(), \
+                gdb.BP_BREAKPOINT, 0, True)
+        self.recorder = recorder
+        self.region = region
+
+    def stop(self):
+        if self.recorder.skipping:
+            return False
+        self.recorder.entered = self.region
+        return True
+
+# Breakpoint on the return address of a skipped region, stopping once the
+# stack has unwound past the region's frame
+class PolicyReturnBreakpoint(gdb.Breakpoint):
+    stack_register = ""
+    sp = 0
+
+    # Sets the breakpoint on a return address
+    def __init__(self, address, stack_register, sp):
+        gdb.Breakpoint.__init__(self, "*0x%x" % address, \
+                gdb.BP_BREAKPOINT, 0, True)
+        self.stack_register = stack_register
+        self.sp = sp
+
+    def stop(self):
+        return read_register(self.stack_register) > self.sp
+
+# Reads a register of the selected frame as an unsigned integer
+def read_register(name):
+    value = gdb.selected_frame().read_register(name)
+    if value.type.code == gdb.TYPE_CODE_UNION:
+        value = value['uint128']
+    mask = (1 << (8 * value.type.sizeof)) - 1
+    if value.type.code == gdb.TYPE_CODE_PTR:
+        value = value.cast(gdb.lookup_type('long'))
+    return int(value) & mask
+
+# Records a program, skipping the regions of a policy
+class PolicyRecorder():
+    regions = []
+    prefix = ""
+    architecture = ""
+    is_64bit = False
+    registers = []
+    stack_register = ""
+    word_size = 4
+    parts = []
+    segments = 0
+    gaps = 0
+    skipping = False
+    recording = False
+    entered = None
+    max_snapshot = POLICY_MAX_SNAPSHOT
+
+    # Initializes the recorder. Segment files are named after prefix
+    def __init__(self, regions, prefix, max_snapshot=POLICY_MAX_SNAPSHOT):
+        self.regions = regions
+        self.prefix = prefix
+        self.max_snapshot = max_snapshot
+        architecture = gdb.selected_frame().architecture().name()
+        self.is_64bit = "64" in architecture
+        if self.is_64bit:
+            self.registers = policy_registers_x86_64
+            self.stack_register = "rsp"
+            self.word_size = 8
+        else:
+            self.registers = policy_registers_x86
+            self.stack_register = "esp"
+            self.word_size = 4
+        self.architecture = architecture
+        self.parts = []
+        self.segments = 0
+        self.gaps = 0
+        self.skipping = False
+        self.recording = False
+        self.entered = None
+
+    # Reads the values of the compared registers
+    def read_registers(self):
+        values = {}
+        for name in self.registers:
+            try:
+                values[name] = read_register(name)
+            except gdb.error:
+                pass
+        return values
+
+    # Reads the writable memory of the process, or None if there is too much
+    # or some of it cannot be read
+    def read_mappings(self):
+        mappings = get_writable_mappings()
+        if not mappings or \
+                sum(end - start for start,end in mappings) > self.max_snapshot:
+            return None
+        inferior = gdb.selected_inferior()
+        snapshot = []
+        for start,end in mappings:
+            try:
+                data = bytearray(inferior.read_memory(start, end - start))
+            except gdb.MemoryError:
+                return None
+            snapshot.append((start, data))
+        return snapshot
+
+    # Saves the recording so far to the next segment file. Nothing is saved
+    # if nothing was recorded
+    def save_segment(self):
+        path = "%s.%d" % (self.prefix, self.segments)
+        try:
+            gdb.execute("record save %s" % path, False, True)
+        except gdb.error:
+            return
+        self.parts.append([POLICY_PART_RECORD, path])
+        self.segments = self.segments + 1
+
+    # Gets the operands a skipped region reads: its arguments
+    def get_arguments(self, sp):
+        if self.is_64bit:
+            return policy_arguments_x86_64,[]
+        return [],[[sp + self.word_size, \
+                POLICY_STACK_ARGUMENTS * self.word_size]]
+
+    # Runs a region without recording and records the registers and memory
+    # it wrote as a gap. A region is recorded instead if the memory it
+    # writes cannot be found, since a gap must list every write
+    def skip_region(self, region):
+        memory = self.read_mappings()
+        if memory == None:
+            auto_record_print(DEBUG_PRINT_LEVEL_WARNING, \
+                    "Cannot snapshot the memory %s may write, " \
+                    "recording it instead" % region.to_string())
+            return True
+
+        pc = int(gdb.selected_frame().pc())
+        sp = read_register(self.stack_register)
+        return_address = bytes_to_int(gdb.selected_inferior().read_memory( \
+                sp, self.word_size))
+        registers = self.read_registers()
+
+        self.save_segment()
+        gdb.execute("record stop", False, True)
+        self.recording = False
+
+        breakpoint = PolicyReturnBreakpoint(return_address, \
+                self.stack_register, sp)
+        self.skipping = True
+        try:
+            gdb.execute("continue", False, True)
+        finally:
+            self.skipping = False
+            breakpoint.delete()
+        if not is_running() or int(gdb.selected_frame().pc()) != \
+                return_address:
+            auto_record_print(DEBUG_PRINT_LEVEL_ALWAYS, \
+                    "Program stopped inside %s" % region.to_string())
+            return False
+
+        exit_sp = read_register(self.stack_register)
+        def_regs = [name for name,value in self.read_registers().items() \
+                if registers.get(name) != value]
+        def_mem = []
+        inferior = gdb.selected_inferior()
+        for start,old in memory:
+            try:
+                new = bytearray(inferior.read_memory(start, len(old)))
+            except gdb.MemoryError:
+                continue
+            ranges = diff_memory(start, old, new)
+
+            # Only memory above the stack pointer is live after the return
+            if start <= exit_sp < start + len(old):
+                ranges = [x for x in ranges if x[0] >= exit_sp]
+            def_mem.extend(ranges)
+
+        use_regs,use_mem = self.get_arguments(sp)
+        self.parts.append([POLICY_PART_GAP, [pc, "<skipped %s>" % \
+                region.to_string(), sorted(def_regs), def_mem, use_regs, \
+                use_mem, "", "", region.to_string()]])
+        self.gaps = self.gaps + 1
+        auto_record_print(DEBUG_PRINT_LEVEL_INFO, \
+                "Skipped %s: %d registers, %d memory ranges written" % \
+                (region.to_string(), len(def_regs), len(def_mem)))
+
+        gdb.execute("record full", False, True)
+        self.recording = True
+        return True
+
+    # Writes the manifest listing the segments and gaps
+    def write_manifest(self):
+        manifest = {}
+        manifest['architecture'] = self.architecture
+        manifest['parts'] = self.parts
+        with open(self.prefix + POLICY_MANIFEST_SUFFIX, 'w') as f:
+            json.dump(manifest, f)
+
+    # Records the program from its current position until it stops for
+    # anything other than entering a skipped region
+    def run(self):
+        breakpoints = []
+        for region in self.regions:
+            try:
+                breakpoints.append(PolicyBreakpoint(self, region))
+            except gdb.error:
+                auto_record_print(DEBUG_PRINT_LEVEL_WARNING, \
+                        "Cannot find %s" % region.to_string())
+
+        try:
+            gdb.execute("record full", False, True)
+        except gdb.error:
+            # Already recording
+            pass
+        self.recording = True
+
+        try:
+            while True:
+                self.entered = None
+                gdb.execute("continue", False)
+                if not is_running() or self.entered == None:
+                    break
+                if not self.skip_region(self.entered):
+                    break
+        finally:
+            for breakpoint in breakpoints:
+                breakpoint.delete()
+
+        if self.recording and is_running():
+            self.save_segment()
+        self.write_manifest()
+        auto_record_print(DEBUG_PRINT_LEVEL_ALWAYS, \
+                "Recorded %d segments with %d skipped regions to %s%s" % \
+                (self.segments, self.gaps, self.prefix, \
+                POLICY_MANIFEST_SUFFIX))
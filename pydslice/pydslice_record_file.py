@@ -0,0 +1,470 @@
+# pydslice_record_file.py
+#
+# Reader for GDB 'record save' files
+#
+# A record file is an ELF core file holding the state of the process at the
+# start of the recording plus a "precord" section with the record-full log.
+# The log is a list of entries in network byte order:
+#
+#     4 bytes: magic number 0x20091016
+#     record end: 1 byte type (0), 4 bytes signal, 4 bytes instruction number
+#     register:   1 byte type (1), 4 bytes register number, register value
+#     memory:     1 byte type (2), 4 bytes length, 8 bytes address, value
+#
+# Each instruction is a list of register and memory entries followed by an end
+# entry. When the file is saved, GDB rewinds the recording to its beginning, so
+# the entries hold the values after the instruction executed.
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+import binascii
+import json
+import re
+import struct
+
+try:
+    from pydslice_debugger import *
+    from pydslice_operand import *
+    from pydslice_parser_x86 import *
+    from pydslice_parser_x86_64 import *
+    from pydslice_trace import *
+    from pydslice_trace_columns import *
+    from pydslice_x86_defs import *
+except ImportError:
+    from pydslice.pydslice_debugger import *
+    from pydslice.pydslice_operand import *
+    from pydslice.pydslice_parser_x86 import *
+    from pydslice.pydslice_parser_x86_64 import *
+    from pydslice.pydslice_trace import *
+    from pydslice.pydslice_trace_columns import *
+    from pydslice.pydslice_x86_defs import *
+
+RECORD_FILE_MAGIC = 0x20091016
+
+# Manifest of a recording split into segments by a recording policy, and the
+# kinds of its parts
+POLICY_MANIFEST_SUFFIX = ".json"
+POLICY_PART_RECORD = "record"
+POLICY_PART_GAP = "gap"
+
+RECORD_ENTRY_END = 0
+RECORD_ENTRY_REG = 1
+RECORD_ENTRY_MEM = 2
+
+ELF_MACHINE_386    = 3
+ELF_MACHINE_X86_64 = 62
+
+ELF_PT_LOAD = 1
+ELF_PT_NOTE = 4
+
+ELF_NT_PRSTATUS = 1
+ELF_NT_FPREGSET = 2
+ELF_NT_PRXFPREG = 0x46e62b7f
+
+# Offset of xmm0 in the FXSAVE area of the floating point notes
+FXSAVE_XMM_OFFSET = 160
+
+# Converts little endian bytes into an integer
+def bytes_to_int(data):
+    if not data:
+        return 0
+    return int(binascii.hexlify(bytearray(reversed(bytearray(data)))), 16)
+
+# A single recorded instruction. Register and memory values are the values
+# after the instruction executed
+class RecordInstruction():
+    registers = []
+    memory = []
+    signal = 0
+    number = 0
+
+    # Initializes the recorded instruction
+    def __init__(self):
+        self.registers = []
+        self.memory = []
+        self.signal = 0
+        self.number = 0
+
+class RecordFileReader():
+    f = None
+    is_64bit = False
+    machine = 0
+    gdb_registers = []
+    segments = []
+    registers = {}
+    signal = 0
+    log_offset = 0
+    log_size = 0
+
+    # Initializes the reader and parses the ELF headers of the record file
+    def __init__(self, path):
+        self.f = open(path, 'rb')
+        self.segments = []
+        self.registers = {}
+        ident = self.f.read(16)
+        if ident[:4] != b'\x7fELF':
+            raise ValueError("%s is not a GDB record file" % path)
+        self.is_64bit = bytearray(ident)[4] == 2
+
+        if self.is_64bit:
+            header = struct.unpack('<HHIQQQIHHHHHH', self.f.read(48))
+        else:
+            header = struct.unpack('<HHIIIIIHHHHHH', self.f.read(36))
+        self.machine = header[1]
+        phoff,shoff = header[4],header[5]
+        phentsize,phnum = header[8],header[9]
+        shentsize,shnum,shstrndx = header[10],header[11],header[12]
+
+        if self.machine == ELF_MACHINE_X86_64:
+            self.gdb_registers = x86_64_gdb_registers
+        elif self.machine == ELF_MACHINE_386:
+            self.gdb_registers = x86_gdb_registers
+        else:
+            raise ValueError("Unsupported architecture in %s" % path)
+
+        for i in range(0, phnum):
+            self.f.seek(phoff + i * phentsize)
+            if self.is_64bit:
+                p_type,p_flags,offset,vaddr,paddr,filesz,memsz,align = \
+                        struct.unpack('<IIQQQQQQ', self.f.read(56))
+            else:
+                p_type,offset,vaddr,paddr,filesz,memsz,p_flags,align = \
+                        struct.unpack('<IIIIIIII', self.f.read(32))
+            if p_type == ELF_PT_LOAD and filesz > 0:
+                self.segments.append([vaddr, filesz, offset])
+            elif p_type == ELF_PT_NOTE:
+                self.parse_notes(offset, filesz)
+
+        sections = []
+        for i in range(0, shnum):
+            self.f.seek(shoff + i * shentsize)
+            if self.is_64bit:
+                s = struct.unpack('<IIQQQQIIQQ', self.f.read(64))
+            else:
+                s = struct.unpack('<IIIIIIIIII', self.f.read(40))
+            sections.append([s[0], s[4], s[5]])
+
+        if shstrndx < len(sections):
+            self.f.seek(sections[shstrndx][1])
+            names = self.f.read(sections[shstrndx][2])
+            for name,offset,size in sections:
+                if names[name:names.find(b'\0', name)] == b'precord':
+                    self.log_offset = offset
+                    self.log_size = size
+
+        if self.log_size == 0:
+            raise ValueError("%s has no record log" % path)
+
+        self.f.seek(self.log_offset)
+        magic = struct.unpack('>I', self.f.read(4))[0]
+        if magic != RECORD_FILE_MAGIC:
+            raise ValueError("Unsupported record log version in %s" % path)
+
+    # Returns the architecture of the recorded process
+    def get_architecture(self):
+        if self.is_64bit:
+            return "i386:x86-64"
+        return "i386"
+
+    # Parses the register notes of the first thread in the core file
+    def parse_notes(self, offset, size):
+        found_prstatus = False
+        end = offset + size
+        while offset + 12 <= end:
+            self.f.seek(offset)
+            namesz,descsz,note_type = struct.unpack('<III', self.f.read(12))
+            desc_offset = offset + 12 + ((namesz + 3) & ~3)
+            offset = desc_offset + ((descsz + 3) & ~3)
+            self.f.seek(desc_offset)
+            desc = self.f.read(descsz)
+
+            if note_type == ELF_NT_PRSTATUS:
+                # Only use the registers of the first thread
+                if found_prstatus:
+                    break
+                found_prstatus = True
+                self.signal = struct.unpack('<h', desc[12:14])[0]
+                if self.is_64bit:
+                    names = x86_64_prstatus_registers
+                    start,width = x86_64_prstatus_offset,8
+                else:
+                    names = x86_prstatus_registers
+                    start,width = x86_prstatus_offset,4
+                for i in range(0, len(names)):
+                    if names[i]:
+                        data = desc[start + i * width:start + (i+1) * width]
+                        self.registers[names[i]] = bytes_to_int(data)
+
+            elif (note_type == ELF_NT_FPREGSET and self.is_64bit) or \
+                    (note_type == ELF_NT_PRXFPREG and not self.is_64bit):
+                count = 16 if self.is_64bit else 8
+                for i in range(0, count):
+                    start = FXSAVE_XMM_OFFSET + i * 16
+                    self.registers["xmm%d" % i] = \
+                            bytes_to_int(desc[start:start + 16])
+
+    # Reads memory of the process at the start of the recording
+    def read_memory(self, address, length):
+        for vaddr,filesz,offset in self.segments:
+            if address >= vaddr and address + length <= vaddr + filesz:
+                self.f.seek(offset + address - vaddr)
+                return self.f.read(length)
+        return None
+
+    # Iterates over the recorded instructions without loading the log
+    def __iter__(self):
+        offset = self.log_offset + 4
+        end = self.log_offset + self.log_size
+        insn = RecordInstruction()
+
+        while offset < end:
+            self.f.seek(offset)
+            entry_type = bytearray(self.f.read(1))[0]
+            if entry_type == RECORD_ENTRY_END:
+                insn.signal,insn.number = struct.unpack('>II', self.f.read(8))
+                offset = offset + 9
+                yield insn
+                insn = RecordInstruction()
+            elif entry_type == RECORD_ENTRY_REG:
+                regnum = struct.unpack('>I', self.f.read(4))[0]
+                if regnum >= len(self.gdb_registers):
+                    raise ValueError("Unknown register number %d" % regnum)
+                name,size = self.gdb_registers[regnum]
+                value = self.f.read(size)
+                offset = offset + 5 + size
+                insn.registers.append([name, bytes_to_int(value)])
+            elif entry_type == RECORD_ENTRY_MEM:
+                length,address = struct.unpack('>IQ', self.f.read(12))
+                value = self.f.read(length)
+                offset = offset + 13 + length
+                insn.memory.append([address, value])
+            else:
+                raise ValueError("Corrupt record log at offset %d" % offset)
+
+    # Closes the record file
+    def close(self):
+        self.f.close()
+
+# Debugger interface which replays a record file instead of a live process
+class RecordDebugger(TraceDebugger):
+    reader = None
+    registers = {}
+    registers_table = None
+    memory = {}
+    pc_register = ""
+    disassembler = None
+    disassembly = {}
+
+    # Initializes the record debugger interface. disassembler is a function
+    # returning the disassembly text of the instruction at an address
+    def __init__(self, reader, disassembler):
+        self.reader = reader
+        self.registers = dict(reader.registers)
+        self.memory = {}
+        self.disassembler = disassembler
+        self.disassembly = {}
+        if reader.is_64bit:
+            self.pc_register = 'rip'
+            self.registers_table = x86_64_registers
+        else:
+            self.pc_register = 'eip'
+            self.registers_table = x86_registers
+
+    # Gets the value of $pc
+    def get_pc(self):
+        return self.registers.get(self.pc_register, 0)
+
+    # Returns the architecture for the process
+    def get_architecture(self):
+        return self.reader.get_architecture()
+
+    # Disassembles the instruction at pc
+    def disassemble(self, pc):
+        if pc not in self.disassembly:
+            self.disassembly[pc] = self.disassembler(pc)
+        return self.disassembly[pc]
+
+    # Gets symbol information about the line of code at pc
+    def get_line_info(self, pc=None):
+        return "","",""
+
+    # Get symbol info for address
+    def get_addr_info(self, address):
+        return ''
+
+    # Gets the value of a register or sub-register
+    def get_register(self, name):
+        if name not in self.registers_table:
+            return 0
+        value = self.registers.get(self.registers_table[name][0], 0)
+        if name in x86_subregisters:
+            shift,mask = x86_subregisters[name]
+            value = (value >> shift) & mask
+        return value
+
+    # Evaluates an expression of registers and immediates
+    def evaluate(self, expr):
+        total = 0
+        sign = 1
+        product = None
+        for token in re.findall("\$[a-z0-9]+|0x[0-9a-f]+|[0-9]+|[-+*]", \
+                expr.replace(".uint128", ""), re.I):
+            if token == '+' or token == '-':
+                total = total + sign * (product or 0)
+                sign = 1 if token == '+' else -1
+                product = None
+                continue
+            if token == '*':
+                continue
+            if token[0] == '$':
+                value = self.get_register(token[1:])
+            else:
+                value = int(token, 0)
+            product = value if product == None else product * value
+        return total + sign * (product or 0)
+
+    # Evaluates an expression as an address
+    def evaluate_as_address(self, expr):
+        if self.reader.is_64bit:
+            return self.evaluate(expr) & 0xffffffffffffffff
+        return self.evaluate(expr) & 0xffffffff
+
+    # Retrieves a 1 byte value from memory of the recorded process
+    def read_byte(self, address):
+        if type(address) != type(0):
+            address = int(address, 16)
+        if address in self.memory:
+            return self.memory[address]
+        value = self.reader.read_memory(address, 1)
+        if not value:
+            return 0
+        return bytearray(value)[0]
+
+    # Retrieves length bytes from memory of the recorded process
+    def read_memory(self, address, length):
+        data = self.reader.read_memory(address, length)
+        if data == None or len(data) != length:
+            return Debugger.read_memory(self, address, length)
+        data = bytearray(data)
+        if len(self.memory) < length:
+            for addr,byte in self.memory.items():
+                if address <= addr < address + length:
+                    data[addr - address] = byte
+        else:
+            for i in range(0, length):
+                if address + i in self.memory:
+                    data[i] = self.memory[address + i]
+        return data
+
+    # Applies the changes of a recorded instruction. Returns the changes needed
+    # to undo it
+    def apply(self, insn):
+        undo = RecordInstruction()
+        for name,value in insn.registers:
+            if name:
+                undo.registers.append([name, self.registers.get(name, 0)])
+                self.registers[name] = value
+        for address,value in insn.memory:
+            old = bytearray()
+            for i in range(0, len(value)):
+                old.append(self.read_byte(address + i))
+            undo.memory.append([address, old])
+            for i,byte in enumerate(bytearray(value)):
+                self.memory[address + i] = byte
+        return undo
+
+# Trace file written from one or more record files. The file is created
+# when the first record is written, once the architecture is known
+class RecordTraceWriter():
+    path = ""
+    header = {}
+    writer = None
+    count = 0
+
+    # Initializes the writer of the trace file at path
+    def __init__(self, path, architecture=""):
+        self.path = path
+        self.header = {}
+        self.header['architecture'] = architecture
+        self.header['signal'] = 0
+        self.header['monitor_stack'] = False
+        self.header['first_insn'] = None
+        self.header['registers'] = []
+        self.header['memory'] = []
+        self.header['insns'] = []
+        self.writer = None
+        self.count = 0
+
+    # Writes a trace record. number is the record instruction number the
+    # record was converted from, if any
+    def write(self, record, number=None):
+        if self.header['first_insn'] == None:
+            self.header['first_insn'] = number
+        if self.writer == None:
+            self.writer = create_trace_writer(self.path, self.header)
+        self.writer.write(record)
+        self.count = self.count + 1
+
+    # Finishes the trace file
+    def close(self):
+        if self.writer == None:
+            self.writer = create_trace_writer(self.path, self.header)
+        self.writer.close()
+
+# Converts the instructions of a GDB record file into records of a trace
+def write_record_file(path, trace, disassembler):
+    reader = RecordFileReader(path)
+    debugger = RecordDebugger(reader, disassembler)
+    if reader.is_64bit:
+        parser = Parser_x86_64(debugger)
+    else:
+        parser = Parser_x86(debugger)
+    trace.header['architecture'] = reader.get_architecture()
+
+    for recorded in reader:
+        pc = debugger.get_pc()
+        opcode = debugger.disassemble(pc).split(' ', 1)[0]
+
+        # read() syscalls need the return value of the syscall
+        if opcode in ["syscall", "sysenter"]:
+            undo = debugger.apply(recorded)
+            parser.step_cleanup()
+            debugger.apply(undo)
+
+        insn = parser.parse_insn(pc)
+        record = TraceRecord.from_insn(insn)
+
+        # The recorded changes are the exact def set of the instruction
+        for name,value in recorded.registers:
+            if name and name != debugger.pc_register and \
+                    name not in record.def_regs:
+                record.def_regs.append(name)
+        record.def_mem = [[address, len(value)] for address,value in \
+                recorded.memory if len(value) > 0]
+        trace.write(record, recorded.number)
+
+        debugger.apply(recorded)
+
+    reader.close()
+
+# Converts a GDB record file into a slice trace file
+def record_file_to_trace(path, trace_path, disassembler):
+    trace = RecordTraceWriter(trace_path)
+    write_record_file(path, trace, disassembler)
+    trace.close()
+    return trace.count
+
+# Converts the segments and gaps of a policy recording manifest into a slice
+# trace file. Each gap becomes a single record between its segments
+def policy_recording_to_trace(path, trace_path, disassembler):
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    trace = RecordTraceWriter(trace_path, manifest.get('architecture', ''))
+    for kind,part in manifest['parts']:
+        if kind == POLICY_PART_RECORD:
+            write_record_file(part, trace, disassembler)
+        else:
+            trace.write(TraceRecord.from_list(part))
+    trace.close()
+    return trace.count
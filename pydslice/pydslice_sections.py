@@ -0,0 +1,100 @@
+# pydslice_sections.py
+#
+# Address map of the sections and memory mappings of the debugged process
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+from bisect import bisect_right
+
+# Kinds of memory regions
+REGION_UNKNOWN   = "unknown"
+REGION_TEXT      = "text"
+REGION_RODATA    = "rodata"
+REGION_DATA      = "data"
+REGION_BSS       = "bss"
+REGION_HEAP      = "heap"
+REGION_STACK     = "stack"
+REGION_MAPPED    = "mapped"
+REGION_ANONYMOUS = "anonymous"
+REGION_VDSO      = "vdso"
+
+class MemoryRegion():
+    start = 0
+    end = 0
+    name = ""
+    objfile = ""
+    region = REGION_UNKNOWN
+    executable = False
+
+    # Initializes the region covering [start, end)
+    def __init__(self, start, end, name, objfile, region, executable):
+        self.start = start
+        self.end = end
+        self.name = name
+        self.objfile = objfile
+        self.region = region
+        self.executable = executable
+
+    # Outputs a human-readable string for the region
+    def to_string(self):
+        str = "0x%x-0x%x %s %s" % (self.start, self.end, self.region, \
+                self.name)
+        if self.objfile and self.objfile != self.name:
+            str = str + " (" + self.objfile + ")"
+        return str
+
+# Non-overlapping memory regions sorted by start address
+class SectionMap():
+    regions = []
+    starts = []
+
+    # Initializes the map
+    def __init__(self):
+        self.regions = []
+        self.starts = []
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __iter__(self):
+        return iter(self.regions)
+
+    # Adds a region to the map
+    def add(self, region):
+        if region.end > region.start:
+            self.regions.append(region)
+
+    # Sorts the map. Must be called after adding regions
+    def build(self):
+        self.regions.sort(key=lambda x: x.start)
+        self.starts = [x.start for x in self.regions]
+
+    # Finds the region containing address, or None
+    def find(self, address):
+        index = bisect_right(self.starts, address) - 1
+        if index < 0 or address >= self.regions[index].end:
+            return None
+        return self.regions[index]
+
+# Classifies an object file section by its name and flags
+def section_region(name, flags):
+    if "CODE" in flags:
+        return REGION_TEXT
+    if name.startswith(".bss") or name.startswith(".tbss"):
+        return REGION_BSS
+    if "READONLY" in flags:
+        return REGION_RODATA
+    return REGION_DATA
+
+# Classifies a memory mapping by its /proc/<pid>/maps name
+def mapping_region(name):
+    if name == "[heap]":
+        return REGION_HEAP
+    if name.startswith("[stack"):
+        return REGION_STACK
+    if name in ["[vdso]", "[vvar]", "[vsyscall]"]:
+        return REGION_VDSO
+    if name:
+        return REGION_MAPPED
+    return REGION_ANONYMOUS
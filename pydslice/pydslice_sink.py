@@ -0,0 +1,322 @@
+# pydslice_sink.py
+#
+# Streams slice instructions to a file as they are found
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+# An InsnSink stands in for the slice's instruction list. Only the last
+# instructions are kept in memory, older ones are read back from the file
+# when the slice is printed or saved. Deleted instructions are skipped when
+# reading and left out of the file when it is closed.
+#
+# Trace sinks only hold the trace record of each instruction. Their criteria
+# and record instruction numbers are kept in memory while the sink is open,
+# and are not in the file once it is closed.
+
+import bisect
+import collections
+import csv
+import itertools
+import json
+import os
+import zlib
+
+try:
+    from pydslice_insn import *
+    from pydslice_operand import *
+    from pydslice_trace import *
+    from pydslice_trace_columns import *
+except ImportError:
+    from pydslice.pydslice_insn import *
+    from pydslice.pydslice_operand import *
+    from pydslice.pydslice_trace import *
+    from pydslice.pydslice_trace_columns import *
+
+SINK_FORMAT_JSONL = "jsonl"
+SINK_FORMAT_CSV = "csv"
+SINK_FORMAT_TRACE = "trace"
+
+# Instructions kept in memory by default
+SINK_WINDOW = 1000
+
+# Bytes read at a time when reading back a sink file
+SINK_READ_SIZE = 65536
+
+# Columns of a CSV sink
+sink_csv_columns = ["pc", "text", "file", "line", "sym", "opcode", \
+        "criteria", "comment", "src", "dest", "record_number"]
+
+# Gets the format and compression of a sink from its file name
+def sink_format(path):
+    compress = path.endswith(".gz")
+    if compress:
+        path = path[:-3]
+    if path.endswith(".csv"):
+        return SINK_FORMAT_CSV,compress
+    if path.endswith(".trace") or path.endswith(COLUMN_TRACE_SUFFIX):
+        if compress:
+            raise ValueError("Trace sinks cannot be compressed")
+        return SINK_FORMAT_TRACE,False
+    return SINK_FORMAT_JSONL,compress
+
+# Serializes an operand
+def operand_to_list(operand):
+    return [operand.operand_type, operand.is_memory, operand.address, \
+            operand.value, operand.size, operand.symbol, \
+            list(operand.base_register)]
+
+# Creates an operand from its serialized form
+def operand_from_list(data):
+    operand = Operand(data[0], data[1], data[2], data[3], data[4])
+    operand.symbol = data[5]
+    if data[6]:
+        operand.base_register = intern_base_register(data[6])
+    return operand
+
+# Serializes an instruction
+def insn_to_list(insn):
+    return [insn.pc, insn.text, insn.file, insn.line, insn.sym, insn.opcode, \
+            insn.criteria, insn.comment, \
+            [operand_to_list(x) for x in insn.src_list], \
+            [operand_to_list(x) for x in insn.dest_list], insn.record_number]
+
+# Creates an instruction from its serialized form
+def insn_from_list(data):
+    insn = Insn(data[0])
+    insn.text = data[1]
+    insn.set_line_info(data[3], data[2], data[4])
+    insn.opcode = data[5]
+    insn.criteria = data[6]
+    insn.comment = data[7]
+    insn.src_list = [operand_from_list(x) for x in data[8]]
+    insn.dest_list = [operand_from_list(x) for x in data[9]]
+
+    # Instructions saved before record numbers were kept have none
+    if len(data) > 10:
+        insn.record_number = data[10]
+    return insn
+
+# Collects the lines written by a csv writer
+class LineBuffer():
+    lines = []
+
+    # Initializes the buffer
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+# Instruction list backed by a file
+class InsnSink():
+    path = ""
+    format = SINK_FORMAT_JSONL
+    compress = False
+    window = SINK_WINDOW
+    f = None
+    writer = None
+    compressor = None
+    buffer = None
+    csv_writer = None
+    count = 0
+    tail = None
+    deleted = []
+    deleted_set = set()
+    criteria = []
+    record_numbers = []
+
+    # Initializes the sink, writing to path
+    def __init__(self, path, window=SINK_WINDOW):
+        self.path = path
+        self.format,self.compress = sink_format(path)
+        self.window = window
+        self.count = 0
+        self.tail = collections.deque()
+        self.deleted = []
+        self.deleted_set = set()
+        self.criteria = []
+        self.record_numbers = []
+
+        if self.format == SINK_FORMAT_TRACE:
+            self.writer = create_trace_writer(path, {'insns': []})
+            return
+
+        self.f = open(path, 'wb')
+        if self.compress:
+            self.compressor = zlib.compressobj(9, zlib.DEFLATED, \
+                    16 + zlib.MAX_WBITS)
+        if self.format == SINK_FORMAT_CSV:
+            self.buffer = LineBuffer()
+            self.csv_writer = csv.writer(self.buffer, lineterminator="\n")
+            self.csv_writer.writerow(sink_csv_columns)
+            self.write_lines()
+
+    # Writes the lines collected from the csv writer
+    def write_lines(self):
+        for line in self.buffer.lines:
+            self.write_data(line)
+        self.buffer.lines = []
+
+    # Writes a string to the sink file
+    def write_data(self, data):
+        data = data.encode('utf-8')
+        if self.compressor:
+            data = self.compressor.compress(data)
+        self.f.write(data)
+
+    # Writes an instruction to the sink file
+    def write_insn(self, insn):
+        if self.format == SINK_FORMAT_TRACE:
+            self.writer.write(TraceRecord.from_insn(insn))
+            self.criteria.append(insn.criteria)
+            self.record_numbers.append(insn.record_number)
+            return
+
+        data = insn_to_list(insn)
+        if self.format == SINK_FORMAT_JSONL:
+            self.write_data(json.dumps(data) + "\n")
+            return
+        self.csv_writer.writerow(data[:8] + [json.dumps(data[8]), \
+                json.dumps(data[9]), json.dumps(data[10])])
+        self.write_lines()
+
+    # Adds an instruction to the end of the list
+    def append(self, insn):
+        self.write_insn(insn)
+        self.tail.append((self.count, insn))
+        if len(self.tail) > self.window:
+            self.tail.popleft()
+        self.count = self.count + 1
+
+    # Makes everything written readable from the sink file
+    def flush(self):
+        if self.f == None:
+            return
+        if self.compressor:
+            self.f.write(self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.f.flush()
+
+    # Finishes writing the sink file. If instructions were deleted, the rest
+    # are written to a new file which replaces it. The criteria and record
+    # instruction numbers of trace sinks are not written to the new file
+    def close(self):
+        if not self.deleted:
+            self.finish()
+            return
+
+        directory,name = os.path.split(self.path)
+        temp_path = os.path.join(directory, "tmp-" + name)
+        sink = InsnSink(temp_path, 0)
+        for insn in self:
+            sink.append(insn)
+        sink.finish()
+        self.finish()
+        os.rename(temp_path, self.path)
+
+    # Finishes writing the sink file as it is
+    def finish(self):
+        if self.writer:
+            self.writer.close()
+            return
+        if self.compressor:
+            self.f.write(self.compressor.flush())
+        self.f.close()
+
+    # Reads the lines of the sink file
+    def read_lines(self):
+        self.flush()
+        decompressor = None
+        if self.compress:
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        partial = b""
+        with open(self.path, 'rb') as f:
+            while True:
+                data = f.read(SINK_READ_SIZE)
+                if not data:
+                    break
+                if decompressor:
+                    data = decompressor.decompress(data)
+                lines = (partial + data).split(b"\n")
+                partial = lines.pop()
+                for line in lines:
+                    yield line.decode('utf-8')
+
+    # Reads back the instructions written to the sink file, oldest first
+    def read_insns(self):
+        if isinstance(self.writer, ColumnTraceWriter):
+            for i in range(self.count):
+                insn = self.writer.get_record(i).to_insn()
+                insn.criteria = self.criteria[i]
+                insn.record_number = self.record_numbers[i]
+                yield insn
+            return
+
+        if self.writer:
+            self.writer.f.flush()
+            with open(self.path, 'r') as f:
+                f.readline()
+                for i,line in enumerate(f):
+                    insn = TraceRecord.from_list(json.loads(line)).to_insn()
+                    insn.criteria = self.criteria[i]
+                    insn.record_number = self.record_numbers[i]
+                    yield insn
+            return
+
+        lines = self.read_lines()
+        if self.format == SINK_FORMAT_JSONL:
+            for line in lines:
+                yield insn_from_list(json.loads(line))
+            return
+        rows = csv.reader(lines)
+        next(rows)
+        for row in rows:
+            yield insn_from_list([int(row[0])] + row[1:6] + \
+                    [int(row[6]), row[7], json.loads(row[8]), \
+                    json.loads(row[9]), json.loads(row[10])])
+
+    # Iterates over every instruction, deleted or not, with its index in the
+    # sink file. Instructions still in memory are not read back
+    def read_all(self):
+        first = self.count - len(self.tail)
+        if first > 0:
+            for x in enumerate(itertools.islice(self.read_insns(), first)):
+                yield x
+        for x in self.tail:
+            yield x
+
+    # Converts an index of the list to an index in the sink file
+    def get_position(self, index):
+        if index < 0:
+            index = index + len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("slice instruction out of range")
+        for x in self.deleted:
+            if x > index:
+                break
+            index = index + 1
+        return index
+
+    def __len__(self):
+        return self.count - len(self.deleted)
+
+    def __iter__(self):
+        for position,insn in self.read_all():
+            if position not in self.deleted_set:
+                yield insn
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start,stop,step = index.indices(len(self))
+            return list(itertools.islice(iter(self), start, stop, step))
+
+        position = self.get_position(index)
+        if position >= self.count - len(self.tail):
+            return self.tail[position - self.count + len(self.tail)][1]
+        for x,insn in self.read_all():
+            if x == position:
+                return insn
+
+    def __delitem__(self, index):
+        position = self.get_position(index)
+        bisect.insort(self.deleted, position)
+        self.deleted_set.add(position)
@@ -0,0 +1,324 @@
+# pydslice_summary.py
+#
+# Static summaries of the registers and memory a function may write
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+try:
+    from pydslice_operand import *
+    from pydslice_parser_x86 import ARG_REGISTER, ARG_IMMEDIATE, ARG_MEMORY
+except ImportError:
+    from pydslice.pydslice_operand import *
+    from pydslice.pydslice_parser_x86 import ARG_REGISTER, ARG_IMMEDIATE, \
+            ARG_MEMORY
+
+# Depth of calls followed when summarizing a function
+SUMMARY_MAX_DEPTH = 8
+
+# Opcodes which move the stack pointer by one word
+push_opcodes = ["push", "pushf", "pushfd", "pushfq"]
+pop_opcodes = ["pop", "popf", "popfd", "popfq"]
+
+# Opcodes after which execution does not fall through
+unconditional_opcodes = ["ret", "retf", "iret", "jmp", "jmpf", "jmpn"]
+
+# Registers and memory that a function, and the functions it calls, may
+# write. Writes to the function's own stack frame are kept apart since they
+# are below the stack pointer once the function returns
+class FunctionSummary():
+    start = 0
+    name = ""
+    registers = set()
+    writes_memory = False
+    writes_frame = False
+    complete = False
+
+    # Initializes an empty summary of the function starting at start
+    def __init__(self, start, name):
+        self.start = start
+        self.name = name
+        self.registers = set()
+        self.writes_memory = False
+        self.writes_frame = False
+        self.complete = True
+
+    # Adds the writes of a called function
+    def merge(self, summary):
+        self.registers.update(summary.registers)
+        self.writes_memory = self.writes_memory or summary.writes_memory
+        self.writes_frame = self.writes_frame or summary.writes_frame
+        self.complete = self.complete and summary.complete
+
+    # Determines if the function may write any of operands. sp is the stack
+    # pointer at the function's ret
+    def may_define(self, operands, sp):
+        if not self.complete or operands.others:
+            return True
+        for key in operands.registers:
+            if key in self.registers:
+                return True
+        if operands.memory:
+            if self.writes_memory:
+                return True
+            if self.writes_frame and operands.starts[0] < sp:
+                return True
+        return False
+
+    # Outputs a human-readable string for the summary
+    def to_string(self):
+        if not self.complete:
+            return "%s: unknown" % self.name
+        str = "%s: %s" % (self.name, \
+                " ".join(sorted(x[0] for x in self.registers)))
+        if self.writes_memory:
+            str = str + " memory"
+        if self.writes_frame:
+            str = str + " frame"
+        return str
+
+# Builds and caches the summaries of functions from their disassembly
+class FunctionSummaries():
+    debugger = None
+    parser = None
+    summaries = {}
+    returns = {}
+    stack_register = None
+    frame_register = None
+    word_size = 4
+
+    # Initializes the summaries
+    def __init__(self, debugger, parser):
+        self.debugger = debugger
+        self.parser = parser
+        self.summaries = {}
+        self.returns = {}
+        self.stack_register = tuple(parser.registers["esp"])
+        self.frame_register = tuple(parser.registers["ebp"])
+        self.word_size = parser.address_mask.bit_length() // 8
+
+    def __len__(self):
+        return len(self.summaries)
+
+    # Gets the summary of the function returning at pc
+    def get(self, pc):
+        summary = self.returns.get(pc)
+        if summary == None:
+            summary = self.get_function(pc, 0, [])
+            self.returns[pc] = summary
+        return summary
+
+    # Gets the summary of the function containing pc
+    def get_function(self, pc, depth, active):
+        insns = self.debugger.disassemble_function(pc)
+        if not insns:
+            summary = FunctionSummary(pc, "0x%x" % pc)
+            summary.complete = False
+            return summary
+
+        start = insns[0][0]
+        if start not in self.summaries:
+            self.summarize(insns, depth, active)
+        return self.summaries[start]
+
+    # Summarizes the instructions of a function, a list of (address, text)
+    def summarize(self, insns, depth, active):
+        start = insns[0][0]
+        end = insns[-1][0]
+        summary = FunctionSummary(start, self.debugger.get_function(start)[0])
+        active.append(start)
+
+        # Decode the function as (address, opcode, args, target), where target
+        # is the destination of a direct call or jump
+        decoded_insns = []
+        for address,text in insns:
+            decoded = self.parser.decode_insn(address, text)
+            if decoded == None:
+                summary.complete = False
+                break
+            insn,args = decoded
+            opcode = insn.opcode
+            if opcode in ["rep", "repz", "repnz"]:
+                opcode = insn.opcode2
+
+            target = None
+            if opcode == "call" or opcode.startswith("j"):
+                target = self.get_target(args)
+                if target == None:
+                    summary.complete = False
+                    break
+            decoded_insns.append((address, opcode, args, target))
+
+        depths = self.get_frame_depths(decoded_insns, summary)
+        for i,(address,opcode,args,target) in enumerate(decoded_insns):
+            if target != None and \
+                    (opcode == "call" or target < start or target > end):
+                self.merge_callee(summary, target, depth, active)
+
+            stack_depth,frame_depth = depths[i]
+            for arg,operand_direction in args:
+                if arg == None or operand_direction == OPERAND_DIRECTION_SRC:
+                    continue
+                if arg[0] == ARG_REGISTER:
+                    summary.registers.add(tuple(arg[2]))
+                elif arg[0] == ARG_MEMORY:
+                    if self.is_frame_write(arg, stack_depth, frame_depth):
+                        summary.writes_frame = True
+                    else:
+                        summary.writes_memory = True
+
+        active.pop()
+        self.summaries[start] = summary
+        return summary
+
+    # Gets the (stack depth, frame depth) before each decoded instruction of
+    # a function by following its control flow from the entry. stack depth
+    # is the least number of bytes the stack pointer can be below the stack
+    # pointer on entry. frame depth is the same for the frame pointer, or
+    # None if it is not known to point into the frame. A point reached with
+    # different depths gets the smallest, and leaves the summary incomplete
+    def get_frame_depths(self, insns, summary):
+        depths = [None] * len(insns)
+        if not insns:
+            return depths
+        start = insns[0][0]
+        end = insns[-1][0]
+        indexes = dict((x[0], i) for i,x in enumerate(insns))
+
+        depths[0] = (0, None)
+        work = [0]
+        while work:
+            i = work.pop()
+            address,opcode,args,target = insns[i]
+            stack_depth,frame_depth = depths[i]
+            after = self.update_frame(opcode, args, stack_depth, frame_depth)
+
+            successors = []
+            if opcode not in unconditional_opcodes and i + 1 < len(insns):
+                successors.append(i + 1)
+            if opcode.startswith("j") and start <= target <= end:
+                if target in indexes:
+                    successors.append(indexes[target])
+                else:
+                    summary.complete = False
+
+            for j in successors:
+                joined = self.join_depths(depths[j], after, summary)
+                if joined != depths[j]:
+                    depths[j] = joined
+                    work.append(j)
+
+        # Instructions not reached from the entry are taken to be at entry
+        return [x if x != None else (0, None) for x in depths]
+
+    # Joins the depths of two paths reaching the same instruction
+    def join_depths(self, old, new, summary):
+        if old == None:
+            return new
+        if old != new:
+            summary.complete = False
+        frame_depth = None
+        if old[1] != None and new[1] != None:
+            frame_depth = min(old[1], new[1])
+        return min(old[0], new[0]),frame_depth
+
+    # Adds the summary of a called function. Recursion and calls too deep to
+    # follow leave the summary incomplete
+    def merge_callee(self, summary, target, depth, active):
+        if target in active:
+            if target != summary.start:
+                summary.complete = False
+            return
+        if depth >= SUMMARY_MAX_DEPTH:
+            summary.complete = False
+            return
+
+        callee = self.summaries.get(target)
+        if callee == None:
+            callee = self.get_function(target, depth + 1, active)
+            if callee.start != target:
+                summary.complete = False
+                return
+        summary.merge(callee)
+
+    # Gets the address a direct call or jump transfers control to, or None
+    # for indirect calls and jumps
+    def get_target(self, args):
+        if not args or args[0][0] == None:
+            return None
+        if args[0][0][0] != ARG_IMMEDIATE:
+            return None
+        return args[0][0][1]
+
+    # Gets the constant offset of a memory reference from register, or None
+    # if the address also depends on other registers
+    def get_offset(self, arg, register):
+        kind,size,terms,regs = arg
+        if len(regs) != 1 or tuple(regs[0][1]) != register:
+            return None
+        offset = 0
+        for sign,factors in terms:
+            if factors == [regs[0][0]]:
+                if sign < 0:
+                    return None
+                continue
+            product = sign
+            for factor in factors:
+                if isinstance(factor, str):
+                    return None
+                product = product * factor
+            offset = offset + product
+        return offset
+
+    # Determines if a memory write is within the function's stack frame,
+    # below the stack pointer on entry
+    def is_frame_write(self, arg, stack_depth, frame_depth):
+        size = arg[1]
+        if size <= 0:
+            return False
+        offset = self.get_offset(arg, self.stack_register)
+        if offset != None and offset + size <= stack_depth:
+            return True
+        offset = self.get_offset(arg, self.frame_register)
+        return offset != None and frame_depth != None and \
+                offset + size <= frame_depth
+
+    # Determines if a decoded argument is the given register
+    def is_register(self, arg, register):
+        return arg != None and arg[0] == ARG_REGISTER and \
+                tuple(arg[2]) == register
+
+    # Updates the stack and frame depths after an instruction
+    def update_frame(self, opcode, args, stack_depth, frame_depth):
+        writes_stack = False
+        for arg,operand_direction in args:
+            if operand_direction == OPERAND_DIRECTION_SRC:
+                continue
+            if self.is_register(arg, self.frame_register):
+                frame_depth = None
+            if self.is_register(arg, self.stack_register):
+                writes_stack = True
+
+        if opcode == "mov" and len(args) == 2 and \
+                self.is_register(args[0][0], self.frame_register) and \
+                self.is_register(args[1][0], self.stack_register):
+            frame_depth = stack_depth
+
+        if opcode in push_opcodes:
+            stack_depth = stack_depth + self.word_size
+        elif opcode in pop_opcodes:
+            stack_depth = stack_depth - self.word_size
+        elif opcode == "call":
+            # Callees may pop their arguments
+            stack_depth = stack_depth - self.word_size
+        elif opcode in ["sub", "add"] and len(args) == 2 and \
+                self.is_register(args[0][0], self.stack_register) and \
+                args[1][0] != None and args[1][0][0] == ARG_IMMEDIATE:
+            value = self.parser.to_signed(args[1][0][1], self.word_size * 8)
+            if opcode == "sub":
+                stack_depth = stack_depth + value
+            else:
+                stack_depth = stack_depth - value
+        elif opcode != "and" and writes_stack:
+            stack_depth = 0
+        return max(stack_depth, 0),frame_depth
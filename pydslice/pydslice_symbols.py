@@ -0,0 +1,55 @@
+# pydslice_symbols.py
+#
+# Address index of variables for resolving memory operands to symbols
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+from bisect import bisect_right
+
+# Sorted index of the address ranges of variables. Ranges are added in any
+# order and sorted once by build()
+class SymbolIndex():
+    entries = []
+    starts = []
+    pointers = []
+
+    # Initializes the index
+    def __init__(self):
+        self.entries = []
+        self.starts = []
+        self.pointers = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Adds the variable name covering [address, address + size)
+    def add(self, address, size, name):
+        self.entries.append((address, address + max(size, 1), name))
+
+    # Adds a pointer variable whose value may be matched by lookups. value is
+    # a function returning the current value of the pointer
+    def add_pointer(self, name, value):
+        self.pointers.append((name, value))
+
+    # Sorts the index. Must be called after adding ranges
+    def build(self):
+        self.entries.sort()
+        self.starts = [x[0] for x in self.entries]
+
+    # Finds the variable covering address. Returns the name and the offset of
+    # address within the variable, or None
+    def lookup(self, address):
+        index = bisect_right(self.starts, address) - 1
+        if index < 0:
+            return None
+        start,end,name = self.entries[index]
+        if address >= end:
+            return None
+        return name,address - start
+
+# Formats a symbol found by SymbolIndex.lookup
+def symbol_to_string(name, offset):
+    if offset:
+        return "%s+0x%x" % (name, offset)
+    return name
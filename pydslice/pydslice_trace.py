@@ -0,0 +1,192 @@
+# pydslice_trace.py
+#
+# Execution trace of def/use sets for offline slice computation
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+import json
+import sys
+
+try:
+    import pydslice_debugger
+    from pydslice_debugger import *
+    from pydslice_insn import *
+    from pydslice_operand import *
+except ImportError:
+    import pydslice.pydslice_debugger
+    from pydslice.pydslice_debugger import *
+    from pydslice.pydslice_insn import *
+    from pydslice.pydslice_operand import *
+
+TRACE_VERSION = 1
+
+# Debugger interface for slices which do not talk to a live process
+class TraceDebugger(Debugger):
+    architecture = ""
+
+    # Initializes the trace debugger interface
+    def __init__(self, architecture=""):
+        self.architecture = architecture
+
+    # Gets the architecture the trace was captured on
+    def get_architecture(self):
+        return self.architecture
+
+    # Prints string based on current debug level
+    def print_msg(self, level, str):
+        try:
+            current_level = pydslice_debugger.debug_print_level
+        except NameError:
+            current_level = pydslice.pydslice_debugger.debug_print_level
+
+        if level <= current_level:
+            sys.stdout.write(str + '\n')
+            sys.stdout.flush()
+
+# Converts a list of memory operands into a list of [start, length] ranges
+def operands_to_ranges(operands):
+    ranges = []
+    for x in sorted([x for x in operands if \
+            x.operand_type == OPERAND_TYPE_MEMORY], key=lambda x: x.address):
+        if ranges and ranges[-1][0] + ranges[-1][1] >= x.address:
+            ranges[-1][1] = max(ranges[-1][1], x.end() - ranges[-1][0])
+        else:
+            ranges.append([x.address, x.size])
+    return ranges
+
+# Converts a list of register operands into a list of base register names
+def operands_to_registers(operands):
+    registers = []
+    for x in operands:
+        if x.operand_type != OPERAND_TYPE_REGISTER or not x.base_register:
+            continue
+        if x.base_register[0] not in registers:
+            registers.append(x.base_register[0])
+    return registers
+
+class TraceRecord():
+    pc = 0
+    text = ""
+    opcode = ""
+    def_regs = []
+    def_mem = []
+    use_regs = []
+    use_mem = []
+    line = ""
+    file = ""
+    sym = ""
+
+    # Initializes the trace record
+    def __init__(self, pc, text, def_regs, def_mem, use_regs, use_mem):
+        self.pc = pc
+        self.text = text
+        self.opcode = text.split(' ', 1)[0]
+        self.def_regs = def_regs
+        self.def_mem = def_mem
+        self.use_regs = use_regs
+        self.use_mem = use_mem
+        self.line = ""
+        self.file = ""
+        self.sym = ""
+
+    # Creates a trace record from a parsed instruction
+    @staticmethod
+    def from_insn(insn):
+        record = TraceRecord(insn.pc, insn.text, \
+                operands_to_registers(insn.dest_list), \
+                operands_to_ranges(insn.dest_list), \
+                operands_to_registers(insn.src_list), \
+                operands_to_ranges(insn.src_list))
+        record.line = insn.line
+        record.file = insn.file
+        record.sym = insn.sym
+        return record
+
+    # Creates a trace record from its serialized form
+    @staticmethod
+    def from_list(data):
+        record = TraceRecord(data[0], data[1], data[2], data[3], data[4], \
+                data[5])
+        record.file,record.line,record.sym = data[6],data[7],data[8]
+        return record
+
+    # Serializes the trace record
+    def to_list(self):
+        return [self.pc, self.text, self.def_regs, self.def_mem, \
+                self.use_regs, self.use_mem, self.file, self.line, self.sym]
+
+    # Creates an instruction for displaying the trace record
+    def to_insn(self):
+        insn = Insn(self.pc)
+        insn.text = self.text
+        insn.opcode = self.opcode
+        insn.set_line_info(self.line, self.file, self.sym)
+        for reg in self.use_regs:
+            insn.add_operand(register_operand(reg), OPERAND_DIRECTION_SRC)
+        for start,length in self.use_mem:
+            insn.add_operand(Operand(OPERAND_TYPE_MEMORY, False, start, 0, \
+                    length), OPERAND_DIRECTION_SRC)
+        for reg in self.def_regs:
+            insn.add_operand(register_operand(reg), OPERAND_DIRECTION_DST)
+        for start,length in self.def_mem:
+            insn.add_operand(Operand(OPERAND_TYPE_MEMORY, False, start, 0, \
+                    length), OPERAND_DIRECTION_DST)
+        return insn
+
+# Creates a register operand for a base register name
+def register_operand(name):
+    operand = Operand(OPERAND_TYPE_REGISTER, False, intern("$" + name), 0)
+    operand.base_register = intern_base_register([name])
+    return operand
+
+# Writes a trace file. The first line is a header describing the slice the
+# trace was captured for, each following line is a single instruction in
+# execution order
+class TraceWriter():
+    f = None
+    count = 0
+
+    # Initializes the trace writer
+    def __init__(self, path, header):
+        self.f = open(path, 'w')
+        self.count = 0
+        header['version'] = TRACE_VERSION
+        self.f.write(json.dumps(header) + "\n")
+
+    # Writes a single trace record
+    def write(self, record):
+        self.f.write(json.dumps(record.to_list()) + "\n")
+        self.count = self.count + 1
+
+    # Finishes writing the trace
+    def close(self):
+        self.f.close()
+
+# Reads a trace file
+class TraceReader():
+    header = None
+    records = []
+
+    # Initializes the trace reader
+    def __init__(self, path):
+        self.records = []
+        with open(path, 'r') as f:
+            self.header = json.loads(f.readline())
+            if self.header.get('version') != TRACE_VERSION:
+                raise ValueError("Unsupported trace version in %s" % path)
+            for line in f:
+                self.records.append(TraceRecord.from_list(json.loads(line)))
+
+    # Gets the indices of every record executed at pc, in execution order
+    def executions(self, pc):
+        return [i for i,x in enumerate(self.records) if x.pc == pc]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __iter__(self):
+        return iter(self.records)
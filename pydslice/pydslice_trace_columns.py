@@ -0,0 +1,454 @@
+# pydslice_trace_columns.py
+#
+# Columnar binary trace file, read through mmap
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+# File layout, all words are 64 bit in the byte order named in the footer:
+#
+#   magic, version, header length, JSON header (padded to a word)
+#   columns, each a run of words (padded to a word)
+#   JSON footer
+#   footer offset, footer length, magic
+#
+# The columns are:
+#
+#   pc              pc of each record
+#   def_regs        register bitmask of each record, REGISTER_MASK_WORDS words
+#   use_regs        register bitmask of each record, REGISTER_MASK_WORDS words
+#   def_mem_index   count + 1 offsets into def_mem
+#   use_mem_index   count + 1 offsets into use_mem
+#   def_mem         start, length pairs
+#   use_mem         start, length pairs
+#   pc_values       sorted unique pcs
+#   pc_starts       len(pc_values) + 1 offsets into pc_records
+#   pc_records      record indices grouped by pc, in execution order
+#
+# The footer holds the register names of the bitmasks, the column offsets
+# and the text and line info of each pc. Columns are written to temporary
+# files while recording and the pc index is built by sorting runs of records
+# and merging them, so the writer's memory does not grow with the number of
+# records, only with the number of distinct pcs.
+
+import array
+import bisect
+import heapq
+import json
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+
+try:
+    from pydslice_trace import *
+except ImportError:
+    from pydslice.pydslice_trace import *
+
+COLUMN_TRACE_MAGIC = b"PDSLTRC\0"
+COLUMN_TRACE_VERSION = 1
+
+# Traces written to paths ending with this are columnar
+COLUMN_TRACE_SUFFIX = ".ctrace"
+
+# Words in a register bitmask
+REGISTER_MASK_WORDS = 2
+
+# Records buffered before the columns are written out
+COLUMN_BUFFER_RECORDS = 4096
+
+# Records sorted by pc at a time when building the pc index
+PC_INDEX_RUN_RECORDS = 1 << 20
+
+# Columns in file order
+trace_columns = ["pc", "def_regs", "use_regs", "def_mem_index", \
+        "use_mem_index", "def_mem", "use_mem", "pc_values", "pc_starts", \
+        "pc_records"]
+
+# Array type code of a 64 bit word
+try:
+    array.array('Q')
+    WORD_TYPECODE = 'Q'
+except ValueError:
+    WORD_TYPECODE = 'L'
+
+# Creates an empty array of words
+def word_array():
+    return array.array(WORD_TYPECODE)
+
+# Bytes of padding after length bytes to reach a word boundary
+def word_padding(length):
+    return -length % 8
+
+# Creates an array of words from bytes
+def read_words(data):
+    words = word_array()
+    if hasattr(words, "frombytes"):
+        words.frombytes(data)
+    else:
+        words.fromstring(data)
+    return words
+
+# Converts a buffer of words to a sequence of integers. Buffers in native
+# byte order are not copied
+def to_words(buffer, byteorder):
+    if byteorder == sys.byteorder and hasattr(buffer, "cast"):
+        return buffer.cast(WORD_TYPECODE)
+    words = read_words(buffer.tobytes())
+    if byteorder != sys.byteorder:
+        words.byteswap()
+    return words
+
+# Converts the words of a register bitmask to register names
+def mask_to_registers(words, registers):
+    names = []
+    for i,mask in enumerate(words):
+        bit = 64 * i
+        while mask:
+            if mask & 1:
+                names.append(registers[bit])
+            mask = mask >> 1
+            bit = bit + 1
+    return names
+
+# Writes the bytes of a word array
+def write_words(f, words):
+    if hasattr(words, "tobytes"):
+        f.write(words.tobytes())
+    else:
+        f.write(words.tostring())
+
+# Writes a columnar trace file
+class ColumnTraceWriter():
+    f = None
+    count = 0
+    registers = []
+    register_bits = {}
+    statics = {}
+    columns = {}
+    buffers = {}
+    def_mem_count = 0
+    use_mem_count = 0
+
+    # Initializes the trace writer
+    def __init__(self, path, header):
+        self.f = open(path, 'wb')
+        self.count = 0
+        self.registers = []
+        self.register_bits = {}
+        self.statics = {}
+        self.columns = {}
+        self.buffers = {}
+        for name in trace_columns[:7]:
+            self.columns[name] = tempfile.TemporaryFile()
+            self.buffers[name] = word_array()
+        self.buffers["def_mem_index"].append(0)
+        self.buffers["use_mem_index"].append(0)
+        self.def_mem_count = 0
+        self.use_mem_count = 0
+
+        header['version'] = TRACE_VERSION
+        data = json.dumps(header).encode()
+        self.f.write(COLUMN_TRACE_MAGIC)
+        self.f.write(struct.pack('<II', COLUMN_TRACE_VERSION, len(data)))
+        self.f.write(data + b"\0" * word_padding(len(data)))
+
+    # Gets the bitmask of a list of register names as words
+    def get_register_mask(self, names):
+        mask = 0
+        for name in names:
+            bit = self.register_bits.get(name)
+            if bit == None:
+                bit = len(self.registers)
+                if bit >= REGISTER_MASK_WORDS * 64:
+                    raise ValueError("Too many registers for trace file")
+                self.registers.append(name)
+                self.register_bits[name] = bit
+            mask = mask | (1 << bit)
+        return [(mask >> (64 * i)) & 0xffffffffffffffff for i in \
+                range(REGISTER_MASK_WORDS)]
+
+    # Writes a single trace record
+    def write(self, record):
+        if record.pc not in self.statics:
+            self.statics[record.pc] = [record.text, record.file, \
+                    record.line, record.sym]
+
+        self.buffers["pc"].append(record.pc)
+        self.buffers["def_regs"].extend(self.get_register_mask( \
+                record.def_regs))
+        self.buffers["use_regs"].extend(self.get_register_mask( \
+                record.use_regs))
+        for start,length in record.def_mem:
+            self.buffers["def_mem"].extend([start, length])
+        for start,length in record.use_mem:
+            self.buffers["use_mem"].extend([start, length])
+        self.def_mem_count = self.def_mem_count + len(record.def_mem)
+        self.use_mem_count = self.use_mem_count + len(record.use_mem)
+        self.buffers["def_mem_index"].append(self.def_mem_count)
+        self.buffers["use_mem_index"].append(self.use_mem_count)
+
+        self.count = self.count + 1
+        if self.count % COLUMN_BUFFER_RECORDS == 0:
+            self.flush()
+
+    # Writes the buffered records to the column files
+    def flush(self):
+        for name,words in self.buffers.items():
+            write_words(self.columns[name], words)
+            self.buffers[name] = word_array()
+
+    # Reads count words of a column file starting at word start
+    def read_column_words(self, name, start, count):
+        f = self.columns[name]
+        f.seek(start * 8)
+        words = read_words(f.read(count * 8))
+        f.seek(0, 2)
+        return words
+
+    # Reads back a record which has been written
+    def get_record(self, index):
+        self.flush()
+        pc = self.read_column_words("pc", index, 1)[0]
+        text,file,line,sym = self.statics[pc]
+        regs = []
+        ranges = []
+        for name in ["def", "use"]:
+            words = self.read_column_words(name + "_regs", \
+                    index * REGISTER_MASK_WORDS, REGISTER_MASK_WORDS)
+            regs.append(mask_to_registers(words, self.registers))
+            start,end = self.read_column_words(name + "_mem_index", index, 2)
+            words = self.read_column_words(name + "_mem", 2 * start, \
+                    2 * (end - start))
+            ranges.append([[words[i], words[i + 1]] for i in \
+                    range(0, len(words), 2)])
+        record = TraceRecord(pc, text, regs[0], ranges[0], regs[1], ranges[1])
+        record.line = line
+        record.file = file
+        record.sym = sym
+        return record
+
+    # Builds the pc index columns from the pc column. The records are sorted
+    # by pc in runs written to a temporary file, then the runs are merged
+    # into the pc_records column
+    def write_pc_index(self, footer):
+        counts = {}
+        runs = tempfile.TemporaryFile()
+        run_starts = []
+        index = 0
+        for words in self.read_column(self.columns["pc"], \
+                PC_INDEX_RUN_RECORDS):
+            pairs = word_array()
+            for i in sorted(range(len(words)), key=words.__getitem__):
+                pairs.extend([words[i], index + i])
+            write_words(runs, pairs)
+            for pc in words:
+                counts[pc] = counts.get(pc, 0) + 1
+            run_starts.append([index, len(words)])
+            index = index + len(words)
+
+        values = sorted(counts)
+        starts = word_array()
+        starts.append(0)
+        for pc in values:
+            starts.append(starts[-1] + counts[pc])
+        counts = None
+
+        words = word_array()
+        words.extend(values)
+        self.write_column(footer, "pc_values", words)
+        self.write_column(footer, "pc_starts", starts)
+
+        # Equal pcs are merged in record order
+        footer['columns']["pc_records"] = [self.f.tell(), self.count]
+        records = word_array()
+        for pc,index in heapq.merge(*[self.read_run(runs, start, count) \
+                for start,count in run_starts]):
+            records.append(index)
+            if len(records) == COLUMN_BUFFER_RECORDS:
+                write_words(self.f, records)
+                records = word_array()
+        write_words(self.f, records)
+        runs.close()
+
+    # Reads a column file in chunks of words
+    def read_column(self, f, size=COLUMN_BUFFER_RECORDS):
+        f.seek(0)
+        while True:
+            data = f.read(size * 8)
+            if not data:
+                break
+            yield read_words(data)
+
+    # Reads the (pc, record index) pairs of a sorted run. Runs share a file,
+    # so each read seeks to the run first
+    def read_run(self, f, start, count):
+        while count > 0:
+            size = min(count, COLUMN_BUFFER_RECORDS)
+            f.seek(start * 16)
+            words = read_words(f.read(size * 16))
+            for i in range(0, len(words), 2):
+                yield words[i],words[i + 1]
+            start = start + size
+            count = count - size
+
+    # Writes a column held in memory
+    def write_column(self, footer, name, words):
+        footer['columns'][name] = [self.f.tell(), len(words)]
+        write_words(self.f, words)
+
+    # Finishes writing the trace
+    def close(self):
+        self.flush()
+        footer = {}
+        footer['count'] = self.count
+        footer['byteorder'] = sys.byteorder
+        footer['registers'] = self.registers
+        footer['columns'] = {}
+        footer['statics'] = [[pc] + info for pc,info in \
+                sorted(self.statics.items())]
+
+        for name in trace_columns[:7]:
+            f = self.columns[name]
+            footer['columns'][name] = [self.f.tell(), f.tell() // 8]
+            f.seek(0)
+            shutil.copyfileobj(f, self.f)
+        self.write_pc_index(footer)
+        for f in self.columns.values():
+            f.close()
+
+        data = json.dumps(footer).encode()
+        offset = self.f.tell()
+        self.f.write(data)
+        self.f.write(struct.pack('<QQ', offset, len(data)))
+        self.f.write(COLUMN_TRACE_MAGIC)
+        self.f.close()
+
+# Reads a columnar trace file. Columns are sequences of words backed by the
+# mapped file
+class ColumnTraceReader():
+    header = None
+    f = None
+    map = None
+    count = 0
+    registers = []
+    statics = {}
+    columns = {}
+
+    # Initializes the trace reader
+    def __init__(self, path):
+        self.f = open(path, 'rb')
+        self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic_size = len(COLUMN_TRACE_MAGIC)
+        if self.map[:magic_size] != COLUMN_TRACE_MAGIC or \
+                self.map[-magic_size:] != COLUMN_TRACE_MAGIC:
+            raise ValueError("%s is not a columnar trace file" % path)
+
+        version,length = struct.unpack_from('<II', self.map, magic_size)
+        if version != COLUMN_TRACE_VERSION:
+            raise ValueError("Unsupported trace version in %s" % path)
+        start = magic_size + 8
+        self.header = json.loads(self.map[start:start + length].decode())
+        if self.header.get('version') != TRACE_VERSION:
+            raise ValueError("Unsupported trace version in %s" % path)
+
+        offset,length = struct.unpack_from('<QQ', self.map, \
+                len(self.map) - magic_size - 16)
+        footer = json.loads(self.map[offset:offset + length].decode())
+        self.count = footer['count']
+        self.registers = footer['registers']
+        self.statics = {}
+        for pc,text,file,line,sym in footer['statics']:
+            self.statics[pc] = (text, file, line, sym)
+
+        self.columns = {}
+        view = memoryview(self.map)
+        for name,(offset,length) in footer['columns'].items():
+            self.columns[name] = to_words(view[offset:offset + length * 8], \
+                    footer['byteorder'])
+
+    # Releases the mapped file
+    def close(self):
+        for x in self.columns.values():
+            if hasattr(x, "release"):
+                x.release()
+        self.columns = {}
+        self.map.close()
+        self.f.close()
+
+    # Gets the rows [start, end) of a column without copying them
+    def column(self, name, start=0, end=None):
+        if end == None:
+            end = self.count
+        if name in ["def_regs", "use_regs"]:
+            start = start * REGISTER_MASK_WORDS
+            end = end * REGISTER_MASK_WORDS
+        return self.columns[name][start:end]
+
+    # Gets the pcs of the records [start, end)
+    def pcs(self, start=0, end=None):
+        return self.column("pc", start, end)
+
+    # Gets the indices of every record executed at pc, in execution order
+    def executions(self, pc):
+        values = self.columns["pc_values"]
+        i = bisect.bisect_left(values, pc)
+        if i == len(values) or values[i] != pc:
+            return self.columns["pc_records"][0:0]
+        starts = self.columns["pc_starts"]
+        return self.columns["pc_records"][starts[i]:starts[i + 1]]
+
+    # Converts a register bitmask of a record to register names
+    def get_registers(self, name, index):
+        start = index * REGISTER_MASK_WORDS
+        return mask_to_registers(self.columns[name][start:start + \
+                REGISTER_MASK_WORDS], self.registers)
+
+    # Gets the [start, length] memory ranges of a record
+    def get_ranges(self, name, index):
+        offsets = self.columns[name + "_index"]
+        words = self.columns[name]
+        return [[words[2 * i], words[2 * i + 1]] for i in \
+                range(offsets[index], offsets[index + 1])]
+
+    # Creates an instruction for displaying a record
+    def to_insn(self, index):
+        return self[index].to_insn()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index = index + self.count
+        if index < 0 or index >= self.count:
+            raise IndexError("trace record out of range")
+        pc = self.columns["pc"][index]
+        text,file,line,sym = self.statics[pc]
+        record = TraceRecord(pc, text, \
+                self.get_registers("def_regs", index), \
+                self.get_ranges("def_mem", index), \
+                self.get_registers("use_regs", index), \
+                self.get_ranges("use_mem", index))
+        record.line = line
+        record.file = file
+        record.sym = sym
+        return record
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+# Opens a trace file of either format
+def open_trace(path):
+    with open(path, 'rb') as f:
+        magic = f.read(len(COLUMN_TRACE_MAGIC))
+    if magic == COLUMN_TRACE_MAGIC:
+        return ColumnTraceReader(path)
+    return TraceReader(path)
+
+# Creates a trace writer, columnar if path ends with COLUMN_TRACE_SUFFIX
+def create_trace_writer(path, header):
+    if path.endswith(COLUMN_TRACE_SUFFIX):
+        return ColumnTraceWriter(path, header)
+    return TraceWriter(path, header)
@@ -0,0 +1,58 @@
+# pydslice_watchpoints.py
+#
+# Schedules hardware watchpoints on the memory tracked by a slice
+#
+# Copyright (C) 2016 Josh Burbrink <dev.burbrink@gmail.com>
+#
+
+try:
+    from pydslice_operand import *
+except ImportError:
+    from pydslice.pydslice_operand import *
+
+# Number of x86 debug registers available for watchpoints
+MAX_WATCHPOINTS = 4
+
+# Splits [start, end) into naturally aligned chunks of at most max_size bytes,
+# the sizes a debug register can watch. Returns a list of (address, size)
+def aligned_chunks(start, end, max_size):
+    chunks = []
+    while start < end:
+        size = max_size
+        while size > 1 and (start % size or start + size > end):
+            size = size // 2
+        chunks.append((start, size))
+        start = start + size
+    return chunks
+
+# Chooses the watchpoints needed to find the last write to any tracked
+# memory range. Watchpoints can only replace single-stepping when every
+# tracked operand is watched
+class WatchpointScheduler():
+    max_watchpoints = MAX_WATCHPOINTS
+    max_size = 8
+
+    # Initializes the scheduler. max_size is the largest range a single
+    # watchpoint can cover
+    def __init__(self, max_size, max_watchpoints=MAX_WATCHPOINTS):
+        self.max_size = max_size
+        self.max_watchpoints = max_watchpoints
+
+    # Returns the (address, size) chunks to watch for operands, or None if
+    # the operands cannot all be watched
+    def schedule(self, operands):
+        memory = []
+        for operand in operands:
+            if operand.operand_type != OPERAND_TYPE_MEMORY:
+                return None
+            memory.append(operand)
+        if not memory:
+            return None
+
+        chunks = []
+        for operand in memory:
+            chunks.extend(aligned_chunks(operand.address, operand.end(), \
+                    self.max_size))
+            if len(chunks) > self.max_watchpoints:
+                return None
+        return chunks
@@ -6,6 +6,9 @@
 
 # x86 Definitions
 
+# Direction flag of eflags, set when string instructions step backwards
+X86_FLAG_DF = 1 << 10
+
 x86_registers = {
     'eax' : ['eax'],
     'ebx' : ['ebx'],
@@ -60,6 +63,128 @@ x86_registers = {
     'xmm15' : ['xmm15'],
 }
 
+# Sub-registers as [shift, mask] of their base register
+x86_subregisters = {
+    'eax' : [0, 0xffffffff],
+    'ebx' : [0, 0xffffffff],
+    'ecx' : [0, 0xffffffff],
+    'edx' : [0, 0xffffffff],
+    'esp' : [0, 0xffffffff],
+    'ebp' : [0, 0xffffffff],
+    'esi' : [0, 0xffffffff],
+    'edi' : [0, 0xffffffff],
+    'eip' : [0, 0xffffffff],
+    'ax' : [0, 0xffff],
+    'bx' : [0, 0xffff],
+    'cx' : [0, 0xffff],
+    'dx' : [0, 0xffff],
+    'si' : [0, 0xffff],
+    'di' : [0, 0xffff],
+    'bp' : [0, 0xffff],
+    'ah' : [8, 0xff],
+    'al' : [0, 0xff],
+    'bh' : [8, 0xff],
+    'bl' : [0, 0xff],
+    'ch' : [8, 0xff],
+    'cl' : [0, 0xff],
+    'dh' : [8, 0xff],
+    'dl' : [0, 0xff],
+    'spl' : [0, 0xff],
+    'bpl' : [0, 0xff],
+    'dil' : [0, 0xff],
+    'sil' : [0, 0xff],
+    'r8d' : [0, 0xffffffff],
+    'r9d' : [0, 0xffffffff],
+    'r10d' : [0, 0xffffffff],
+    'r11d' : [0, 0xffffffff],
+    'r12d' : [0, 0xffffffff],
+    'r13d' : [0, 0xffffffff],
+    'r14d' : [0, 0xffffffff],
+    'r15d' : [0, 0xffffffff],
+    'r8w' : [0, 0xffff],
+    'r9w' : [0, 0xffff],
+    'r10w' : [0, 0xffff],
+    'r11w' : [0, 0xffff],
+    'r12w' : [0, 0xffff],
+    'r13w' : [0, 0xffff],
+    'r14w' : [0, 0xffff],
+    'r15w' : [0, 0xffff],
+    'r8b' : [0, 0xff],
+    'r9b' : [0, 0xff],
+    'r10b' : [0, 0xff],
+    'r11b' : [0, 0xff],
+    'r12b' : [0, 0xff],
+    'r13b' : [0, 0xff],
+    'r14b' : [0, 0xff],
+    'r15b' : [0, 0xff],
+}
+
+# GDB register numbers as [name, size]. Registers the slicer does not track 
+# have a name of None. GDB numbers every register of the architecture, so the
+# AVX, MPX, AVX-512 and PKRU registers have numbers even when the process
+# does not have them
+x86_gdb_registers = [
+    ['eax', 4],
+    ['ecx', 4],
+    ['edx', 4],
+    ['ebx', 4],
+    ['esp', 4],
+    ['ebp', 4],
+    ['esi', 4],
+    ['edi', 4],
+    ['eip', 4],
+    [None, 4],      # eflags
+    ['cs', 4],
+    ['ss', 4],
+    ['ds', 4],
+    ['es', 4],
+    ['fs', 4],
+    ['gs', 4],
+    [None, 10],     # st0
+    [None, 10],
+    [None, 10],
+    [None, 10],
+    [None, 10],
+    [None, 10],
+    [None, 10],
+    [None, 10],     # st7
+    [None, 4],      # fctrl
+    [None, 4],
+    [None, 4],
+    [None, 4],
+    [None, 4],
+    [None, 4],
+    [None, 4],
+    [None, 4],      # fop
+    ['xmm0', 16],
+    ['xmm1', 16],
+    ['xmm2', 16],
+    ['xmm3', 16],
+    ['xmm4', 16],
+    ['xmm5', 16],
+    ['xmm6', 16],
+    ['xmm7', 16],
+    [None, 4],      # mxcsr
+] + [[None, 16] for x in range(8)] + [     # ymm0h-ymm7h
+    [None, 16],     # bnd0raw
+    [None, 16],
+    [None, 16],
+    [None, 16],     # bnd3raw
+    [None, 8],      # bndcfgu
+    [None, 8],      # bndstatus
+] + [[None, 8] for x in range(8)] + \
+    [[None, 32] for x in range(8)] + [     # k0-k7, zmm0h-zmm7h
+    [None, 4],      # pkru
+    [None, 4],      # fs_base
+    [None, 4],      # gs_base
+    [None, 4],      # orig_eax
+]
+
+# Register order of the NT_PRSTATUS note of a core file
+x86_prstatus_offset = 72
+x86_prstatus_registers = ['ebx', 'ecx', 'edx', 'esi', 'edi', 'ebp', 'eax', 
+        'ds', 'es', 'fs', 'gs', None, 'eip', 'cs', None, 'esp', 'ss']
+
 x86_syscall_table = {
     0 : [0, "restart_syscall"],
     1 : [1, "_exit"],
@@ -516,6 +641,90 @@ x86_64_registers = {
     'xmm15' : ['xmm15'],
 }
 
+# GDB register numbers as [name, size]. Registers the slicer does not track 
+# have a name of None. See x86_gdb_registers
+x86_64_gdb_registers = [
+    ['rax', 8],
+    ['rbx', 8],
+    ['rcx', 8],
+    ['rdx', 8],
+    ['rsi', 8],
+    ['rdi', 8],
+    ['rbp', 8],
+    ['rsp', 8],
+    ['r8', 8],
+    ['r9', 8],
+    ['r10', 8],
+    ['r11', 8],
+    ['r12', 8],
+    ['r13', 8],
+    ['r14', 8],
+    ['r15', 8],
+    ['rip', 8],
+    [None, 4],      # eflags
+    ['cs', 4],
+    ['ss', 4],
+    ['ds', 4],
+    ['es', 4],
+    ['fs', 4],
+    ['gs', 4],
+    [None, 10],     # st0
+    [None, 10],
+    [None, 10],
+    [None, 10],
+    [None, 10],
+    [None, 10],
+    [None, 10],
+    [None, 10],     # st7
+    [None, 4],      # fctrl
+    [None, 4],
+    [None, 4],
+    [None, 4],
+    [None, 4],
+    [None, 4],
+    [None, 4],
+    [None, 4],      # fop
+    ['xmm0', 16],
+    ['xmm1', 16],
+    ['xmm2', 16],
+    ['xmm3', 16],
+    ['xmm4', 16],
+    ['xmm5', 16],
+    ['xmm6', 16],
+    ['xmm7', 16],
+    ['xmm8', 16],
+    ['xmm9', 16],
+    ['xmm10', 16],
+    ['xmm11', 16],
+    ['xmm12', 16],
+    ['xmm13', 16],
+    ['xmm14', 16],
+    ['xmm15', 16],
+    [None, 4],      # mxcsr
+] + [[None, 16] for x in range(16)] + [    # ymm0h-ymm15h
+    [None, 16],     # bnd0raw
+    [None, 16],
+    [None, 16],
+    [None, 16],     # bnd3raw
+    [None, 8],      # bndcfgu
+    [None, 8],      # bndstatus
+] + [[None, 16] for x in range(16)] + \
+    [[None, 16] for x in range(16)] + \
+    [[None, 8] for x in range(8)] + \
+    [[None, 32] for x in range(32)] + [    # xmm16-xmm31, ymm16h-ymm31h,
+                                           # k0-k7, zmm0h-zmm31h
+    [None, 4],      # pkru
+    [None, 8],      # fs_base
+    [None, 8],      # gs_base
+    [None, 8],      # orig_rax
+]
+
+# Register order of the NT_PRSTATUS note of a core file
+x86_64_prstatus_offset = 112
+x86_64_prstatus_registers = ['r15', 'r14', 'r13', 'r12', 'rbp', 'rbx', 'r11', 
+        'r10', 'r9', 'r8', 'rax', 'rcx', 'rdx', 'rsi', 'rdi', None, 'rip', 
+        'cs', None, 'rsp', 'ss', None, None, 'ds', 'es', 'fs', 'gs']
+
 x86_64_syscall_table = { 
     0 : [3, "read"],
     1 : [3, "write"],